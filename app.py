@@ -5,33 +5,115 @@ This module provides the application factory pattern for creating Flask app inst
 Routes are organized in separate blueprint modules in the routes package.
 """
 
+import os
+from typing import Optional
+
 from flask import Flask
 from database import init_database, add_sample_data
+from db_instrumentation import init_query_stats
 from routes import register_blueprints
+from routes.caching import init_cache_control
+from routes.compression import init_compression
+from routes.db_accounting import init_request_accounting
+from routes.fragment_cache import init_fragment_cache
+from routes.metrics_routes import init_metrics
+from routes.profiling import init_profiling
+from routes.rate_limit import init_rate_limiting
+from services.availability_events import init_availability_events
+from services.suggest_index import init_suggest_index
+from write_queue import init_write_queue
 
 
-def create_app():
+def create_app(sample_data: Optional[bool] = None):
     """
     Application factory function to create and configure Flask app.
     
+    Args:
+        sample_data: Add the demonstration books to an empty database.
+            Defaults to the LIBRARY_SAMPLE_DATA environment variable
+            ('1'/'true'/'yes'), i.e. off unless asked for.
+    
     Returns:
         Flask: Configured Flask application instance
     """
     app = Flask(__name__)
     app.secret_key = "super secret key"
     
-    # Initialize the database
+    # Initialize the database (a no-op when the schema is already current)
     init_database()
     
     # Add sample data for testing and demonstration
-    add_sample_data()
+    if sample_data is None:
+        sample_data = os.environ.get('LIBRARY_SAMPLE_DATA', '').lower() in ('1', 'true', 'yes')
+    if sample_data:
+        add_sample_data()
+    
+    # Optionally commit concurrent writes together from one writer thread (WRITE_QUEUE)
+    init_write_queue(app)
     
     # Register all route blueprints
     register_blueprints(app)
     
+    # Request counts and latencies for /metrics; first, so its timing wraps the other hooks
+    init_metrics(app)
+    
+    # Connections, statements and rows per request, in the logs (and headers in debug mode)
+    init_request_accounting(app)
+    
+    # Opt-in cProfile/tracemalloc reports for single requests (/admin/profiles)
+    init_profiling(app)
+    
+    # Static files are cached by clients for a day
+    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 86400
+    
+    # Cache-Control per endpoint or blueprint. Catalog and API reads carry
+    # ETags, so "no-cache" lets clients keep a copy and revalidate it cheaply.
+    app.config['CACHE_CONTROL'] = {
+        'catalog.catalog': 'no-cache',
+        'catalog.add_book': 'no-store',
+        'search': 'no-cache',
+        'api.search_books_api': 'public, no-cache',
+        'api.search_books_batch_api': 'no-store',
+        'api.get_late_fee': 'private, no-cache',
+        'api.suggest_books_api': 'public, max-age=30',
+        'api.availability_events': 'no-store',
+        'api.payment_breaker_status': 'no-store',
+        'async_api.search_books_api': 'public, no-cache',
+        'async_api.get_late_fee': 'private, no-cache',
+        'async_api.pay_late_fee': 'no-store',
+        'borrowing': 'no-store',
+        'admin': 'no-store',
+        'metrics': 'no-store',
+    }
+    init_cache_control(app)
+    init_compression(app)
+    init_fragment_cache(app)
+    
+    # Typeahead index over titles and authors, rebuilt from the database
+    init_suggest_index(app)
+    
+    # Server-sent availability changes for the catalog page (/api/events)
+    init_availability_events(app)
+    
+    # Per-statement query timings (/admin/queries) and the slow-query log.
+    # ADMIN_TOKEN guards /admin; without one it refuses every request, unless
+    # ADMIN_ALLOW_LOCAL opts in to serving local ones (not behind a proxy).
+    app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN')
+    app.config['ADMIN_ALLOW_LOCAL'] = os.environ.get('ADMIN_ALLOW_LOCAL', '').lower() in ('1', 'true', 'yes')
+    init_query_stats(app)
+    
+    # Token-bucket limits on write requests, per patron ID and per client IP:
+    # burst = requests allowed at once, rate = tokens refilled per second
+    app.config['RATE_LIMITS'] = {
+        'borrowing': {'burst': 10, 'rate': 0.5},
+        'catalog': {'burst': 20, 'rate': 1.0},
+        'async_api': {'burst': 5, 'rate': 0.2},
+    }
+    init_rate_limiting(app)
+    
     return app
 
 
 if __name__ == '__main__':
-    app = create_app()
+    app = create_app(sample_data=True)
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,54 @@
+"""
+Async Database Module for Library Management System
+Awaitable versions of the repository functions for async views.
+
+SQLite has no async driver, so each call runs on a dedicated thread pool
+(sized by LIBRARY_DB_THREADS) and the coroutine awaits its result. The
+event loop stays free while a query runs, and the pool bounds how many
+SQLite connections are open at once.
+"""
+
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import repository
+
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('LIBRARY_DB_THREADS', '8')),
+                               thread_name_prefix='library-db')
+
+
+async def run_db(func: Callable, *args, **kwargs):
+    """Run a blocking database function on the database thread pool and await it."""
+    # Imported on first use: asyncio is only needed once an async view runs
+    import asyncio
+    loop = asyncio.get_running_loop()
+    # Run in a copy of the caller's context so per-request DB accounting follows the call
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await loop.run_in_executor(_executor, call)
+
+async def get_all_books() -> List[Dict]:
+    """Get all books from the database."""
+    return await run_db(repository.get_all_books)
+
+async def get_book_by_id(book_id: int) -> Optional[Dict]:
+    """Get a specific book by ID."""
+    return await run_db(repository.get_book_by_id, book_id)
+
+async def get_book_by_isbn(isbn: str) -> Optional[Dict]:
+    """Get a specific book by ISBN."""
+    return await run_db(repository.get_book_by_isbn, isbn)
+
+async def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
+    """Get currently borrowed books for a patron."""
+    return await run_db(repository.get_patron_borrowed_books, patron_id)
+
+async def get_patron_borrow_count(patron_id: str) -> int:
+    """Get the number of books currently borrowed by a patron."""
+    return await run_db(repository.get_patron_borrow_count, patron_id)
+
+async def get_data_versions() -> Dict[str, Dict]:
+    """Get the change counter and last write time of each versioned table."""
+    return await run_db(repository.get_data_versions)
@@ -0,0 +1,4 @@
+"""
+Benchmarks Package - Performance measurements for the Library Management System
+Each module is runnable with `python -m benchmarks.<module>`.
+"""
@@ -0,0 +1,62 @@
+"""
+Sync versus async gateway calls.
+
+N gateway status checks against the simulator, issued one after another
+with PaymentGateway versus awaited together with AsyncPaymentGateway.
+There is no HTTP comparison of /api/... against /api/async/...: the views
+that could be driven end to end (search, late fee) return from the
+catalog stubs without touching the database or the gateway, so both
+variants would only measure Flask overhead.
+
+Usage:
+    python -m benchmarks.bench_async --fan-out 20 --gateway-latency-ms 100
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from services.async_payment_service import AsyncPaymentGateway
+from services.gateway_simulator import GatewayProfile, GatewaySimulator
+from services.payment_service import PaymentGateway
+
+
+def measure_fan_out(calls: int, latency_ms: float) -> dict:
+    with GatewaySimulator(profile=GatewayProfile(latency_ms=latency_ms)) as simulator:
+        gateway = PaymentGateway(base_url=simulator.url)
+        txn_ids = [f'txn_{i}' for i in range(calls)]
+
+        start = time.perf_counter()
+        for txn_id in txn_ids:
+            gateway.verify_payment_status(txn_id)
+        sequential = time.perf_counter() - start
+
+        async_gateway = AsyncPaymentGateway(gateway)
+
+        async def check_all():
+            await asyncio.gather(*(async_gateway.verify_payment_status(t) for t in txn_ids))
+
+        start = time.perf_counter()
+        asyncio.run(check_all())
+        concurrent = time.perf_counter() - start
+
+    return {
+        'calls': calls,
+        'gateway_latency_ms': latency_ms,
+        'sequential_ms': round(sequential * 1000, 1),
+        'gathered_ms': round(concurrent * 1000, 1)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--fan-out', type=int, default=20)
+    parser.add_argument('--gateway-latency-ms', type=float, default=100)
+    args = parser.parse_args(argv)
+
+    print(json.dumps(measure_fan_out(args.fan_out, args.gateway_latency_ms), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Catalog page render time with a cold, warm and partially invalidated row cache.
+
+Usage:
+    python -m benchmarks.bench_catalog_render --books 10000 100000
+"""
+
+import argparse
+import json
+
+import database
+from benchmarks.common import temporary_database, time_calls, summarize
+
+
+def measure(num_books: int, repeat: int = 5, churn: float = 0.01) -> dict:
+    """Time full GET /catalog requests (query + render) in each cache state."""
+    from app import create_app
+    from routes.fragment_cache import row_cache
+
+    with temporary_database(num_books):
+        app = create_app()
+        app.config['FRAGMENT_CACHE_SIZE'] = row_cache.max_entries = num_books + 1000
+        client = app.test_client()
+
+        def fetch():
+            assert client.get('/catalog').status_code == 200
+
+        def cold():
+            row_cache.clear()
+            fetch()
+
+        query = summarize(time_calls(database.get_all_books, repeat))
+        cold_timing = summarize(time_calls(cold, repeat))
+        fetch()
+        warm_timing = summarize(time_calls(fetch, repeat))
+
+        changed = max(1, int(num_books * churn))
+        step = max(1, num_books // changed)
+
+        # Time only the request, not the updates
+        churn_durations = []
+        for _ in range(repeat):
+            for book_id in range(1, num_books + 1, step):
+                database.update_book_availability(book_id, 0)
+            churn_durations += time_calls(fetch, 1)
+
+        return {
+            'books': num_books,
+            'query_only': query,
+            'cold_cache': cold_timing,
+            'warm_cache': warm_timing,
+            f'{churn:.0%}_rows_changed': summarize(churn_durations),
+            'cache_entries': len(row_cache)
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+    print(json.dumps([measure(n, args.repeat) for n in args.books], indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Bytes on the wire for catalog and search responses, with and without compression.
+
+Usage:
+    python -m benchmarks.bench_compression --books 10000
+"""
+
+import argparse
+import json
+
+from benchmarks.common import temporary_database, time_calls, summarize
+
+ENCODINGS = ('identity', 'gzip', 'br')
+
+
+def measure(num_books: int) -> dict:
+    """Fetch /catalog and /api/search once per Accept-Encoding and record body sizes."""
+    from app import create_app
+    from routes import compression
+
+    results = {'books': num_books, 'brotli_available': compression.brotli is not None, 'responses': {}}
+    with temporary_database(num_books):
+        client = create_app().test_client()
+        for path in ('/catalog', '/api/search?q=Book&type=title'):
+            sizes = {}
+            for encoding in ENCODINGS:
+                if encoding == 'br' and compression.brotli is None:
+                    continue
+                headers = {'Accept-Encoding': encoding}
+                response = client.get(path, headers=headers)
+                sizes[encoding] = {
+                    'bytes': len(response.data),
+                    'content_encoding': response.headers.get('Content-Encoding', 'identity'),
+                    'timing': summarize(time_calls(lambda: client.get(path, headers=headers), 5))
+                }
+            identity = sizes['identity']['bytes']
+            for entry in sizes.values():
+                entry['ratio'] = round(entry['bytes'] / identity, 4) if identity else None
+            results['responses'][path] = sizes
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=10000)
+    args = parser.parse_args(argv)
+    print(json.dumps(measure(args.books), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+Throughput and latency of every library_service operation at several dataset sizes.
+
+For each size N the library is generated by benchmarks.datagen with N
+books, N borrow records spread over three years (DatasetSpec's default
+history) and N / 10 patrons (at least 100, at most 900,000). Every
+operation is called --ops times with arguments drawn from that data,
+and the run is reported as JSON: ops/sec plus latency percentiles per
+operation and size.
+
+pay_late_fees talks HTTP to the local gateway simulator (profile
+--gateway-profile). Operations that are still unimplemented stubs in
+library_service are measured anyway and flagged "stub": true. While
+calculate_late_fee_for_book is a stub, pay_late_fees is measured with a
+fixed fee ("fee_stubbed": true) so the gateway path is exercised.
+
+--storage memory copies each generated library into a MemoryRepository
+before timing, so the numbers show the service layer's own CPU cost;
+the difference from the default (sqlite) is the cost of storage.
+
+Usage:
+    python -m benchmarks.bench_service --sizes 1000 100000 1000000 --output service.json
+    python -m benchmarks.bench_service --sizes 100000 --storage memory
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from typing import Callable, Dict, List
+from unittest import mock
+
+import database
+import library_service
+from memory_repository import MemoryRepository
+from repository import get_repository, use_repository
+from benchmarks.common import temporary_database, summarize
+from benchmarks.datagen import DatasetSpec
+from services.gateway_simulator import GatewaySimulator
+from services.payment_service import PaymentGateway, gateway_breaker
+
+OPERATIONS = (
+    'add_book_to_catalog',
+    'borrow_book_by_patron',
+    'return_book_by_patron',
+    'calculate_late_fee_for_book',
+    'search_books_in_catalog',
+    'get_patron_status_report',
+    'pay_late_fees',
+)
+
+STUB_MESSAGES = ('not implemented', 'not yet implemented')
+
+
+def is_stub_result(result) -> bool:
+    """Whether a service call came back with a placeholder instead of a real answer."""
+    if result is None or result == [] or result == {}:
+        return True
+    return any(message in str(result).lower() for message in STUB_MESSAGES)
+
+
+def run_operation(call: Callable[[int], object], ops: int) -> Dict:
+    """Call call(i) for i in range(ops) and summarize the timings."""
+    durations = []
+    results = []
+    for i in range(ops):
+        start = time.perf_counter()
+        results.append(call(i))
+        durations.append(time.perf_counter() - start)
+    return {
+        'ops_per_sec': round(ops / sum(durations), 1),
+        'latency': summarize(durations),
+        'stub': all(is_stub_result(result) for result in results),
+    }
+
+
+def sample_books(book_ids: List[int]) -> List[Dict]:
+    """The books with the given IDs (those that exist), in ID order."""
+    conn = database.get_db_connection()
+    books = []
+    for start in range(0, len(book_ids), 500):
+        chunk = book_ids[start:start + 500]
+        placeholders = ', '.join('?' * len(chunk))
+        books.extend(dict(row) for row in conn.execute(
+            f'SELECT * FROM books WHERE id IN ({placeholders})', chunk))
+    conn.close()
+    return sorted(books, key=lambda book: book['id'])
+
+
+def sample_loans(limit: int, overdue: bool) -> List[sqlite3.Row]:
+    """Active loans (optionally only overdue ones) to draw patron/book pairs from."""
+    conn = database.get_db_connection()
+    query = 'SELECT patron_id, book_id FROM borrow_records WHERE return_date IS NULL'
+    if overdue:
+        query += ' AND due_date < ?'
+        rows = conn.execute(query + ' LIMIT ?', (time.strftime('%Y-%m-%dT%H:%M:%S'), limit)).fetchall()
+    else:
+        rows = conn.execute(query + ' LIMIT ?', (limit,)).fetchall()
+    conn.close()
+    return rows
+
+
+def benchmark_size(size: int, ops: int, gateway_profile: str, seed: int, storage: str = 'sqlite') -> Dict:
+    """Generate a synthetic library of the given size and time every operation against it."""
+    rng = random.Random(seed)
+    spec = DatasetSpec(books=size, loans=size, patrons=max(100, min(900000, size // 10)), seed=seed)
+    seed_started = time.perf_counter()
+    with temporary_database(spec=spec):
+        seed_seconds = time.perf_counter() - seed_started
+
+        sampled = sample_books(rng.sample(range(1, size + 1), min(size, ops * 4)))
+        borrowable = [book['id'] for book in sampled if book['available_copies'] > 0][:ops] or [1]
+        active = sample_loans(ops, overdue=False) or [('100000', 1)]
+        overdue = sample_loans(ops, overdue=True) or active
+        patrons = [f'{100000 + rng.randrange(spec.patrons)}' for _ in range(ops)]
+        searches = [query for book in sampled[:ops]
+                    for query in ((book['title'].split()[-1], 'title'), (book['author'], 'author'),
+                                  (book['isbn'], 'isbn'))]
+
+        calls = {
+            'add_book_to_catalog': lambda i: library_service.add_book_to_catalog(
+                f'Benchmark Book {i}', 'Benchmark Author', f'{9790000000000 + i}', 2),
+            # Generated patron IDs stay below 900000, so these patrons have no loans yet
+            # and the borrowing limit never interferes
+            'borrow_book_by_patron': lambda i: library_service.borrow_book_by_patron(
+                f'{900000 + i}', borrowable[i % len(borrowable)]),
+            'return_book_by_patron': lambda i: library_service.return_book_by_patron(
+                *_loan(active, i)),
+            'calculate_late_fee_for_book': lambda i: library_service.calculate_late_fee_for_book(
+                *_loan(overdue, i)),
+            'search_books_in_catalog': lambda i: library_service.search_books_in_catalog(
+                *searches[i % len(searches)]),
+            'get_patron_status_report': lambda i: library_service.get_patron_status_report(
+                patrons[i]),
+        }
+
+        repository = MemoryRepository.from_database() if storage == 'memory' else get_repository()
+        with use_repository(repository):
+            operations = {name: run_operation(calls[name], ops) for name in OPERATIONS if name in calls}
+            operations['pay_late_fees'] = benchmark_payments(overdue, ops, gateway_profile, seed)
+
+    return {
+        'dataset': {'books': size, 'loans': size, 'patrons': spec.patrons},
+        'storage': storage,
+        'seed_seconds': round(seed_seconds, 2),
+        'operations': operations,
+    }
+
+
+def benchmark_payments(loans: List, ops: int, gateway_profile: str, seed: int) -> Dict:
+    """Time pay_late_fees against the gateway simulator over HTTP."""
+    gateway_breaker.reset()
+    with GatewaySimulator(profile=gateway_profile, seed=seed) as simulator:
+        gateway = PaymentGateway(base_url=simulator.url)
+        patron_id, book_id = _loan(loans, 0)
+        fee_stubbed = not (library_service.calculate_late_fee_for_book(patron_id, book_id) or {}).get('fee_amount')
+        fee = {'fee_amount': 2.5, 'days_overdue': 5, 'status': 'Overdue'}
+        patch = mock.patch.object(library_service, 'calculate_late_fee_for_book', return_value=fee)
+        if fee_stubbed:
+            patch.start()
+        try:
+            result = run_operation(lambda i: library_service.pay_late_fees(*_loan(loans, i), gateway), ops)
+        finally:
+            if fee_stubbed:
+                patch.stop()
+    result['fee_stubbed'] = fee_stubbed
+    result['gateway_profile'] = gateway_profile
+    return result
+
+
+def _loan(loans: List, i: int):
+    patron_id, book_id = loans[i % len(loans)]
+    return patron_id, book_id
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000],
+                        help="Books (and loans) per dataset")
+    parser.add_argument('--ops', type=int, default=200, help="Calls per operation and size")
+    parser.add_argument('--gateway-profile', default='ideal')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--storage', choices=('sqlite', 'memory'), default='sqlite',
+                        help="Repository the operations run against")
+    parser.add_argument('--output', help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    report = {
+        'python': sys.version.split()[0],
+        'sqlite': sqlite3.sqlite_version,
+        'cpus': os.cpu_count(),
+        'ops': args.ops,
+        'results': [benchmark_size(size, args.ops, args.gateway_profile, args.seed, args.storage)
+                    for size in args.sizes],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Throughput of the development server (python app.py) versus serve.py.
+
+Each server runs in a subprocess against its own temporary library.db and
+is driven by a fixed number of client threads for a fixed duration.
+
+Usage:
+    python -m benchmarks.bench_serving --books 1000 --clients 16 --duration 10
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from benchmarks.common import summarize
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PATHS = ('/catalog', '/api/search?q=Book&type=title')
+
+DEV_SERVER = ("from app import create_app; "
+              "create_app().run(debug=True, use_reloader=False, host='127.0.0.1', port={port})")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def seed(directory: str, num_books: int):
+    """Create library.db in directory with num_books books."""
+    code = ("import database; from benchmarks.common import seed_books; "
+            f"database.init_database(); seed_books({num_books})")
+    subprocess.run([sys.executable, '-c', code], cwd=directory, check=True, env=_env())
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env['PYTHONPATH'] = REPO_ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+
+def wait_until_up(port: int, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/catalog', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def drive(port: int, clients: int, duration: float, paths=PATHS) -> dict:
+    """Hit paths round-robin from `clients` threads for `duration` seconds."""
+    durations = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client(offset):
+        i = offset
+        local = []
+        local_errors = 0
+        while time.time() < stop_at:
+            url = f'http://127.0.0.1:{port}{paths[i % len(paths)]}'
+            i += 1
+            start = time.perf_counter()
+            try:
+                urllib.request.urlopen(url, timeout=30).read()
+                local.append(time.perf_counter() - start)
+            except OSError:
+                local_errors += 1
+        with lock:
+            durations.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return {
+        'requests_per_sec': round(len(durations) / duration, 1),
+        'errors': errors[0],
+        'latency': summarize(durations) if durations else None
+    }
+
+
+def run_server(command: list, num_books: int, clients: int, duration: float, port: int, paths=PATHS) -> dict:
+    with tempfile.TemporaryDirectory(prefix='library_serve_') as directory:
+        seed(directory, num_books)
+        process = subprocess.Popen(command, cwd=directory, env=_env(),
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(port)
+            return drive(port, clients, duration, paths)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=1000)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, help="serve.py workers (default: its own default)")
+    parser.add_argument('--threads', type=int, help="serve.py threads per worker")
+    args = parser.parse_args(argv)
+
+    results = {'books': args.books, 'clients': args.clients, 'duration_s': args.duration, 'cpus': os.cpu_count()}
+
+    port = free_port()
+    results['dev_server'] = run_server([sys.executable, '-c', DEV_SERVER.format(port=port)],
+                                       args.books, args.clients, args.duration, port)
+
+    port = free_port()
+    command = [sys.executable, os.path.join(REPO_ROOT, 'serve.py'), '--bind', f'127.0.0.1:{port}']
+    if args.workers:
+        command += ['--workers', str(args.workers)]
+    if args.threads:
+        command += ['--threads', str(args.threads)]
+    results['serve_py'] = run_server(command, args.books, args.clients, args.duration, port)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Cold start time: interpreter launch, `import app` and `create_app()`.
+
+Every run is a fresh Python process. "new_database" starts from an empty
+directory (so init_database runs its DDL); "current_database" reuses a
+database that is already at SCHEMA_VERSION, as every restart and every
+additional worker does.
+
+Usage:
+    python -m benchmarks.bench_startup --repeat 20
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import summarize
+from benchmarks.bench_serving import _env
+
+PROBE = '''
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+print(json.dumps({"import": imported - start, "create_app": created - imported}))
+'''
+
+
+def start_once(directory: str) -> dict:
+    """Run the probe in a new process; returns seconds per phase and in total."""
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=directory, env=_env(),
+                            check=True, capture_output=True, text=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['process'] = time.perf_counter() - start
+    return timings
+
+
+def measure(repeat: int, fresh: bool) -> dict:
+    runs = []
+    with tempfile.TemporaryDirectory(prefix='library_startup_') as directory:
+        for _ in range(repeat):
+            if fresh:
+                for name in os.listdir(directory):
+                    os.remove(os.path.join(directory, name))
+            runs.append(start_once(directory))
+    return {phase: summarize([run[phase] for run in runs]) for phase in ('import', 'create_app', 'process')}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    # Warm the OS file cache so the first run doesn't skew the numbers
+    with tempfile.TemporaryDirectory(prefix='library_startup_') as directory:
+        start_once(directory)
+
+    print(json.dumps({
+        'python': sys.version.split()[0],
+        'new_database': measure(args.repeat, fresh=True),
+        'current_database': measure(args.repeat, fresh=False),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
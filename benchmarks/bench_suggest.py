@@ -0,0 +1,54 @@
+"""
+Typeahead latency: suggest index build time and per-keystroke lookups.
+
+Each lookup types a query one character at a time, as a search box would,
+and times every prefix. Broad one- and two-letter prefixes are the worst
+case; they are answered from the memo after the first hit.
+
+Usage:
+    python -m benchmarks.bench_suggest --books 10000 100000
+"""
+
+import argparse
+import json
+import random
+import time
+
+import database
+from benchmarks.common import temporary_database, summarize
+from services.suggest_index import SuggestIndex
+
+
+def measure(num_books: int, queries: int = 500, seed: int = 1) -> dict:
+    with temporary_database(num_books):
+        books = database.get_all_books()
+        start = time.perf_counter()
+        index = SuggestIndex()
+        index.build(books, database.get_book_popularity())
+        build_seconds = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    durations = []
+    for _ in range(queries):
+        book = rng.choice(books)
+        text = rng.choice((book['title'], book['author']))
+        for end in range(1, len(text) + 1):
+            prefix = text[:end]
+            start = time.perf_counter()
+            index.suggest(prefix, 8)
+            durations.append(time.perf_counter() - start)
+
+    return {'books': num_books, 'build_ms': round(build_seconds * 1000, 1),
+            'keystroke': summarize(durations)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args(argv)
+    print(json.dumps([measure(n, args.queries) for n in args.books], indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Write throughput with and without the group-commit write queue.
+
+Each of --threads threads records --ops loans, each loan being the two
+writes borrow_book_by_patron makes (insert_borrow_record and
+update_book_availability). The run is repeated with writes going
+straight to the writer connection and through a WriteQueue, and the
+report gives writes/sec, per-write latency and the mean batch size.
+
+Usage:
+    python -m benchmarks.bench_write_queue --threads 1 4 16 --ops 200
+"""
+
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import database
+from benchmarks.common import summarize, temporary_database
+from write_queue import WriteQueue
+
+
+def run_writers(threads: int, ops: int, num_books: int) -> Dict:
+    """Time threads concurrent writers against the current database and write queue."""
+    durations: List[float] = []
+    failures = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def writer(index: int):
+        mine = []
+        barrier.wait()
+        for i in range(ops):
+            book_id = (index * ops + i) % num_books + 1
+            now = datetime.now()
+            start = time.perf_counter()
+            ok = (database.insert_borrow_record(f'{700000 + index}', book_id, now, now + timedelta(days=14))
+                  and database.update_book_availability(book_id, 0))
+            mine.append(time.perf_counter() - start)
+            if not ok:
+                failures.append(book_id)
+        with lock:
+            durations.extend(mine)
+
+    workers = [threading.Thread(target=writer, args=(index,)) for index in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    return {
+        'writes_per_sec': round(2 * threads * ops / elapsed, 1),
+        'loan_latency': summarize(durations),
+        'failures': len(failures),
+    }
+
+
+def measure(threads: int, ops: int, num_books: int = 1000, max_batch: int = 64,
+            max_wait_ms: float = 0) -> Dict:
+    """Compare direct writes with queued writes for one thread count."""
+    result = {'threads': threads}
+    for mode in ('direct', 'queue'):
+        with temporary_database(num_books):
+            queue: Optional[WriteQueue] = WriteQueue(max_batch, max_wait_ms) if mode == 'queue' else None
+            database.set_write_queue(queue)
+            try:
+                database.update_book_availability(1, 0)  # opens the writer and switches to WAL
+                result[mode] = run_writers(threads, ops, num_books)
+            finally:
+                database.set_write_queue(None)
+                if queue is not None:
+                    queue.stop()
+                    result[mode]['mean_batch'] = round(queue.operations / max(queue.batches, 1), 2)
+    result['speedup'] = round(result['queue']['writes_per_sec'] / result['direct']['writes_per_sec'], 2)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--ops', type=int, default=200, help="Loans recorded per thread")
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=0)
+    args = parser.parse_args(argv)
+    results = [measure(threads, args.ops, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+               for threads in args.threads]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
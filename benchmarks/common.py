@@ -0,0 +1,77 @@
+"""
+Shared helpers for benchmarks: throwaway databases and timing.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import database
+from benchmarks.datagen import DatasetSpec, generate_library
+
+
+@contextmanager
+def temporary_database(num_books: int = 0, spec: Optional[DatasetSpec] = None):
+    """
+    Point database.DATABASE at a fresh file seeded with num_books books,
+    or with a synthetic library generated from spec.
+
+    Yields:
+        str: Path of the temporary database file
+    """
+    directory = tempfile.mkdtemp(prefix='library_bench_')
+    previous = database.DATABASE
+    database.DATABASE = os.path.join(directory, 'library.db')
+    try:
+        database.init_database()
+        if spec is not None:
+            generate_library(spec)
+        else:
+            seed_books(num_books)
+        yield database.DATABASE
+    finally:
+        database.close_connections()
+        database.DATABASE = previous
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def seed_books(count: int):
+    """Bulk insert count books with distinct titles, authors and ISBNs."""
+    conn = database.get_db_connection()
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, ?, ?, ?, ?)
+    ''', ((f'Book Title {i:07d}', f'Author {i % 997:03d}', f'{9780000000000 + i}', 3, i % 4)
+          for i in range(count)))
+    conn.commit()
+    conn.close()
+
+
+def time_calls(func: Callable, repeat: int) -> List[float]:
+    """Call func repeat times and return each call's duration in seconds."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def summarize(durations: List[float]) -> Dict:
+    """Summarize durations (seconds) as milliseconds: mean, p50, p95, p99, max."""
+    ordered = sorted(durations)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'p50_ms': round(percentile(50), 3),
+        'p95_ms': round(percentile(95), 3),
+        'p99_ms': round(percentile(99), 3),
+        'max_ms': round(ordered[-1] * 1000, 3)
+    }
@@ -0,0 +1,358 @@
+"""
+Deterministic synthetic libraries for benchmarks and tests.
+
+generate_library() fills an empty library database with:
+
+- books whose popularity follows a Zipf distribution: a few titles
+  account for most loans, and popular titles have more copies
+- patrons (6-digit IDs) whose activity is mildly skewed as well
+- a multi-year borrow history, mostly returned on time, with a share
+  returned late, a few never returned, and the recent loans still out
+
+The same DatasetSpec (including its seed and end date) always produces
+the same database. Rows are written with executemany in large batches
+inside one transaction, with journaling off and the per-row change
+counter triggers dropped for the load (init_database recreates them).
+
+Usage:
+    python -m benchmarks.datagen --output big.db --books 2000000 --patrons 500000 --loans 8000000
+"""
+
+import argparse
+import json
+import math
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date, timedelta
+from itertools import islice
+from typing import Dict, Iterator, Optional, Tuple
+
+import database
+
+BATCH_SIZE = 50000
+LOAN_DAYS = 14
+
+ADJECTIVES = (
+    'Silent', 'Hidden', 'Broken', 'Golden', 'Last', 'Forgotten', 'Crimson', 'Distant', 'Burning', 'Quiet',
+    'Secret', 'Endless', 'Winter', 'Summer', 'Lost', 'Wild', 'Bitter', 'Iron', 'Glass', 'Paper',
+    'Midnight', 'Northern', 'Little', 'Great', 'Second', 'Invisible', 'Shattered', 'Wandering', 'Electric', 'Ancient',
+)
+NOUNS = (
+    'Garden', 'River', 'House', 'Kingdom', 'Letter', 'Station', 'Mountain', 'Harbor', 'Orchard', 'Library',
+    'Empire', 'Journey', 'Daughter', 'Machine', 'Island', 'Forest', 'Promise', 'Storm', 'Mirror', 'Shadow',
+    'Voyage', 'Lighthouse', 'Winter', 'Crown', 'Bridge', 'Music', 'Memory', 'Valley', 'Fire', 'Sea',
+)
+PLACES = (
+    'Avalon', 'Brighton', 'Cairo', 'Dublin', 'Eldoria', 'Florence', 'Geneva', 'Havana', 'Istanbul', 'Jaipur',
+    'Kyoto', 'Lisbon', 'Marrakesh', 'Nairobi', 'Oslo', 'Prague', 'Quebec', 'Riga', 'Seville', 'Tallinn',
+)
+FIRST_NAMES = (
+    'Ada', 'Ben', 'Chloe', 'Daniel', 'Elena', 'Farah', 'George', 'Hana', 'Ivan', 'Julia',
+    'Kenji', 'Lena', 'Marco', 'Nadia', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Samuel', 'Tara',
+    'Umar', 'Vera', 'William', 'Xin', 'Yusuf', 'Zoe', 'Aisha', 'Bruno', 'Carmen', 'Dmitri',
+    'Emeka', 'Freya', 'Gustavo', 'Helen', 'Ines', 'Jonas', 'Kofi', 'Leila', 'Mateo', 'Nora',
+)
+LAST_NAMES = (
+    'Adams', 'Baker', 'Chen', 'Diaz', 'Evans', 'Fischer', 'Garcia', 'Haddad', 'Ito', 'Jensen',
+    'Kowalski', 'Lopez', 'Morgan', 'Nakamura', 'Okafor', 'Petrov', 'Quinn', 'Rossi', 'Singh', 'Tanaka',
+    'Ueda', 'Vargas', 'Walker', 'Xu', 'Yilmaz', 'Zhang', 'Abbott', 'Becker', 'Costa', 'Dubois',
+    'Eriksson', 'Ferreira', 'Gallagher', 'Hoffman', 'Ivanova', 'Johansson', 'Kim', 'Larsen', 'Moreau', 'Novak',
+    'Oliveira', 'Park', 'Quintero', 'Reyes', 'Schmidt', 'Torres', 'Usman', 'Varga', 'Weber', 'Young',
+)
+
+
+@dataclass
+class DatasetSpec:
+    """
+    Shape of a generated library.
+
+    Attributes:
+        books: Number of books
+        patrons: Number of distinct patrons (at most 900,000 6-digit IDs)
+        loans: Borrow records over the whole history (default 4 per book)
+        years: Length of the borrow history, ending at end_date
+        book_skew: Zipf exponent of book popularity (higher = more concentrated)
+        patron_skew: Zipf exponent of patron activity
+        late_rate: Fraction of loans returned after the due date
+        lost_rate: Fraction of loans never returned
+        seed: Random seed; the same spec always yields the same rows
+        end_date: Last day of the history (default today)
+    """
+    books: int = 100000
+    patrons: int = 10000
+    loans: Optional[int] = None
+    years: float = 3.0
+    book_skew: float = 1.0
+    patron_skew: float = 0.6
+    late_rate: float = 0.12
+    lost_rate: float = 0.005
+    seed: int = 0
+    end_date: date = field(default_factory=date.today)
+
+    def __post_init__(self):
+        if self.loans is None:
+            self.loans = self.books * 4
+        if not 0 < self.patrons <= 900000:
+            raise ValueError("patrons must be between 1 and 900,000 (6-digit patron IDs)")
+        if self.books < 1:
+            raise ValueError("books must be at least 1")
+
+
+class ZipfSampler:
+    """
+    Draw ranks 0..n-1 with probability roughly proportional to 1 / (rank + 1) ** s.
+
+    Uses the inverse CDF of the continuous approximation, so a draw is O(1)
+    and no per-rank weight table is kept, even for millions of ranks.
+    """
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self.n = n
+        self.s = s
+        self.rng = rng
+        self._span = math.log(n + 1) if s == 1 else (n + 1) ** (1 - s) - 1
+
+    def sample(self) -> int:
+        u = self.rng.random()
+        if self.s == 1:
+            x = math.exp(u * self._span)
+        else:
+            x = (1 + u * self._span) ** (1 / (1 - self.s))
+        return min(self.n - 1, int(x) - 1)
+
+
+class RankPermutation:
+    """Bijection between popularity ranks and IDs 1..n, so popular books aren't simply the lowest IDs."""
+
+    def __init__(self, n: int, rng: random.Random):
+        self.n = n
+        self.multiplier = self._coprime(n, rng)
+        self.offset = rng.randrange(n)
+        self._inverse = pow(self.multiplier, -1, n) if n > 1 else 1
+
+    def id_for_rank(self, rank: int) -> int:
+        return (rank * self.multiplier + self.offset) % self.n + 1
+
+    def rank_for_id(self, item_id: int) -> int:
+        return ((item_id - 1 - self.offset) * self._inverse) % self.n
+
+    @staticmethod
+    def _coprime(n: int, rng: random.Random) -> int:
+        if n <= 2:
+            return 1
+        while True:
+            candidate = rng.randrange(n // 3, n)
+            if math.gcd(candidate, n) == 1:
+                return candidate
+
+
+def isbn13(number: int) -> str:
+    """A valid ISBN-13 in the 978 range built from a 9-digit number."""
+    digits = f'978{number:09d}'
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits))
+    return digits + str((10 - total % 10) % 10)
+
+
+def copies_for_rank(rank: int, books: int) -> int:
+    """More copies of popular titles: 8 for the top 0.1%, 5 for the top 1%, 3 for the top 10%."""
+    share = rank / books
+    if share < 0.001:
+        return 8
+    if share < 0.01:
+        return 5
+    if share < 0.1:
+        return 3
+    return 1 + rank % 2
+
+
+def generate_loans(spec: DatasetSpec, books: RankPermutation,
+                   copies_out: Dict[int, int]) -> Iterator[Tuple[str, int, str, str, Optional[str]]]:
+    """
+    Yield borrow_records rows in chronological order.
+
+    Loans still out at the end are counted per book in copies_out. A loan
+    that would still be out when every copy of its book already is gets
+    recorded as returned instead, so available copies never go negative.
+    """
+    rng = random.Random(spec.seed * 1000003 + 1)
+    book_ranks = ZipfSampler(spec.books, spec.book_skew, rng)
+    patron_ranks = ZipfSampler(spec.patrons, spec.patron_skew, rng)
+    patrons = RankPermutation(spec.patrons, rng)
+
+    # Times are seconds since midnight of the first day, formatted through a
+    # per-day prefix table: much cheaper than datetime arithmetic per row
+    history_days = math.ceil(spec.years * 365)
+    first_day = spec.end_date - timedelta(days=history_days - 1)
+    days = [(first_day + timedelta(days=n)).isoformat() for n in range(history_days + LOAN_DAYS + 31)]
+    end = history_days * 86400.0
+    start = end - spec.years * 365 * 86400
+    loan_seconds = LOAN_DAYS * 86400
+
+    def timestamp(seconds: float) -> str:
+        day, second = divmod(int(seconds), 86400)
+        return f'{days[day]}T{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}'
+
+    # One loan per equal slice of the history, at a random point in it:
+    # chronological and exactly spec.loans rows without sorting them all
+    slice_seconds = (end - start) / spec.loans
+    random_fraction = rng.random
+    copies_total = spec.books
+
+    for i in range(spec.loans):
+        borrowed = start + (i + random_fraction()) * slice_seconds
+        due = borrowed + loan_seconds
+        book_id = books.id_for_rank(book_ranks.sample())
+        patron_id = f'{99999 + patrons.id_for_rank(patron_ranks.sample())}'
+
+        outcome = random_fraction()
+        if outcome < spec.lost_rate:
+            returned = None
+        elif outcome < spec.lost_rate + spec.late_rate:
+            returned = due + 86400 * (1 + 29 * random_fraction())
+        else:
+            returned = borrowed + 86400 * (0.5 + (LOAN_DAYS - 0.5) * random_fraction())
+        if returned is not None and returned > end:
+            returned = None
+
+        if returned is None:
+            if copies_out.get(book_id, 0) >= copies_for_rank(books.rank_for_id(book_id), copies_total):
+                returned = min(end - 1, borrowed + 86400 * (0.5 + (LOAN_DAYS - 0.5) * random_fraction()))
+            else:
+                copies_out[book_id] = copies_out.get(book_id, 0) + 1
+
+        yield (patron_id, book_id, timestamp(borrowed), timestamp(due),
+               timestamp(returned) if returned is not None else None)
+
+
+def generate_books(spec: DatasetSpec, books: RankPermutation,
+                   copies_out: Dict[int, int]) -> Iterator[Tuple[int, str, str, str, int, int]]:
+    """Yield books rows in ID order, with available copies net of the loans still out."""
+    for book_id in range(1, spec.books + 1):
+        rank = books.rank_for_id(book_id)
+        # Titles and authors are a pure function of the seed and ID
+        h = (book_id * 2654435761 + spec.seed * 40503) & 0xFFFFFFFF
+        title = f'The {ADJECTIVES[h % 30]} {NOUNS[(h >> 5) % 30]}'
+        if h & 0x400:
+            title += f' of {PLACES[(h >> 11) % 20]}'
+        if h & 0x8000:
+            title += f', Book {1 + (h >> 16) % 7}'
+        author = f'{FIRST_NAMES[(h >> 8) % 40]} {LAST_NAMES[(h >> 14) % 50]}'
+        total = copies_for_rank(rank, spec.books)
+        yield (book_id, title, author, isbn13(book_id), total, total - copies_out.get(book_id, 0))
+
+
+def _batches(rows: Iterator, size: int = BATCH_SIZE) -> Iterator[list]:
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _version_triggers(conn):
+    return [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%\\_version' ESCAPE '\\'")]
+
+
+def generate_library(spec: DatasetSpec, path: Optional[str] = None) -> Dict:
+    """
+    Fill an empty library database with a synthetic library.
+
+    Args:
+        spec: What to generate
+        path: Database file (default database.DATABASE); created if missing
+
+    Returns:
+        dict: Row counts and timings
+
+    Raises:
+        ValueError: If the database already has books or loans
+    """
+    previous = database.DATABASE
+    if path is not None:
+        database.DATABASE = path
+    try:
+        started = time.perf_counter()
+        database.init_database()
+        conn = database.get_db_connection()
+        existing = conn.execute('SELECT (SELECT COUNT(*) FROM books) + (SELECT COUNT(*) FROM borrow_records)').fetchone()[0]
+        if existing:
+            conn.close()
+            raise ValueError(f"{database.DATABASE} already has books or loans; generate into an empty database")
+
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('PRAGMA cache_size = -262144')
+        # The change counters are bumped once below instead of once per row
+        triggers = _version_triggers(conn)
+        for name in triggers:
+            conn.execute(f'DROP TRIGGER {name}')
+
+        books = RankPermutation(spec.books, random.Random(spec.seed))
+        copies_out = {}
+
+        for batch in _batches(generate_loans(spec, books, copies_out)):
+            conn.executemany('''
+                INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+                VALUES (?, ?, ?, ?, ?)
+            ''', batch)
+        loans_done = time.perf_counter()
+
+        for batch in _batches(generate_books(spec, books, copies_out)):
+            conn.executemany('''
+                INSERT INTO books (id, title, author, isbn, total_copies, available_copies)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', batch)
+
+        conn.execute('''
+            UPDATE data_versions SET version = version + 1, updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE name != 'epoch'
+        ''')
+        # Let init_database put the dropped triggers back
+        conn.execute('DELETE FROM schema_version')
+        conn.commit()
+        conn.close()
+        database.init_database()
+
+        finished = time.perf_counter()
+        return {
+            'database': database.DATABASE,
+            'books': spec.books,
+            'loans': spec.loans,
+            'patrons': spec.patrons,
+            'loans_out': sum(copies_out.values()),
+            'loans_seconds': round(loans_done - started, 2),
+            'total_seconds': round(finished - started, 2),
+        }
+    finally:
+        database.DATABASE = previous
+
+
+def main(argv=None):
+    defaults = DatasetSpec()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', required=True, help="Database file to create")
+    parser.add_argument('--books', type=int, default=defaults.books)
+    parser.add_argument('--patrons', type=int, default=defaults.patrons)
+    parser.add_argument('--loans', type=int, help="Default: 4 per book")
+    parser.add_argument('--years', type=float, default=defaults.years)
+    parser.add_argument('--book-skew', type=float, default=defaults.book_skew)
+    parser.add_argument('--patron-skew', type=float, default=defaults.patron_skew)
+    parser.add_argument('--late-rate', type=float, default=defaults.late_rate)
+    parser.add_argument('--lost-rate', type=float, default=defaults.lost_rate)
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+    parser.add_argument('--end-date', type=date.fromisoformat, default=defaults.end_date,
+                        help="Last day of the history, YYYY-MM-DD (default today)")
+    args = parser.parse_args(argv)
+
+    spec = DatasetSpec(books=args.books, patrons=args.patrons, loans=args.loans, years=args.years,
+                       book_skew=args.book_skew, patron_skew=args.patron_skew, late_rate=args.late_rate,
+                       lost_rate=args.lost_rate, seed=args.seed, end_date=args.end_date)
+    stats = generate_library(spec, args.output)
+    stats['spec'] = {key: str(value) if isinstance(value, date) else value for key, value in asdict(spec).items()}
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == '__main__':
+    main()
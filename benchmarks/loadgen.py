@@ -0,0 +1,388 @@
+"""
+HTTP load generator: concurrent virtual patrons running a borrow/return/search mix.
+
+Each virtual patron is a thread with its own patron ID, cookie jar and
+ETag cache (so unchanged pages are revalidated with If-None-Match, as a
+browser would). It picks an action by weight from the traffic mix, sends
+it, optionally pauses for a think time, and repeats until the run ends.
+Borrows and returns are form posts; the redirect after a borrow is
+followed, as in a browser, and counted in the borrow's latency.
+
+Targets:
+    in-process  create_app() on a synthetic library from benchmarks.datagen,
+                driven through Flask test clients (the default)
+    --url       a running server, e.g. python serve.py; book IDs and
+                search terms come from --database or from its /catalog page
+
+The report is JSON: throughput, latency percentiles and error rates per
+route and overall. Errors are exceptions and 5xx answers; 429s are
+counted separately as rate_limited.
+
+Usage:
+    python -m benchmarks.loadgen --patrons 16 --duration 30 --books 5000
+    python -m benchmarks.loadgen --url http://127.0.0.1:5000 --patrons 50 --mix catalog=1,search=5,borrow=2
+"""
+
+import argparse
+import http.client
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from html import unescape
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.common import summarize
+
+DEFAULT_MIX = {
+    'catalog': 15,
+    'search': 25,
+    'api_search': 10,
+    'suggest': 10,
+    'borrow': 15,
+    'return': 10,
+    'late_fee': 15,
+}
+
+
+@dataclass
+class Workload:
+    """What virtual patrons ask for: existing book IDs and terms to search for."""
+    book_ids: List[int]
+    title_words: List[str]
+    authors: List[str]
+
+    @classmethod
+    def from_database(cls, path: str, limit: int = 5000) -> 'Workload':
+        conn = sqlite3.connect(path)
+        rows = conn.execute('SELECT id, title, author FROM books ORDER BY random() LIMIT ?', (limit,)).fetchall()
+        conn.close()
+        return cls._from_rows(rows)
+
+    @classmethod
+    def from_catalog(cls, html: str) -> 'Workload':
+        """Parse the rows of a rendered /catalog page."""
+        rows = []
+        for match in re.finditer(r'<tr data-book-id="(\d+)"[^>]*>\s*<td>[^<]*</td>\s*<td>([^<]*)</td>\s*<td>([^<]*)</td>',
+                                 html):
+            rows.append((int(match.group(1)), unescape(match.group(2)), unescape(match.group(3))))
+        return cls._from_rows(rows)
+
+    @classmethod
+    def _from_rows(cls, rows) -> 'Workload':
+        if not rows:
+            raise ValueError("The library has no books to generate load against")
+        words = sorted({word for _, title, _ in rows for word in title.split() if len(word) > 3})
+        return cls(book_ids=[row[0] for row in rows], title_words=words or ['the'],
+                   authors=sorted({author for _, _, author in rows}))
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    form: Optional[Dict] = None
+    follow_redirects: bool = False
+
+
+@dataclass
+class VirtualPatron:
+    """State one simulated library user carries between requests."""
+    patron_id: str
+    rng: random.Random
+    workload: Workload
+    borrowed: List[int] = field(default_factory=list)
+
+    def catalog(self) -> Request:
+        return Request('GET', '/catalog')
+
+    def search(self) -> Request:
+        if self.rng.random() < 0.7:
+            query = {'q': self.rng.choice(self.workload.title_words), 'type': 'title'}
+        else:
+            query = {'q': self.rng.choice(self.workload.authors).split()[-1], 'type': 'author'}
+        return Request('GET', '/search?' + urlencode(query))
+
+    def api_search(self) -> Request:
+        return Request('GET', '/api/search?' + urlencode({'q': self.rng.choice(self.workload.title_words)}))
+
+    def suggest(self) -> Request:
+        word = self.rng.choice(self.workload.title_words)
+        return Request('GET', '/api/suggest?' + urlencode({'q': word[:self.rng.randint(1, len(word))]}))
+
+    def borrow(self) -> Request:
+        book_id = self.rng.choice(self.workload.book_ids)
+        self.borrowed.append(book_id)
+        return Request('POST', '/borrow', {'patron_id': self.patron_id, 'book_id': book_id}, follow_redirects=True)
+
+    def return_(self) -> Request:
+        if self.borrowed:
+            book_id = self.borrowed.pop(self.rng.randrange(len(self.borrowed)))
+        else:
+            book_id = self.rng.choice(self.workload.book_ids)
+        return Request('POST', '/return', {'patron_id': self.patron_id, 'book_id': book_id})
+
+    def late_fee(self) -> Request:
+        book_id = self.rng.choice(self.borrowed) if self.borrowed else self.rng.choice(self.workload.book_ids)
+        return Request('GET', f'/api/late_fee/{self.patron_id}/{book_id}')
+
+    def next_request(self, route: str) -> Request:
+        return getattr(self, 'return_' if route == 'return' else route)()
+
+
+class InProcessClient:
+    """Sends requests to a Flask app through its test client."""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def send(self, request: Request, headers: Dict) -> Tuple[int, Dict]:
+        response = self._client.open(request.path, method=request.method, data=request.form,
+                                     headers=headers, follow_redirects=request.follow_redirects)
+        response.get_data()
+        return response.status_code, dict(response.headers)
+
+
+class HttpClient:
+    """Sends requests to a running server over one keep-alive connection, with a cookie jar."""
+
+    def __init__(self, base_url: str, timeout: float = 30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.cookies = {}
+        self._conn = None
+
+    def send(self, request: Request, headers: Dict) -> Tuple[int, Dict]:
+        status, response_headers = self._send_once(request.method, request.path, request.form, headers)
+        if request.follow_redirects and status in (301, 302, 303) and 'Location' in response_headers:
+            location = urlsplit(response_headers['Location'])
+            path = location.path + ('?' + location.query if location.query else '')
+            status, response_headers = self._send_once('GET', path, None, headers)
+        return status, response_headers
+
+    def _send_once(self, method: str, path: str, form: Optional[Dict], headers: Dict) -> Tuple[int, Dict]:
+        headers = dict(headers)
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        # Like a browser, retry once on a fresh connection if the server had
+        # already closed the idle keep-alive connection
+        for attempt in range(2):
+            reused = self._conn is not None
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                response = self._conn.getresponse()
+                response.read()
+                break
+            except (OSError, http.client.HTTPException) as e:
+                self._conn.close()
+                self._conn = None
+                stale = isinstance(e, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError))
+                if not (reused and stale and attempt == 0):
+                    raise
+        for cookie in response.headers.get_all('Set-Cookie') or []:
+            name, _, value = cookie.split(';', 1)[0].partition('=')
+            self.cookies[name.strip()] = value.strip()
+        return response.status, dict(response.headers)
+
+
+class RouteStats:
+    """Outcomes of one route's requests, merged from all patrons."""
+
+    def __init__(self):
+        self.durations = []
+        self.errors = 0
+        self.rate_limited = 0
+        self.not_modified = 0
+        self.statuses = {}
+
+    def record(self, duration: float, status: Optional[int]):
+        self.durations.append(duration)
+        if status is None or status >= 500:
+            self.errors += 1
+        elif status == 429:
+            self.rate_limited += 1
+        elif status == 304:
+            self.not_modified += 1
+        key = str(status) if status is not None else 'exception'
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def merge(self, other: 'RouteStats'):
+        self.durations.extend(other.durations)
+        self.errors += other.errors
+        self.rate_limited += other.rate_limited
+        self.not_modified += other.not_modified
+        for key, count in other.statuses.items():
+            self.statuses[key] = self.statuses.get(key, 0) + count
+
+    def report(self, elapsed: float) -> Dict:
+        count = len(self.durations)
+        return {
+            'requests': count,
+            'requests_per_sec': round(count / elapsed, 1),
+            'errors': self.errors,
+            'error_rate': round(self.errors / count, 4) if count else 0.0,
+            'rate_limited': self.rate_limited,
+            'not_modified': self.not_modified,
+            'statuses': dict(sorted(self.statuses.items())),
+            'latency': summarize(self.durations) if count else None,
+        }
+
+
+def run_load(client_factory: Callable[[], object], workload: Workload, mix: Dict[str, float],
+             patrons: int, duration: float, think_ms: float = 0.0, max_requests: Optional[int] = None,
+             seed: int = 1, etags: bool = True) -> Dict:
+    """
+    Run virtual patrons against clients from client_factory and report per-route results.
+
+    Args:
+        client_factory: Returns a new client (InProcessClient or HttpClient) per patron
+        workload: Book IDs and search terms to draw requests from
+        mix: Relative weight of each route in DEFAULT_MIX
+        patrons: Number of concurrent virtual patrons
+        duration: Seconds to run for
+        think_ms: Mean pause between a patron's requests (exponential), 0 for none
+        max_requests: Stop each patron after this many requests (optional)
+        seed: Seed for the patrons' random choices
+        etags: Revalidate repeated GETs with If-None-Match
+
+    Returns:
+        dict: Throughput, latency percentiles and error rates, per route and in total
+    """
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        raise ValueError(f"Unknown routes in mix: {', '.join(sorted(unknown))}")
+    routes = [route for route, weight in mix.items() if weight > 0]
+    weights = [mix[route] for route in routes]
+    results = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def patron_loop(n: int):
+        rng = random.Random(seed * 100003 + n)
+        patron = VirtualPatron(f'{500000 + n:06d}', rng, workload)
+        client = client_factory()
+        stats = {route: RouteStats() for route in routes}
+        cached_etags = {}
+        sent = 0
+        while time.monotonic() < stop_at and (max_requests is None or sent < max_requests):
+            route = rng.choices(routes, weights)[0]
+            request = patron.next_request(route)
+            # Browsers accept compressed responses, so the server's encoding cost is included
+            headers = {'Accept-Encoding': 'gzip'}
+            if etags and request.method == 'GET' and request.path in cached_etags:
+                headers['If-None-Match'] = cached_etags[request.path]
+            start = time.perf_counter()
+            try:
+                status, response_headers = client.send(request, headers)
+            except Exception:
+                status, response_headers = None, {}
+            stats[route].record(time.perf_counter() - start, status)
+            if etags and request.method == 'GET' and 'ETag' in response_headers:
+                cached_etags[request.path] = response_headers['ETag']
+            sent += 1
+            if think_ms:
+                time.sleep(rng.expovariate(1000 / think_ms))
+        with lock:
+            results.append(stats)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=patron_loop, args=(n,), daemon=True) for n in range(patrons)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    merged = {route: RouteStats() for route in routes}
+    total = RouteStats()
+    for stats in results:
+        for route, route_stats in stats.items():
+            merged[route].merge(route_stats)
+            total.merge(route_stats)
+
+    return {
+        'patrons': patrons,
+        'duration_s': round(elapsed, 2),
+        'mix': {route: mix[route] for route in routes},
+        'total': total.report(elapsed),
+        'routes': {route: merged[route].report(elapsed) for route in routes},
+    }
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Parse 'catalog=1,search=5' into weights; unlisted routes are left out."""
+    mix = {}
+    for item in text.split(','):
+        route, _, weight = item.partition('=')
+        mix[route.strip()] = float(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help="Base URL of a running server (default: the app in-process)")
+    parser.add_argument('--database', help="Library database to draw book IDs and search terms from")
+    parser.add_argument('--patrons', type=int, default=16, help="Concurrent virtual patrons")
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--think-ms', type=float, default=0.0, help="Mean think time between requests")
+    parser.add_argument('--mix', type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="Route weights, e.g. catalog=1,search=5,borrow=2 (default: %(default)s)")
+    parser.add_argument('--books', type=int, default=5000, help="In-process: size of the generated library")
+    parser.add_argument('--rate-limits', action='store_true',
+                        help="In-process: keep the app's write rate limits (off by default, since every "
+                             "virtual patron shares one client address)")
+    parser.add_argument('--no-etags', action='store_true', help="Never send If-None-Match")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    options = dict(mix=args.mix, patrons=args.patrons, duration=args.duration, think_ms=args.think_ms,
+                   seed=args.seed, etags=not args.no_etags)
+    if args.url:
+        if args.database:
+            workload = Workload.from_database(args.database)
+        else:
+            target = urlsplit(args.url)
+            conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+            conn.request('GET', '/catalog')
+            workload = Workload.from_catalog(conn.getresponse().read().decode())
+            conn.close()
+        report = run_load(lambda: HttpClient(args.url), workload, **options)
+        report['target'] = args.url
+    else:
+        from app import create_app
+        from benchmarks.common import temporary_database
+        from benchmarks.datagen import DatasetSpec
+
+        spec = DatasetSpec(books=args.books, patrons=max(100, args.books // 10), seed=args.seed)
+        with temporary_database(spec=spec) as path:
+            app = create_app()
+            # Failed requests are counted in the report; their tracebacks would drown the output
+            app.logger.disabled = True
+            if not args.rate_limits:
+                app.config['RATE_LIMITS'] = {}
+            report = run_load(lambda: InProcessClient(app), Workload.from_database(args.database or path),
+                              **options)
+        report['target'] = f'in-process ({args.books} books)'
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""
+Performance regression gate: compare a fresh run against a committed baseline.
+
+Each case (a service call or a request through the app) is timed in
+--rounds rounds of --calls calls against the same generated library; a
+round's mean is one sample. A case regresses when its median got slower
+by more than its threshold AND a one-sided Mann-Whitney U test says the
+slowdown is unlikely to be noise (p < --alpha). Either condition alone
+is reported but does not fail the run. The threshold is --tolerance, or
+NOISE_IQRS times the baseline's relative interquartile range when the
+case is noisier than that.
+
+Baselines are recorded on one machine and checked on others, so both
+runs also time a fixed pure-Python workload and current samples are
+scaled by the ratio (--no-normalize turns this off).
+
+Usage:
+    python -m benchmarks.regression --check benchmarks/baseline.json
+    python -m benchmarks.regression --save benchmarks/baseline.json
+
+--check exits with status 1 if any case regressed.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import database
+import library_service
+from benchmarks.common import temporary_database
+from benchmarks.datagen import DatasetSpec
+from write_queue import WriteQueue
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+DATASET = DatasetSpec(books=2000, loans=2000, patrons=200, seed=1)
+
+# Interquartile ranges of baseline noise a slowdown must exceed
+NOISE_IQRS = 3
+
+
+class Cases:
+    """Setup for each timed case; every case is a callable taking the call index."""
+
+    def __init__(self, rounds: int, calls: int):
+        from app import create_app
+
+        self.app = create_app()
+        self.app.config['RATE_LIMITS'] = {}
+        self.app.logger.disabled = True
+        self.client = self.app.test_client()
+        conn = database.get_db_connection()
+        self.available = [row['id'] for row in conn.execute(
+            'SELECT id FROM books WHERE available_copies > 0 ORDER BY id')]
+        conn.close()
+        # Borrowing needs a book with a free copy each time; warm-up calls included.
+        # The queued case borrows from the second half of the list.
+        self.per_case = (rounds + 1) * calls
+        needed = 2 * self.per_case
+        if len(self.available) < needed:
+            raise ValueError(f"Only {len(self.available)} borrowable books for {needed} borrows")
+        self.write_queue = WriteQueue()
+
+    def all(self) -> Dict[str, Callable[[int], object]]:
+        return {
+            'borrow_book_by_patron': lambda i: library_service.borrow_book_by_patron(
+                f'{900000 + i}', self.available[i]),
+            'borrow_queued': lambda i: self._queued(
+                library_service.borrow_book_by_patron, f'{800000 + i}', self.available[self.per_case + i]),
+            'add_book_to_catalog': lambda i: library_service.add_book_to_catalog(
+                f'Regression Book {i}', 'Regression Author', f'{9790000000000 + i}', 2),
+            'get_all_books': lambda i: database.get_all_books(),
+            'catalog_page': lambda i: self._get('/catalog'),
+            'api_search': lambda i: self._get('/api/search?q=the&type=title'),
+            'suggest': lambda i: self._get(f'/api/suggest?q={"abcdefghst"[i % 10]}'),
+        }
+
+    def close(self):
+        self.write_queue.stop()
+
+    def _queued(self, func: Callable, *args):
+        """Call func with database writes going through the group-commit write queue."""
+        previous = database.set_write_queue(self.write_queue)
+        try:
+            return func(*args)
+        finally:
+            database.set_write_queue(previous)
+
+    def _get(self, url: str):
+        response = self.client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+        return response
+
+
+def calibrate(repeat: int = 15) -> float:
+    """Seconds taken by a fixed pure-Python workload (fastest of repeat runs, the least noisy estimate)."""
+    def workload():
+        items = [(i * 7919) % 10007 for i in range(20000)]
+        table = {}
+        for item in sorted(items):
+            table[str(item)] = table.get(str(item), 0) + 1
+        return len(table)
+
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        workload()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def measure(rounds: int, calls: int, names: Optional[List[str]] = None) -> Dict:
+    """Time every case (or those named) and return samples in milliseconds per call."""
+    results = {}
+    calibration = calibrate()
+    with temporary_database(spec=DATASET):
+        cases = Cases(rounds, calls)
+        selected = cases.all()
+        if names:
+            unknown = set(names) - set(selected)
+            if unknown:
+                raise ValueError(f"Unknown cases: {', '.join(sorted(unknown))}")
+            selected = {name: selected[name] for name in names}
+
+        try:
+            for name, call in selected.items():
+                # One untimed round first: caches, template compilation, SQLite pages
+                for i in range(calls):
+                    call(i)
+                samples = []
+                for r in range(1, rounds + 1):
+                    start = time.perf_counter()
+                    for i in range(r * calls, (r + 1) * calls):
+                        call(i)
+                    samples.append(round((time.perf_counter() - start) / calls * 1000, 4))
+                results[name] = samples
+        finally:
+            cases.close()
+    return {
+        'python': sys.version.split()[0],
+        'sqlite': sqlite3.sqlite_version,
+        'machine': platform.machine(),
+        'calibration_ms': round(min(calibration, calibrate()) * 1000, 4),
+        'rounds': rounds,
+        'calls': calls,
+        'cases': results,
+    }
+
+
+def mann_whitney_greater(a: List[float], b: List[float]) -> float:
+    """
+    One-sided p-value that values in b tend to be larger than values in a.
+
+    Mann-Whitney U with the normal approximation and tie correction,
+    which is adequate from about 8 samples per side.
+    """
+    n1, n2 = len(a), len(b)
+    combined = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    ranks = [0.0] * len(combined)
+    tie_term = 0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        tied = j - i + 1
+        tie_term += tied ** 3 - tied
+        i = j + 1
+    rank_sum_b = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 1)
+    u = rank_sum_b - n2 * (n2 + 1) / 2
+    mean = n1 * n2 / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 0.5
+    z = (u - mean - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def relative_iqr(samples: List[float]) -> float:
+    """Interquartile range of samples relative to their median."""
+    if len(samples) < 4:
+        return 0.0
+    q1, _, q3 = statistics.quantiles(samples, n=4)
+    return (q3 - q1) / statistics.median(samples)
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float, alpha: float,
+            normalize: bool = True) -> Tuple[List[Dict], float]:
+    """
+    Compare each case of current with baseline.
+
+    Returns:
+        tuple: (one row per case with medians, change, p-value and verdict,
+        the factor current samples were scaled by)
+    """
+    scale = 1.0
+    if normalize and baseline.get('calibration_ms') and current.get('calibration_ms'):
+        scale = baseline['calibration_ms'] / current['calibration_ms']
+
+    rows = []
+    for name, samples in current['cases'].items():
+        scaled = [sample * scale for sample in samples]
+        row = {'case': name, 'current_ms': statistics.median(scaled)}
+        before = baseline['cases'].get(name)
+        if not before:
+            rows.append(dict(row, baseline_ms=None, change=None, threshold=None, p_value=None, verdict='new'))
+            continue
+        row['baseline_ms'] = statistics.median(before)
+        row['change'] = row['current_ms'] / row['baseline_ms'] - 1
+        row['threshold'] = max(tolerance, NOISE_IQRS * relative_iqr(before))
+        if row['change'] > 0:
+            row['p_value'] = mann_whitney_greater(before, scaled)
+        else:
+            row['p_value'] = mann_whitney_greater(scaled, before)
+        significant = row['p_value'] < alpha
+        if abs(row['change']) <= row['threshold']:
+            row['verdict'] = 'ok'
+        elif not significant:
+            row['verdict'] = 'noise'
+        else:
+            row['verdict'] = 'REGRESSION' if row['change'] > 0 else 'faster'
+        rows.append(row)
+    return rows, scale
+
+
+def format_table(rows: List[Dict]) -> str:
+    """Render comparison rows as a fixed-width text table."""
+    header = ('case', 'baseline ms', 'current ms', 'change', 'threshold', 'p-value', 'verdict')
+    lines = []
+    for row in rows:
+        lines.append((
+            row['case'],
+            '-' if row['baseline_ms'] is None else f"{row['baseline_ms']:.3f}",
+            f"{row['current_ms']:.3f}",
+            '-' if row['change'] is None else f"{row['change']:+.1%}",
+            '-' if row['threshold'] is None else f"{row['threshold']:.0%}",
+            '-' if row['p_value'] is None else f"{row['p_value']:.4f}",
+            row['verdict'],
+        ))
+    widths = [max(len(str(cells[i])) for cells in [header] + lines) for i in range(len(header))]
+
+    def fmt(cells):
+        return '  '.join(str(cell).ljust(width) if i in (0, 6) else str(cell).rjust(width)
+                         for i, (cell, width) in enumerate(zip(cells, widths))).rstrip()
+
+    return '\n'.join([fmt(header), fmt(['-' * width for width in widths])] + [fmt(cells) for cells in lines])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--check', metavar='BASELINE', nargs='?', const=DEFAULT_BASELINE,
+                      help="Compare against this baseline (default benchmarks/baseline.json)")
+    mode.add_argument('--save', metavar='BASELINE', nargs='?', const=DEFAULT_BASELINE,
+                      help="Record a new baseline")
+    parser.add_argument('--cases', nargs='+', help="Only these cases")
+    parser.add_argument('--rounds', type=int, default=15, help="Samples per case")
+    parser.add_argument('--calls', type=int, default=20, help="Calls averaged into each sample")
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="Relative slowdown of the median that is always accepted")
+    parser.add_argument('--alpha', type=float, default=0.01, help="Significance level")
+    parser.add_argument('--no-normalize', action='store_true',
+                        help="Do not scale by the calibration workload")
+    parser.add_argument('--output', help="Also write this run's samples to this file")
+    args = parser.parse_args(argv)
+
+    current = measure(args.rounds, args.calls, args.cases)
+    if args.output:
+        _write(args.output, current)
+    if args.save:
+        _write(args.save, current)
+        print(f"Baseline with {len(current['cases'])} cases written to {args.save}")
+        return 0
+
+    with open(args.check) as f:
+        baseline = json.load(f)
+    rows, scale = compare(baseline, current, args.tolerance, args.alpha, normalize=not args.no_normalize)
+    print(format_table(rows))
+    print(f"\nTolerance {args.tolerance:.0%} (or {NOISE_IQRS} x baseline IQR), alpha {args.alpha}; "
+          f"current samples scaled by {scale:.3f} (calibration {baseline.get('calibration_ms')} ms "
+          f"in baseline, {current['calibration_ms']} ms now)")
+    regressed = [row['case'] for row in rows if row['verdict'] == 'REGRESSION']
+    if regressed:
+        print(f"Regressions: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+def _write(path: str, report: Dict):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
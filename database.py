@@ -3,22 +3,178 @@ Database module for Library Management System
 Handles all database operations and connections
 """
 
+import logging
+import os
+import pathlib
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from db_instrumentation import InstrumentedConnection
 
 # Database configuration
 DATABASE = 'library.db'
 
+T = TypeVar('T')
+
+# Version of the schema created by init_database. Bump it whenever the DDL there
+# changes so existing databases run it again; current ones skip it entirely.
+SCHEMA_VERSION = 3
+
+# Tables whose writes bump a change counter in data_versions
+VERSIONED_TABLES = ('books', 'borrow_records')
+
+# Callbacks run after a successful write, e.g. to keep in-memory indexes current.
+# Each event maps to a list of callables taking keyword arguments.
+_write_listeners = {
+    'book_inserted': [],
+    'availability_changed': [],
+}
+
+def add_write_listener(event: str, callback):
+    """Call callback(**details) in this process after each successful write of the given kind."""
+    _write_listeners[event].append(callback)
+
+def remove_write_listener(event: str, callback):
+    """Stop calling a callback registered with add_write_listener."""
+    if callback in _write_listeners[event]:
+        _write_listeners[event].remove(callback)
+
+def notify_write_listeners(event: str, **details):
+    """Run the callbacks for an event; a failing listener never fails the write."""
+    for callback in list(_write_listeners[event]):
+        try:
+            callback(**details)
+        except Exception:
+            logging.getLogger(__name__).exception("Write listener for %s failed", event)
+
 def get_db_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
+    """Get a database connection whose statements are timed (see db_instrumentation)."""
+    conn = sqlite3.connect(DATABASE, factory=InstrumentedConnection)
     conn.row_factory = sqlite3.Row  # This enables column access by name
     return conn
 
+# The helpers below reuse long-lived connections: a read-only one per thread and
+# a single writer per process, each opened on first use for the current DATABASE.
+# The database runs in WAL mode, so reads never wait for the writer.
+_readers = threading.local()
+_writer = None
+_writer_lock = threading.RLock()
+
+def get_read_connection() -> sqlite3.Connection:
+    """
+    Get this thread's read-only connection (mode=ro, query_only).
+    
+    Don't close it; it is reused by later reads on the same thread.
+    """
+    key = (os.getpid(), DATABASE)
+    cached = getattr(_readers, 'connection', None)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    if cached is not None:
+        cached[1].close()
+    uri = pathlib.Path(DATABASE).absolute().as_uri() + '?mode=ro'
+    conn = sqlite3.connect(uri, uri=True, factory=InstrumentedConnection)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA query_only = ON', instrument=False)
+    _readers.connection = (key, conn)
+    return conn
+
+@contextmanager
+def write_transaction() -> Iterator[sqlite3.Connection]:
+    """
+    Run the with block in a transaction on this process's writer connection.
+    
+    Threads take turns on a lock instead of contending for SQLite's write
+    lock. Commits when the block completes and rolls back if it raises.
+    """
+    global _writer
+    with _writer_lock:
+        key = (os.getpid(), DATABASE)
+        if _writer is None or _writer[0] != key:
+            if _writer is not None:
+                _writer[1].close()
+            conn = sqlite3.connect(DATABASE, factory=InstrumentedConnection, isolation_level=None,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode = WAL', instrument=False)
+            _writer = (key, conn)
+        conn = _writer[1]
+        try:
+            conn.execute('BEGIN IMMEDIATE', instrument=False)
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+# Optional write_queue.WriteQueue that run_write hands operations to (see set_write_queue)
+_write_queue = None
+
+def set_write_queue(queue):
+    """Send writes through queue (a write_queue.WriteQueue), or run them directly if None. Returns the previous one."""
+    global _write_queue
+    previous, _write_queue = _write_queue, queue
+    return previous
+
+def run_write(operation: Callable[[sqlite3.Connection], T]) -> T:
+    """
+    Run operation(conn) in a write transaction and return its result.
+    
+    With a write queue set, the operation is committed together with other
+    pending writes; otherwise it gets a transaction of its own.
+    """
+    queue = _write_queue
+    if queue is not None:
+        return queue.submit(operation)
+    with write_transaction() as conn:
+        return operation(conn)
+
+def close_connections():
+    """Close the writer and this thread's read connection; they reopen on next use."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer[1].close()
+            _writer = None
+    cached = getattr(_readers, 'connection', None)
+    if cached is not None:
+        cached[1].close()
+        _readers.connection = None
+
+# SQLite connections must not be used across fork (gunicorn forks workers after
+# loading the app), so the parent closes its own before forking
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=close_connections)
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Get the schema version recorded by init_database (0 for a new or older database)."""
+    try:
+        row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
 def init_database():
-    """Initialize the database with required tables."""
+    """
+    Initialize the database with required tables.
+    
+    When the database is already at SCHEMA_VERSION this is a single
+    SELECT. Otherwise the DDL runs under a write lock, so processes
+    starting at the same time don't run it twice.
+    """
     conn = get_db_connection()
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        conn.close()
+        return
+    
+    conn.execute('BEGIN IMMEDIATE')
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        conn.rollback()
+        conn.close()
+        return
     
     # Create books table
     conn.execute('''
@@ -28,10 +184,16 @@ def init_database():
             author TEXT NOT NULL,
             isbn TEXT UNIQUE NOT NULL,
             total_copies INTEGER NOT NULL,
-            available_copies INTEGER NOT NULL
+            available_copies INTEGER NOT NULL,
+            version INTEGER NOT NULL DEFAULT 1
         )
     ''')
     
+    # Databases created before books.version existed get the column added
+    book_columns = [row['name'] for row in conn.execute('PRAGMA table_info(books)')]
+    if 'version' not in book_columns:
+        conn.execute('ALTER TABLE books ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+    
     # Create borrow_records table
     conn.execute('''
         CREATE TABLE IF NOT EXISTS borrow_records (
@@ -45,6 +207,112 @@ def init_database():
         )
     ''')
     
+    # Create borrow_records_archive table: returned loans moved out of borrow_records
+    # by archive_returned_loans, keeping their IDs (see services/archival.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS borrow_records_archive (
+            id INTEGER PRIMARY KEY,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            return_date TEXT NOT NULL,
+            archived_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_archive_patron
+        ON borrow_records_archive (patron_id)
+    ''')
+    
+    # Create payment_transactions table (late fee payments accepted by the gateway)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS payment_transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id TEXT UNIQUE NOT NULL,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_payment_transactions_created_at
+        ON payment_transactions (created_at)
+    ''')
+    
+    # Create data_versions table: a change counter per table, bumped by triggers on
+    # every write so readers can cheaply tell whether anything changed (see get_data_versions)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            updated_at INTEGER NOT NULL
+        )
+    ''')
+    for table in VERSIONED_TABLES:
+        conn.execute('''
+            INSERT OR IGNORE INTO data_versions (name, version, updated_at)
+            VALUES (?, 0, CAST(strftime('%s', 'now') AS INTEGER))
+        ''', (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_version
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_versions
+                    SET version = version + 1, updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+                    WHERE name = '{table}';
+                END
+            ''')
+    # The catalog counter only moves when books are added or removed or their
+    # title, author or ISBN change, not when copies are lent or returned
+    conn.execute('''
+        INSERT OR IGNORE INTO data_versions (name, version, updated_at)
+        VALUES ('catalog', 0, CAST(strftime('%s', 'now') AS INTEGER))
+    ''')
+    for name, event in (('insert', 'INSERT'), ('delete', 'DELETE'), ('update', 'UPDATE OF title, author, isbn')):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS books_{name}_catalog_version
+            AFTER {event} ON books
+            BEGIN
+                UPDATE data_versions
+                SET version = version + 1, updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+                WHERE name = 'catalog';
+            END
+        ''')
+    # Create availability_events table: an append-only log of available_copies
+    # changes, written by a trigger so every process sees every change in order
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS availability_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            book_id INTEGER NOT NULL,
+            available_copies INTEGER NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_availability_event
+        AFTER UPDATE OF available_copies ON books
+        WHEN NEW.available_copies != OLD.available_copies
+        BEGIN
+            INSERT INTO availability_events (book_id, available_copies, created_at)
+            VALUES (NEW.id, NEW.available_copies, CAST(strftime('%s', 'now') AS INTEGER));
+        END
+    ''')
+    
+    # A per-database random epoch keeps versions from a recreated database from
+    # colliding with ones clients cached before
+    conn.execute('''
+        INSERT OR IGNORE INTO data_versions (name, version, updated_at)
+        VALUES ('epoch', abs(random()) % 1000000000, CAST(strftime('%s', 'now') AS INTEGER))
+    ''')
+    
+    conn.execute('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)')
+    conn.execute('DELETE FROM schema_version')
+    conn.execute('INSERT INTO schema_version (version) VALUES (?)', (SCHEMA_VERSION,))
+    
     conn.commit()
     conn.close()
 
@@ -76,7 +344,7 @@ def add_sample_data():
               (datetime.now() + timedelta(days=9)).isoformat()))
         
         # Update available copies for 1984
-        conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
+        conn.execute('UPDATE books SET available_copies = 0, version = version + 1 WHERE id = 3')
         
         conn.commit()
     
@@ -84,30 +352,80 @@ def add_sample_data():
 
 # Helper Functions for Database Operations
 
+def get_data_versions() -> Dict[str, Dict]:
+    """Get the change counter and last write time (unix seconds) of each versioned table."""
+    conn = get_read_connection()
+    rows = conn.execute('SELECT name, version, updated_at FROM data_versions').fetchall()
+    return {row['name']: {'version': row['version'], 'updated_at': row['updated_at']} for row in rows}
+
+def get_availability_events(after_id: int = 0, limit: int = 1000) -> List[Dict]:
+    """Get availability changes with an ID greater than after_id, oldest first."""
+    conn = get_read_connection()
+    rows = conn.execute('''
+        SELECT id, book_id, available_copies, created_at FROM availability_events
+        WHERE id > ? ORDER BY id LIMIT ?
+    ''', (after_id, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+def get_latest_availability_events(limit: int) -> List[Dict]:
+    """Get the most recent availability changes, oldest first."""
+    conn = get_read_connection()
+    rows = conn.execute('''
+        SELECT id, book_id, available_copies, created_at FROM availability_events
+        ORDER BY id DESC LIMIT ?
+    ''', (limit,)).fetchall()
+    return [dict(row) for row in reversed(rows)]
+
+def prune_availability_events(keep: int) -> int:
+    """Delete all but the newest keep availability changes. Returns the number deleted."""
+    return run_write(lambda conn: conn.execute('''
+        DELETE FROM availability_events
+        WHERE id <= (SELECT COALESCE(MAX(id), 0) FROM availability_events) - ?
+    ''', (keep,)).rowcount)
+
 def get_all_books() -> List[Dict]:
     """Get all books from the database."""
-    conn = get_db_connection()
+    conn = get_read_connection()
     books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
-    conn.close()
     return [dict(book) for book in books]
 
 def get_book_by_id(book_id: int) -> Optional[Dict]:
     """Get a specific book by ID."""
-    conn = get_db_connection()
+    conn = get_read_connection()
     book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
-    conn.close()
     return dict(book) if book else None
 
 def get_book_by_isbn(isbn: str) -> Optional[Dict]:
     """Get a specific book by ISBN."""
-    conn = get_db_connection()
+    conn = get_read_connection()
     book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
-    conn.close()
     return dict(book) if book else None
 
+def get_books_by_isbns(isbns: List[str]) -> Dict[str, Dict]:
+    """Get the books with any of the given ISBNs in one query, keyed by ISBN."""
+    isbns = list(dict.fromkeys(isbns))
+    if not isbns:
+        return {}
+    conn = get_read_connection()
+    placeholders = ', '.join('?' for _ in isbns)
+    books = conn.execute(f'SELECT * FROM books WHERE isbn IN ({placeholders})', isbns).fetchall()
+    return {book['isbn']: dict(book) for book in books}
+
+def get_book_popularity() -> Dict[int, int]:
+    """Get the number of times each book has been borrowed, keyed by book ID."""
+    conn = get_read_connection()
+    rows = conn.execute('''
+        SELECT book_id, COUNT(*) AS borrows FROM (
+            SELECT book_id FROM borrow_records
+            UNION ALL
+            SELECT book_id FROM borrow_records_archive
+        ) GROUP BY book_id
+    ''').fetchall()
+    return {row['book_id']: row['borrows'] for row in rows}
+
 def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
     """Get currently borrowed books for a patron."""
-    conn = get_db_connection()
+    conn = get_read_connection()
     records = conn.execute('''
         SELECT br.*, b.title, b.author 
         FROM borrow_records br 
@@ -115,7 +433,6 @@ def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
         WHERE br.patron_id = ? AND br.return_date IS NULL
         ORDER BY br.borrow_date
     ''', (patron_id,)).fetchall()
-    conn.close()
     
     borrowed_books = []
     for record in records:
@@ -130,72 +447,140 @@ def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
     
     return borrowed_books
 
+def get_patron_borrow_history(patron_id: str) -> List[Dict]:
+    """Get all of a patron's loans of existing books, returned or not and archived or not, oldest first."""
+    conn = get_read_connection()
+    records = conn.execute('''
+        SELECT br.book_id, b.title, b.author, br.borrow_date, br.due_date, br.return_date
+        FROM (
+            SELECT id, book_id, borrow_date, due_date, return_date FROM borrow_records WHERE patron_id = ?
+            UNION ALL
+            SELECT id, book_id, borrow_date, due_date, return_date FROM borrow_records_archive WHERE patron_id = ?
+        ) br
+        JOIN books b ON br.book_id = b.id
+        ORDER BY br.borrow_date, br.id
+    ''', (patron_id, patron_id)).fetchall()
+    return [{
+        'book_id': record['book_id'],
+        'title': record['title'],
+        'author': record['author'],
+        'borrow_date': datetime.fromisoformat(record['borrow_date']),
+        'due_date': datetime.fromisoformat(record['due_date']),
+        'return_date': datetime.fromisoformat(record['return_date']) if record['return_date'] else None,
+    } for record in records]
+
 def get_patron_borrow_count(patron_id: str) -> int:
     """Get the number of books currently borrowed by a patron."""
-    conn = get_db_connection()
+    conn = get_read_connection()
     count = conn.execute('''
         SELECT COUNT(*) as count FROM borrow_records 
         WHERE patron_id = ? AND return_date IS NULL
     ''', (patron_id,)).fetchone()['count']
-    conn.close()
     return count
 
 def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
     """Insert a new book into the database."""
-    conn = get_db_connection()
     try:
-        conn.execute('''
+        book_id = run_write(lambda conn: conn.execute('''
             INSERT INTO books (title, author, isbn, total_copies, available_copies)
             VALUES (?, ?, ?, ?, ?)
-        ''', (title, author, isbn, total_copies, available_copies))
-        conn.commit()
-        conn.close()
-        return True
+        ''', (title, author, isbn, total_copies, available_copies)).lastrowid)
     except Exception as e:
-        conn.close()
         return False
+    
+    notify_write_listeners('book_inserted', book={
+        'id': book_id, 'title': title, 'author': author, 'isbn': isbn,
+        'total_copies': total_copies, 'available_copies': available_copies, 'version': 1
+    })
+    return True
 
 def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
     """Insert a new borrow record into the database."""
-    conn = get_db_connection()
     try:
-        conn.execute('''
+        run_write(lambda conn: conn.execute('''
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
-        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
-        conn.commit()
-        conn.close()
+        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat())))
         return True
     except Exception as e:
-        conn.close()
         return False
 
 def update_book_availability(book_id: int, change: int) -> bool:
-    """Update the available copies of a book by a given amount (+1 for return, -1 for borrow)."""
-    conn = get_db_connection()
+    """
+    Update the available copies of a book by a given amount (+1 for return, -1 for borrow).
+    Bumps the book's version so cached renderings of it are refreshed.
+    """
     try:
-        conn.execute('''
-            UPDATE books SET available_copies = available_copies + ? WHERE id = ?
-        ''', (change, book_id))
-        conn.commit()
-        conn.close()
-        return True
+        run_write(lambda conn: conn.execute('''
+            UPDATE books SET available_copies = available_copies + ?, version = version + 1 WHERE id = ?
+        ''', (change, book_id)))
     except Exception as e:
-        conn.close()
         return False
+    notify_write_listeners('availability_changed', book_id=book_id)
+    return True
 
 def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime) -> bool:
     """Update the return date for a borrow record."""
-    conn = get_db_connection()
     try:
-        conn.execute('''
+        run_write(lambda conn: conn.execute('''
             UPDATE borrow_records 
             SET return_date = ? 
             WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
-        ''', (return_date.isoformat(), patron_id, book_id))
-        conn.commit()
-        conn.close()
+        ''', (return_date.isoformat(), patron_id, book_id)))
+        return True
+    except Exception as e:
+        return False
+
+def insert_payment_transaction(transaction_id: str, patron_id: str, book_id: int, amount: float,
+                               created_at: datetime) -> bool:
+    """Record a payment the gateway reported as successful."""
+    try:
+        run_write(lambda conn: conn.execute('''
+            INSERT INTO payment_transactions (transaction_id, patron_id, book_id, amount, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (transaction_id, patron_id, book_id, amount, created_at.isoformat())))
         return True
     except Exception as e:
-        conn.close()
         return False
+
+def get_payment_transactions(start: datetime, end: datetime) -> List[Dict]:
+    """Get recorded payments with start <= created_at < end, oldest first."""
+    conn = get_read_connection()
+    records = conn.execute('''
+        SELECT * FROM payment_transactions
+        WHERE created_at >= ? AND created_at < ?
+        ORDER BY id
+    ''', (start.isoformat(), end.isoformat())).fetchall()
+    return [dict(record) for record in records]
+
+def archive_returned_loans(returned_before: datetime, after_id: int = 0, limit: int = 500) -> Tuple[int, int]:
+    """
+    Move up to limit loans returned before returned_before, with IDs above
+    after_id, from borrow_records to borrow_records_archive.
+    
+    The candidates are found on the read connection, so the write
+    transaction only touches one ID range of the table and stays short.
+    
+    Returns:
+        tuple: (loans moved, highest ID looked at; equal to after_id when
+        there is nothing left to archive)
+    """
+    cutoff = returned_before.isoformat()
+    rows = get_read_connection().execute('''
+        SELECT id FROM borrow_records WHERE id > ? AND return_date < ? ORDER BY id LIMIT ?
+    ''', (after_id, cutoff, limit)).fetchall()
+    if not rows:
+        return 0, after_id
+    last_id = rows[-1]['id']
+    
+    def move(conn):
+        conn.execute('''
+            INSERT INTO borrow_records_archive (id, patron_id, book_id, borrow_date, due_date, return_date, archived_at)
+            SELECT id, patron_id, book_id, borrow_date, due_date, return_date, ?
+            FROM borrow_records WHERE id > ? AND id <= ? AND return_date < ?
+        ''', (datetime.now().isoformat(), after_id, last_id, cutoff))
+        return conn.execute('''
+            DELETE FROM borrow_records WHERE id > ? AND id <= ? AND return_date < ?
+        ''', (after_id, last_id, cutoff)).rowcount
+    
+    return run_write(move), last_id
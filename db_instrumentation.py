@@ -0,0 +1,363 @@
+"""
+Database Instrumentation Module - Per-statement timing and a slow-query log
+
+database.get_db_connection() opens connections with InstrumentedConnection,
+whose cursors time every execute(), count the rows it returned or changed,
+and note which code issued it. Results are aggregated per SQL statement
+(whitespace-normalized, so each helper's query is one entry) in a
+process-wide QueryStats registry, viewable at /admin/queries.
+
+Statements slower than the threshold are also written to the
+"library.slow_queries" logger as one JSON line each, with their
+EXPLAIN QUERY PLAN.
+
+SELECT results are fetched eagerly inside execute() so their full cost
+and row count are measured; every helper in database.py reads its
+results completely anyway.
+
+DbAccount tallies the connections, statements and rows of one scope (a
+request, or a block under count_queries()). The active accounts live in a
+context variable, so each request thread (and work it hands to
+async_database's pool) only counts its own round trips.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from metrics import db_query_duration, statement_type
+
+slow_query_logger = logging.getLogger('library.slow_queries')
+
+# Distinct call sites remembered per statement
+MAX_CALL_SITES = 5
+# Distinct statements (and query plans) remembered; statements beyond the
+# limit are counted together under OTHER_STATEMENTS
+MAX_STATEMENTS = 1000
+OTHER_STATEMENTS = '(other statements)'
+
+_whitespace = re.compile(r'\s+')
+_placeholder_list = re.compile(r'\bIN \(\?(?: ?, ?\?)*\)', re.IGNORECASE)
+_this_file = os.path.normcase(os.path.abspath(__file__))
+_explainable = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH')
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Collapse whitespace and placeholder lists so one query always maps to one stats entry.
+
+    IN (?, ?, ?) becomes IN (?, ...), so a query built for lists of any
+    length is one entry rather than one per length.
+    """
+    return _placeholder_list.sub('IN (?, ...)', _whitespace.sub(' ', sql).strip())
+
+
+class StatementStats:
+    """Running totals for one normalized statement."""
+
+    __slots__ = ('calls', 'total_seconds', 'max_seconds', 'rows', 'slow_calls', 'call_sites')
+
+    def __init__(self):
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.slow_calls = 0
+        self.call_sites = {}
+
+    def as_dict(self, sql: str) -> Dict:
+        return {
+            'sql': sql,
+            'calls': self.calls,
+            'total_ms': round(self.total_seconds * 1000, 3),
+            'mean_ms': round(self.total_seconds / self.calls * 1000, 3) if self.calls else 0.0,
+            'max_ms': round(self.max_seconds * 1000, 3),
+            'rows': self.rows,
+            'slow_calls': self.slow_calls,
+            'call_sites': [{'site': site, 'calls': calls} for site, calls in
+                           sorted(self.call_sites.items(), key=lambda item: -item[1])],
+        }
+
+
+class QueryStats:
+    """Process-wide per-statement statistics and slow-query settings."""
+
+    def __init__(self, slow_threshold_ms: float = 100.0):
+        self.slow_threshold_ms = slow_threshold_ms
+        self._statements: Dict[str, StatementStats] = {}
+        self._plans: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, sql: str, seconds: float, rows: int, call_site: str) -> bool:
+        """Add one execution; returns True if it was slow."""
+        slow = seconds * 1000 >= self.slow_threshold_ms
+        with self._lock:
+            stats = self._statements.get(sql)
+            if stats is None:
+                if len(self._statements) >= MAX_STATEMENTS:
+                    sql = OTHER_STATEMENTS
+                stats = self._statements.setdefault(sql, StatementStats())
+            stats.calls += 1
+            stats.total_seconds += seconds
+            stats.rows += rows
+            if seconds > stats.max_seconds:
+                stats.max_seconds = seconds
+            if slow:
+                stats.slow_calls += 1
+            if call_site in stats.call_sites or len(stats.call_sites) < MAX_CALL_SITES:
+                stats.call_sites[call_site] = stats.call_sites.get(call_site, 0) + 1
+        return slow
+
+    def snapshot(self, sort: str = 'total_ms', limit: Optional[int] = None) -> List[Dict]:
+        """Per-statement stats, largest first by the given field."""
+        with self._lock:
+            entries = [stats.as_dict(sql) for sql, stats in self._statements.items()]
+        entries.sort(key=lambda entry: entry.get(sort, 0), reverse=True)
+        return entries[:limit] if limit else entries
+
+    def cached_plan(self, sql: str) -> Optional[List[str]]:
+        return self._plans.get(sql)
+
+    def cache_plan(self, sql: str, plan: List[str]):
+        with self._lock:
+            if sql in self._plans or len(self._plans) < MAX_STATEMENTS:
+                self._plans[sql] = plan
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._plans.clear()
+
+
+query_stats = QueryStats(float(os.environ.get('SLOW_QUERY_MS', '100')))
+
+
+class DbAccount:
+    """Database round trips made within one scope."""
+
+    __slots__ = ('connections', 'statements', 'rows', 'seconds', 'by_statement')
+
+    def __init__(self):
+        self.connections = 0
+        self.statements = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.by_statement: Dict[str, int] = {}
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statements run at least threshold times, most frequent first (likely N+1 loops)."""
+        return sorted(((sql, count) for sql, count in self.by_statement.items() if count >= threshold),
+                      key=lambda item: -item[1])
+
+    def as_dict(self) -> Dict:
+        return {
+            'connections': self.connections,
+            'statements': self.statements,
+            'rows': self.rows,
+            'ms': round(self.seconds * 1000, 3),
+        }
+
+
+# Accounts of the scopes the current context is in, innermost last
+_accounts: ContextVar[Tuple[DbAccount, ...]] = ContextVar('db_accounts', default=())
+
+
+def begin_account(account: DbAccount) -> Token:
+    """Start counting this context's round trips in account; pass the result to end_account()."""
+    return _accounts.set(_accounts.get() + (account,))
+
+
+def end_account(token: Token):
+    """Stop counting in the account started with begin_account()."""
+    _accounts.reset(token)
+
+
+@contextmanager
+def count_queries() -> Iterator[DbAccount]:
+    """Count the database round trips made inside the with block (nested blocks count in both)."""
+    account = DbAccount()
+    token = begin_account(account)
+    try:
+        yield account
+    finally:
+        end_account(token)
+
+
+@contextmanager
+def assert_max_queries(statements: Optional[int] = None, connections: Optional[int] = None,
+                       rows: Optional[int] = None) -> Iterator[DbAccount]:
+    """
+    Fail with an AssertionError if the block exceeds the given numbers of round trips.
+
+    Args:
+        statements: Most statements the block may execute
+        connections: Most connections it may open
+        rows: Most rows its statements may return or change
+
+    Example:
+        with assert_max_queries(statements=5, connections=4):
+            borrow_book_by_patron("123456", 1)
+    """
+    with count_queries() as account:
+        yield account
+    limits = {'statements': statements, 'connections': connections, 'rows': rows}
+    exceeded = [f'{name}: {getattr(account, name)} > {limit}'
+                for name, limit in limits.items() if limit is not None and getattr(account, name) > limit]
+    if exceeded:
+        executed = '\n'.join(f'  {count} x {sql}' for sql, count in
+                             sorted(account.by_statement.items(), key=lambda item: -item[1]))
+        raise AssertionError(f"Too many database round trips ({', '.join(exceeded)}). Executed:\n{executed}")
+
+
+def _call_site() -> str:
+    """'file:line function' of the code that issued the statement, plus its caller."""
+    frame = sys._getframe(2)
+    while frame is not None and os.path.normcase(frame.f_code.co_filename) == _this_file:
+        frame = frame.f_back
+    if frame is None:
+        return '?'
+    site = f'{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}'
+    caller = frame.f_back
+    if caller is not None:
+        site += f' <- {os.path.basename(caller.f_code.co_filename)}:{caller.f_lineno} {caller.f_code.co_name}'
+    return site
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times each statement and serves SELECT rows from a buffer."""
+
+    def __init__(self, connection):
+        super().__init__(connection)
+        self._buffer = []
+        self._position = 0
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        if self.description is not None:
+            self._buffer = super().fetchall()
+            rows = len(self._buffer)
+        else:
+            self._buffer = []
+            rows = max(self.rowcount, 0)
+        self._position = 0
+        self._finish(sql, parameters, time.perf_counter() - start, rows)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._buffer = []
+        self._position = 0
+        self._finish(sql, None, time.perf_counter() - start, max(self.rowcount, 0))
+        return self
+
+    def fetchone(self):
+        if self._position >= len(self._buffer):
+            return None
+        row = self._buffer[self._position]
+        self._position += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._buffer[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._buffer[self._position:]
+        self._position = len(self._buffer)
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def _finish(self, sql: str, parameters, seconds: float, rows: int):
+        statement = normalize_sql(sql)
+        db_query_duration.observe(seconds, statement_type(statement))
+        for account in _accounts.get():
+            account.statements += 1
+            account.rows += rows
+            account.seconds += seconds
+            account.by_statement[statement] = account.by_statement.get(statement, 0) + 1
+        if query_stats.record(statement, seconds, rows, _call_site()):
+            self._log_slow(statement, sql, parameters, seconds, rows)
+
+    def _log_slow(self, statement: str, sql: str, parameters, seconds: float, rows: int):
+        # executemany() has no single parameter set to explain with
+        plan = query_stats.cached_plan(statement)
+        if (plan is None and parameters is not None
+                and statement.split(' ', 1)[0].upper() in _explainable):
+            try:
+                plan = [row[-1] for row in self.connection.execute(
+                    'EXPLAIN QUERY PLAN ' + sql, parameters, instrument=False).fetchall()]
+            except sqlite3.Error as e:
+                plan = [f'EXPLAIN failed: {e}']
+            query_stats.cache_plan(statement, plan)
+        slow_query_logger.warning(json.dumps({
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'ms': round(seconds * 1000, 3),
+            'rows': rows,
+            'sql': statement,
+            'call_site': _call_site(),
+            'plan': plan or [],
+        }))
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose execute() and executemany() go through InstrumentedCursor."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for account in _accounts.get():
+            account.connections += 1
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=(), instrument=True):
+        cursor = super().cursor(InstrumentedCursor if instrument else sqlite3.Cursor)
+        if instrument:
+            return cursor.execute(sql, parameters)
+        return sqlite3.Cursor.execute(cursor, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def init_query_stats(app):
+    """
+    Configure slow-query logging from app.config.
+
+    SLOW_QUERY_MS: statements at least this slow are logged (default 100,
+    or the SLOW_QUERY_MS environment variable). SLOW_QUERY_LOG: file to
+    append the log to (default: wherever logging sends warnings).
+    """
+    app.config.setdefault('SLOW_QUERY_MS', query_stats.slow_threshold_ms)
+    app.config.setdefault('SLOW_QUERY_LOG', os.environ.get('SLOW_QUERY_LOG'))
+    query_stats.slow_threshold_ms = float(app.config['SLOW_QUERY_MS'])
+
+    path = app.config['SLOW_QUERY_LOG']
+    if path:
+        path = os.path.abspath(path)
+        if not any(getattr(handler, 'baseFilename', None) == path for handler in slow_query_logger.handlers):
+            handler = logging.FileHandler(path)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            slow_query_logger.addHandler(handler)
+        slow_query_logger.propagate = False
+
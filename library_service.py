@@ -3,15 +3,18 @@ Library Service Module - Business Logic Functions
 Contains all the core business logic for the Library Management System
 """
 
+import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from services.payment_service import PaymentGateway
-from database import (
-    get_book_by_id, get_book_by_isbn, get_patron_borrow_count,
+from repository import (
+    get_book_by_id, get_book_by_isbn, get_books_by_isbns, get_patron_borrow_count,
     insert_book, insert_borrow_record, update_book_availability,
-    update_borrow_record_return_date, get_all_books
+    update_borrow_record_return_date, get_all_books, insert_payment_transaction
 )
 
+logger = logging.getLogger(__name__)
+
 def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
     """
     Add a new book to the catalog.
@@ -133,6 +136,35 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     
     return []
 
+def search_books_in_catalog_batch(queries: List[Tuple[str, str]], limit: int = 20) -> List[List[Dict]]:
+    """
+    Run several catalog searches at once.
+    
+    Identical (search_term, search_type) pairs are searched only once, and
+    all ISBN searches are answered together by a single database query.
+    
+    Args:
+        queries: (search_term, search_type) pairs
+        limit: Maximum number of results returned per query
+        
+    Returns:
+        list: One list of matching books per query, in the same order
+    """
+    queries = [(search_term.strip(), search_type) for search_term, search_type in queries]
+    unique = dict.fromkeys(queries)
+    
+    isbns = [search_term for search_term, search_type in unique if search_type == 'isbn']
+    books_by_isbn = get_books_by_isbns(isbns)
+    
+    for search_term, search_type in unique:
+        if search_type == 'isbn':
+            book = books_by_isbn.get(search_term)
+            unique[(search_term, search_type)] = [book] if book else []
+        else:
+            unique[(search_term, search_type)] = search_books_in_catalog(search_term, search_type)
+    
+    return [unique[query][:limit] for query in queries]
+
 def get_patron_status_report(patron_id: str) -> Dict:
     """
     Get status report for a patron.
@@ -177,48 +209,70 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
         mock_gateway.process_payment.return_value = (True, "txn_123", "Success")
         success, msg, txn = pay_late_fees("123456", 1, mock_gateway)
     """
+    error, fee_amount, description = prepare_late_fee_payment(patron_id, book_id)
+    if error:
+        return False, error, None
+    
+    # Use provided gateway or create new one
+    if payment_gateway is None:
+        payment_gateway = PaymentGateway()
+    
+    # Process payment through external gateway
+    # THIS IS WHAT YOU SHOULD MOCK IN THEIR TESTS!
+    try:
+        success, transaction_id, message = payment_gateway.process_payment(
+            patron_id=patron_id,
+            amount=fee_amount,
+            description=description
+        )
+    except Exception as e:
+        # Handle payment gateway errors
+        return False, f"Payment processing error: {str(e)}", None
+    
+    if not success:
+        return False, f"Payment failed: {message}", None
+    
+    record_late_fee_payment(transaction_id, patron_id, book_id, fee_amount)
+    return True, f"Payment successful! {message}", transaction_id
+
+def prepare_late_fee_payment(patron_id: str, book_id: int) -> Tuple[Optional[str], float, str]:
+    """
+    Validate a late fee payment and look up what to charge.
+    The database part of pay_late_fees, before the gateway call.
+    
+    Returns:
+        tuple: (error message or None, fee amount, payment description)
+    """
     # Validate patron ID
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
-        return False, "Invalid patron ID. Must be exactly 6 digits.", None
+        return "Invalid patron ID. Must be exactly 6 digits.", 0.0, ""
     
     # Calculate late fee first
     fee_info = calculate_late_fee_for_book(patron_id, book_id)
     
     # Check if there's a fee to pay
     if not fee_info or 'fee_amount' not in fee_info:
-        return False, "Unable to calculate late fees.", None
+        return "Unable to calculate late fees.", 0.0, ""
     
     fee_amount = fee_info.get('fee_amount', 0.0)
     
     if fee_amount <= 0:
-        return False, "No late fees to pay for this book.", None
+        return "No late fees to pay for this book.", 0.0, ""
     
     # Get book details for payment description
     book = get_book_by_id(book_id)
     if not book:
-        return False, "Book not found.", None
+        return "Book not found.", 0.0, ""
     
-    # Use provided gateway or create new one
-    if payment_gateway is None:
-        payment_gateway = PaymentGateway()
-    
-    # Process payment through external gateway
-    # THIS IS WHAT YOU SHOULD MOCK IN THEIR TESTS!
-    try:
-        success, transaction_id, message = payment_gateway.process_payment(
-            patron_id=patron_id,
-            amount=fee_amount,
-            description=f"Late fees for '{book['title']}'"
-        )
-        
-        if success:
-            return True, f"Payment successful! {message}", transaction_id
-        else:
-            return False, f"Payment failed: {message}", None
-            
-    except Exception as e:
-        # Handle payment gateway errors
-        return False, f"Payment processing error: {str(e)}", None
+    return None, fee_amount, f"Late fees for '{book['title']}'"
+
+def record_late_fee_payment(transaction_id: str, patron_id: str, book_id: int, fee_amount: float):
+    """Record a payment the gateway accepted; the database part of pay_late_fees after the gateway call."""
+    # Keep a local record so the payment can be reconciled against the gateway later.
+    # The patron has been charged either way, so a failed insert is logged, not returned.
+    if not insert_payment_transaction(transaction_id, patron_id, book_id, fee_amount, datetime.now()):
+        logger.error("Could not record payment %s of %.2f by patron %s for book %s; "
+                     "reconciliation will not check it", transaction_id, fee_amount, patron_id, book_id)
 
 
 def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway: PaymentGateway = None) -> Tuple[bool, str]:
@@ -0,0 +1,288 @@
+"""
+Memory Repository Module - In-memory storage with the same semantics as the SQLite database
+
+Tables are dicts keyed by ID, with the indexes the queries need (ISBN,
+a patron's unreturned loans, loans per book) kept up to date on every
+write. Archived loans move to a dict of their own. Version counters,
+the availability event log and write listeners behave as the database
+triggers and helpers do, so the service layer and the caches built on
+it can't tell the difference.
+Nothing is persisted and each process has its own copy.
+"""
+
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from database import VERSIONED_TABLES, get_db_connection, notify_write_listeners
+from repository import LibraryRepository
+
+
+class MemoryRepository(LibraryRepository):
+    """Dict- and index-backed LibraryRepository. Safe to share between threads."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._books: Dict[int, Dict] = {}
+        self._books_by_isbn: Dict[str, Dict] = {}
+        self._borrow_records: Dict[int, Dict] = {}
+        self._archived_loans: Dict[int, Dict] = {}
+        # patron_id -> {record id: record} of unreturned loans
+        self._active_loans: Dict[str, Dict[int, Dict]] = defaultdict(dict)
+        self._borrows_per_book: Dict[int, int] = defaultdict(int)
+        self._payments: Dict[int, Dict] = {}
+        self._transaction_ids = set()
+        self._events: Dict[int, Dict] = {}
+        # Next ID per table; like AUTOINCREMENT, IDs are never reused
+        self._next_id = defaultdict(lambda: 1)
+        now = int(time.time())
+        self._versions = {name: {'version': 0, 'updated_at': now} for name in VERSIONED_TABLES + ('catalog',)}
+        self._versions['epoch'] = {'version': random.randrange(1000000000), 'updated_at': now}
+
+    @classmethod
+    def from_database(cls) -> 'MemoryRepository':
+        """A repository holding a copy of the rows in the SQLite database at database.DATABASE."""
+        repository = cls()
+        conn = get_db_connection()
+        with repository._lock:
+            for row in conn.execute('SELECT * FROM books ORDER BY id'):
+                repository._add_book(dict(row))
+            for row in conn.execute('SELECT * FROM borrow_records ORDER BY id'):
+                repository._add_borrow_record(dict(row))
+            for row in conn.execute('SELECT * FROM borrow_records_archive ORDER BY id'):
+                repository._archived_loans[row['id']] = dict(row)
+                repository._borrows_per_book[row['book_id']] += 1
+            for row in conn.execute('SELECT * FROM payment_transactions ORDER BY id'):
+                repository._add_payment(dict(row))
+            for row in conn.execute('SELECT * FROM availability_events ORDER BY id'):
+                repository._events[row['id']] = dict(row)
+            for table, last_id in conn.execute('SELECT name, seq FROM sqlite_sequence'):
+                repository._next_id[table] = last_id + 1
+            for row in conn.execute('SELECT name, version, updated_at FROM data_versions'):
+                repository._versions[row['name']] = {'version': row['version'], 'updated_at': row['updated_at']}
+        conn.close()
+        return repository
+
+    def add_sample_data(self):
+        """Add the same sample books and loan as database.add_sample_data, if there are no books."""
+        with self._lock:
+            if self._books:
+                return
+            for title, author, isbn, copies in [
+                ('The Great Gatsby', 'F. Scott Fitzgerald', '9780743273565', 3),
+                ('To Kill a Mockingbird', 'Harper Lee', '9780061120084', 2),
+                ('1984', 'George Orwell', '9780451524935', 1),
+            ]:
+                self._add_book({'id': self._take_id('books'), 'title': title, 'author': author, 'isbn': isbn,
+                                'total_copies': copies, 'available_copies': copies, 'version': 1})
+                self._bump('books')
+                self._bump('catalog')
+            self._add_borrow_record({
+                'id': self._take_id('borrow_records'), 'patron_id': '123456', 'book_id': 3,
+                'borrow_date': (datetime.now() - timedelta(days=5)).isoformat(),
+                'due_date': (datetime.now() + timedelta(days=9)).isoformat(), 'return_date': None,
+            })
+            self._bump('borrow_records')
+            self._set_available(self._books[3], 0)
+
+    # Books
+
+    def get_all_books(self) -> List[Dict]:
+        with self._lock:
+            books = sorted(self._books.values(), key=lambda book: (book['title'], book['id']))
+            return [dict(book) for book in books]
+
+    def get_book_by_id(self, book_id: int) -> Optional[Dict]:
+        with self._lock:
+            book = self._books.get(book_id)
+            return dict(book) if book else None
+
+    def get_book_by_isbn(self, isbn: str) -> Optional[Dict]:
+        with self._lock:
+            book = self._books_by_isbn.get(isbn)
+            return dict(book) if book else None
+
+    def get_books_by_isbns(self, isbns: List[str]) -> Dict[str, Dict]:
+        with self._lock:
+            return {isbn: dict(self._books_by_isbn[isbn]) for isbn in isbns if isbn in self._books_by_isbn}
+
+    def insert_book(self, title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
+        with self._lock:
+            if isbn in self._books_by_isbn:
+                return False
+            book = {'id': self._take_id('books'), 'title': title, 'author': author, 'isbn': isbn,
+                    'total_copies': total_copies, 'available_copies': available_copies, 'version': 1}
+            self._add_book(book)
+            self._bump('books')
+            self._bump('catalog')
+        notify_write_listeners('book_inserted', book=dict(book))
+        return True
+
+    def update_book_availability(self, book_id: int, change: int) -> bool:
+        with self._lock:
+            book = self._books.get(book_id)
+            if book is not None:
+                self._set_available(book, book['available_copies'] + change)
+        notify_write_listeners('availability_changed', book_id=book_id)
+        return True
+
+    # Borrow records
+
+    def get_book_popularity(self) -> Dict[int, int]:
+        with self._lock:
+            return dict(self._borrows_per_book)
+
+    def get_patron_borrowed_books(self, patron_id: str) -> List[Dict]:
+        with self._lock:
+            loans = [(record, self._books[record['book_id']])
+                     for record in self._active_loans.get(patron_id, {}).values()
+                     if record['book_id'] in self._books]
+        loans.sort(key=lambda loan: (loan[0]['borrow_date'], loan[0]['id']))
+        now = datetime.now()
+        return [{
+            'book_id': record['book_id'],
+            'title': book['title'],
+            'author': book['author'],
+            'borrow_date': datetime.fromisoformat(record['borrow_date']),
+            'due_date': datetime.fromisoformat(record['due_date']),
+            'is_overdue': now > datetime.fromisoformat(record['due_date']),
+        } for record, book in loans]
+
+    def get_patron_borrow_history(self, patron_id: str) -> List[Dict]:
+        with self._lock:
+            loans = [(record, self._books[record['book_id']])
+                     for table in (self._borrow_records, self._archived_loans)
+                     for record in table.values()
+                     if record['patron_id'] == patron_id and record['book_id'] in self._books]
+        loans.sort(key=lambda loan: (loan[0]['borrow_date'], loan[0]['id']))
+        return [{
+            'book_id': record['book_id'],
+            'title': book['title'],
+            'author': book['author'],
+            'borrow_date': datetime.fromisoformat(record['borrow_date']),
+            'due_date': datetime.fromisoformat(record['due_date']),
+            'return_date': datetime.fromisoformat(record['return_date']) if record['return_date'] else None,
+        } for record, book in loans]
+
+    def get_patron_borrow_count(self, patron_id: str) -> int:
+        with self._lock:
+            return len(self._active_loans.get(patron_id, ()))
+
+    def insert_borrow_record(self, patron_id: str, book_id: int, borrow_date: datetime,
+                             due_date: datetime) -> bool:
+        with self._lock:
+            self._add_borrow_record({
+                'id': self._take_id('borrow_records'), 'patron_id': patron_id, 'book_id': book_id,
+                'borrow_date': borrow_date.isoformat(), 'due_date': due_date.isoformat(), 'return_date': None,
+            })
+            self._bump('borrow_records')
+        return True
+
+    def update_borrow_record_return_date(self, patron_id: str, book_id: int, return_date: datetime) -> bool:
+        with self._lock:
+            loans = self._active_loans.get(patron_id, {})
+            returned = [record for record in loans.values() if record['book_id'] == book_id]
+            for record in returned:
+                record['return_date'] = return_date.isoformat()
+                del loans[record['id']]
+                self._bump('borrow_records')
+            if not loans:
+                self._active_loans.pop(patron_id, None)
+        return True
+
+    def archive_returned_loans(self, returned_before: datetime, after_id: int = 0,
+                               limit: int = 500) -> Tuple[int, int]:
+        cutoff = returned_before.isoformat()
+        with self._lock:
+            candidates = [record for record_id, record in self._borrow_records.items()
+                          if record_id > after_id and record['return_date'] is not None
+                          and record['return_date'] < cutoff][:limit]
+            archived_at = datetime.now().isoformat()
+            for record in candidates:
+                del self._borrow_records[record['id']]
+                self._archived_loans[record['id']] = dict(record, archived_at=archived_at)
+                self._bump('borrow_records')
+        return len(candidates), candidates[-1]['id'] if candidates else after_id
+
+    # Payments
+
+    def insert_payment_transaction(self, transaction_id: str, patron_id: str, book_id: int, amount: float,
+                                   created_at: datetime) -> bool:
+        with self._lock:
+            if transaction_id in self._transaction_ids:
+                return False
+            self._add_payment({
+                'id': self._take_id('payment_transactions'), 'transaction_id': transaction_id,
+                'patron_id': patron_id, 'book_id': book_id, 'amount': float(amount),
+                'created_at': created_at.isoformat(),
+            })
+        return True
+
+    def get_payment_transactions(self, start: datetime, end: datetime) -> List[Dict]:
+        start_text, end_text = start.isoformat(), end.isoformat()
+        with self._lock:
+            return [dict(payment) for payment in self._payments.values()
+                    if start_text <= payment['created_at'] < end_text]
+
+    # Change tracking
+
+    def get_data_versions(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._versions.items()}
+
+    def get_availability_events(self, after_id: int = 0, limit: int = 1000) -> List[Dict]:
+        with self._lock:
+            events = [event for event_id, event in self._events.items() if event_id > after_id]
+            return [dict(event) for event in events[:max(limit, 0)]]
+
+    def get_latest_availability_events(self, limit: int) -> List[Dict]:
+        with self._lock:
+            events = list(self._events.values())[-limit:] if limit > 0 else []
+            return [dict(event) for event in events]
+
+    def prune_availability_events(self, keep: int) -> int:
+        with self._lock:
+            cutoff = max(self._events, default=0) - keep
+            pruned = [event_id for event_id in self._events if event_id <= cutoff]
+            for event_id in pruned:
+                del self._events[event_id]
+            return len(pruned)
+
+    # Internals; callers hold self._lock
+
+    def _take_id(self, table: str) -> int:
+        row_id = self._next_id[table]
+        self._next_id[table] = row_id + 1
+        return row_id
+
+    def _bump(self, name: str):
+        self._versions[name] = {'version': self._versions[name]['version'] + 1,
+                                 'updated_at': int(time.time())}
+
+    def _add_book(self, book: Dict):
+        self._books[book['id']] = book
+        self._books_by_isbn[book['isbn']] = book
+
+    def _add_borrow_record(self, record: Dict):
+        self._borrow_records[record['id']] = record
+        self._borrows_per_book[record['book_id']] += 1
+        if record['return_date'] is None:
+            self._active_loans[record['patron_id']][record['id']] = record
+
+    def _add_payment(self, payment: Dict):
+        self._payments[payment['id']] = payment
+        self._transaction_ids.add(payment['transaction_id'])
+
+    def _set_available(self, book: Dict, available_copies: int):
+        """Change a book's available copies as the UPDATE and its triggers would."""
+        changed = available_copies != book['available_copies']
+        book['available_copies'] = available_copies
+        book['version'] += 1
+        self._bump('books')
+        if changed:
+            event_id = self._take_id('availability_events')
+            self._events[event_id] = {'id': event_id, 'book_id': book['id'],
+                                      'available_copies': available_copies, 'created_at': int(time.time())}
@@ -0,0 +1,254 @@
+"""
+Metrics Module - Counters and histograms exported in Prometheus text format
+
+Updates go to a dict owned by the calling thread, so recording a sample
+takes no lock: each thread only ever writes its own dict, and collect()
+sums copies of all of them. Every worker process periodically adds what
+it recorded since its last flush to a shared store (a SQLite file next to
+the library database), and /metrics renders the store's totals, so one
+scrape covers all workers no matter which of them answers it. Totals are
+kept when workers are recycled or restarted.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Tuple
+
+# A sample is keyed by (metric name, label values, part). part is '' for
+# counters, and a bucket index or 'sum' for histograms.
+SampleKey = Tuple[str, Tuple[str, ...], object]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """Monotonically increasing count, per combination of label values."""
+
+    type = 'counter'
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str,
+                 labelnames: Tuple[str, ...] = ()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        values = self.registry.thread_values()
+        key = (self.name, labelvalues, '')
+        values[key] = values.get(key, 0) + amount
+
+    def samples(self, totals: Dict[SampleKey, float]) -> Iterable[Tuple[str, Tuple, float]]:
+        series = sorted((labelvalues, value) for (name, labelvalues, _), value in totals.items()
+                        if name == self.name)
+        for labelvalues, value in series:
+            yield self.name, tuple(zip(self.labelnames, labelvalues)), value
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets, per combination of label values."""
+
+    type = 'histogram'
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str,
+                 labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues: str):
+        values = self.registry.thread_values()
+        # Only the bucket the value falls in is counted; samples() accumulates
+        key = (self.name, labelvalues, bisect_left(self.buckets, value))
+        values[key] = values.get(key, 0) + 1
+        key = (self.name, labelvalues, 'sum')
+        values[key] = values.get(key, 0) + value
+
+    def samples(self, totals: Dict[SampleKey, float]) -> Iterable[Tuple[str, Tuple, float]]:
+        series = {}
+        for (name, labelvalues, part), value in totals.items():
+            if name == self.name:
+                series.setdefault(labelvalues, {})[part] = value
+        bounds = [_format_value(bound) for bound in self.buckets] + ['+Inf']
+        for labelvalues, parts in sorted(series.items()):
+            labels = tuple(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for index, bound in enumerate(bounds):
+                cumulative += parts.get(index, 0)
+                yield self.name + '_bucket', labels + (('le', bound),), cumulative
+            yield self.name + '_sum', labels, parts.get('sum', 0)
+            yield self.name + '_count', labels, cumulative
+
+
+class MetricsRegistry:
+    """The metrics of this process and the per-thread dicts that hold their values."""
+
+    def __init__(self):
+        self.metrics: List = []
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            # A forked worker starts from zero; whatever the parent recorded
+            # is the parent's to flush, not every child's
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._local = threading.local()
+        self._shards: List[Dict[SampleKey, float]] = []
+        self._shards_lock = threading.Lock()
+        self._flushed: Dict[SampleKey, float] = {}
+        self._flush_lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(self, name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(self, name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def thread_values(self) -> Dict[SampleKey, float]:
+        """The calling thread's own sample dict."""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._shards_lock:
+                self._shards.append(values)
+            return values
+
+    def collect(self) -> Dict[SampleKey, float]:
+        """Totals recorded by this process since it started."""
+        with self._shards_lock:
+            shards = list(self._shards)
+        totals = {}
+        for shard in shards:
+            # dict.copy() is atomic, so a thread recording meanwhile is harmless
+            for key, value in shard.copy().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def flush(self, store: 'SqliteMetricsStore'):
+        """Add everything recorded since the previous flush to the shared store."""
+        with self._flush_lock:
+            totals = self.collect()
+            deltas = {key: value - self._flushed.get(key, 0) for key, value in totals.items()
+                      if value != self._flushed.get(key, 0)}
+            if deltas:
+                store.add(deltas)
+            self._flushed = totals
+
+    def render(self, totals: Dict[SampleKey, float]) -> str:
+        """Format totals in the Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples(totals):
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        lines.extend(_cache_hit_ratios(totals))
+        return '\n'.join(lines) + '\n'
+
+
+class SqliteMetricsStore:
+    """Running metric totals in a SQLite file shared by all worker processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS samples (key TEXT PRIMARY KEY, value REAL NOT NULL)')
+            self._local.conn = conn
+        return conn
+
+    def add(self, deltas: Dict[SampleKey, float]):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO samples (key, value) VALUES (?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = value + excluded.value',
+                [(json.dumps([name, list(labelvalues), part]), value)
+                 for (name, labelvalues, part), value in deltas.items()])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def totals(self) -> Dict[SampleKey, float]:
+        totals = {}
+        for key, value in self._connection().execute('SELECT key, value FROM samples'):
+            name, labelvalues, part = json.loads(key)
+            totals[(name, tuple(labelvalues), part)] = value
+        return totals
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+               for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _cache_hit_ratios(totals: Dict[SampleKey, float]) -> List[str]:
+    lookups = {}
+    for (name, labelvalues, part), value in totals.items():
+        if name == cache_lookups.name:
+            cache, result = labelvalues
+            lookups.setdefault(cache, {})[result] = value
+    lines = ['# HELP library_cache_hit_ratio Share of cache lookups that were hits, since the store was created',
+             '# TYPE library_cache_hit_ratio gauge']
+    for cache, results in sorted(lookups.items()):
+        total = results.get('hit', 0) + results.get('miss', 0)
+        if total:
+            lines.append(f'library_cache_hit_ratio{_format_labels((("cache", cache),))} '
+                         f'{_format_value(round(results.get("hit", 0) / total, 6))}')
+    return lines
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    'library_http_requests_total', 'HTTP requests handled, by blueprint, endpoint, method and status',
+    ('blueprint', 'endpoint', 'method', 'status'))
+http_request_duration = registry.histogram(
+    'library_http_request_duration_seconds', 'Time from request start until the response was ready',
+    ('blueprint', 'endpoint'))
+db_query_duration = registry.histogram(
+    'library_db_query_duration_seconds', 'SQLite statement execution time, by statement type',
+    ('operation',),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+payment_gateway_calls = registry.counter(
+    'library_payment_gateway_calls_total',
+    'Payment gateway HTTP calls by outcome (ok, declined, error, or rejected by the open circuit breaker)',
+    ('method', 'resource', 'outcome'))
+payment_gateway_duration = registry.histogram(
+    'library_payment_gateway_duration_seconds', 'Payment gateway call latency', ('method', 'resource'))
+cache_lookups = registry.counter(
+    'library_cache_lookups_total', 'Cache lookups by cache and result (hit or miss)', ('cache', 'result'))
+
+
+def statement_type(sql: str) -> str:
+    """First keyword of a statement ('SELECT', 'UPDATE', ...), used as a low-cardinality label."""
+    words = sql.split(None, 1)
+    return words[0].upper() if words else ''
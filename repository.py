@@ -0,0 +1,311 @@
+"""
+Repository Module - Storage interface used by the service layer and routes
+
+LibraryRepository lists the data operations the application needs.
+SqliteRepository (the default) runs them with the database.py helpers;
+memory_repository.MemoryRepository keeps everything in dicts with the
+same semantics, for fast unit tests and for benchmarks that separate
+CPU cost from storage cost.
+
+Callers use the module-level functions below, which forward to the
+current repository, so a repository can be swapped without touching
+them (and mocker.patch targets such as
+services.library_service.get_book_by_id keep working):
+
+    with use_repository(MemoryRepository()):
+        borrow_book_by_patron("123456", 1)
+"""
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import database
+
+
+class LibraryRepository(ABC):
+    """Data operations of the library. Rows are returned as plain dicts owned by the caller."""
+
+    # Books
+
+    @abstractmethod
+    def get_all_books(self) -> List[Dict]:
+        """All books, ordered by title."""
+
+    @abstractmethod
+    def get_book_by_id(self, book_id: int) -> Optional[Dict]:
+        """The book with this ID, or None."""
+
+    @abstractmethod
+    def get_book_by_isbn(self, isbn: str) -> Optional[Dict]:
+        """The book with this ISBN, or None."""
+
+    @abstractmethod
+    def get_books_by_isbns(self, isbns: List[str]) -> Dict[str, Dict]:
+        """The books with any of the given ISBNs, keyed by ISBN."""
+
+    @abstractmethod
+    def insert_book(self, title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
+        """Add a book (version 1). False if the ISBN is taken. Notifies 'book_inserted' listeners."""
+
+    @abstractmethod
+    def update_book_availability(self, book_id: int, change: int) -> bool:
+        """
+        Add change to the book's available copies and bump its version.
+
+        Notifies 'availability_changed' listeners. A missing book is left
+        alone, which is not an error.
+        """
+
+    # Borrow records
+
+    @abstractmethod
+    def get_book_popularity(self) -> Dict[int, int]:
+        """Number of borrow records (returned or not, archived or not) per book ID."""
+
+    @abstractmethod
+    def get_patron_borrowed_books(self, patron_id: str) -> List[Dict]:
+        """
+        The patron's unreturned loans of existing books, oldest first.
+
+        Each has book_id, title, author, borrow_date and due_date (datetimes)
+        and is_overdue.
+        """
+
+    @abstractmethod
+    def get_patron_borrow_history(self, patron_id: str) -> List[Dict]:
+        """
+        All of the patron's loans of existing books, archived ones included, oldest first.
+
+        Each has book_id, title, author, borrow_date, due_date and
+        return_date (datetimes; return_date is None while out).
+        """
+
+    @abstractmethod
+    def get_patron_borrow_count(self, patron_id: str) -> int:
+        """Number of the patron's unreturned loans."""
+
+    @abstractmethod
+    def insert_borrow_record(self, patron_id: str, book_id: int, borrow_date: datetime,
+                             due_date: datetime) -> bool:
+        """Record a new loan."""
+
+    @abstractmethod
+    def update_borrow_record_return_date(self, patron_id: str, book_id: int, return_date: datetime) -> bool:
+        """Set the return date of the patron's unreturned loans of the book."""
+
+    @abstractmethod
+    def archive_returned_loans(self, returned_before: datetime, after_id: int = 0,
+                               limit: int = 500) -> Tuple[int, int]:
+        """
+        Move up to limit loans returned before returned_before, with IDs above after_id, to the archive.
+
+        Returns (loans moved, highest ID looked at); the ID equals after_id
+        once nothing is left.
+        """
+
+    # Payments
+
+    @abstractmethod
+    def insert_payment_transaction(self, transaction_id: str, patron_id: str, book_id: int, amount: float,
+                                   created_at: datetime) -> bool:
+        """Record a successful payment. False if the transaction ID is already recorded."""
+
+    @abstractmethod
+    def get_payment_transactions(self, start: datetime, end: datetime) -> List[Dict]:
+        """Payments with start <= created_at < end, in the order they were recorded."""
+
+    # Change tracking
+
+    @abstractmethod
+    def get_data_versions(self) -> Dict[str, Dict]:
+        """
+        {'version', 'updated_at'} for 'books', 'borrow_records', 'catalog' and 'epoch'.
+
+        A table's version changes with every write to it. The catalog
+        version changes only when books are added or removed or their
+        title, author or ISBN change. The epoch is random per store, so
+        versions of a recreated store don't repeat.
+        """
+
+    @abstractmethod
+    def get_availability_events(self, after_id: int = 0, limit: int = 1000) -> List[Dict]:
+        """Availability changes with an ID greater than after_id, oldest first."""
+
+    @abstractmethod
+    def get_latest_availability_events(self, limit: int) -> List[Dict]:
+        """The most recent availability changes, oldest first."""
+
+    @abstractmethod
+    def prune_availability_events(self, keep: int) -> int:
+        """Delete all but the newest keep availability changes. Returns the number deleted."""
+
+
+class SqliteRepository(LibraryRepository):
+    """The library database file at database.DATABASE, through the database.py helpers."""
+
+    def get_all_books(self) -> List[Dict]:
+        return database.get_all_books()
+
+    def get_book_by_id(self, book_id: int) -> Optional[Dict]:
+        return database.get_book_by_id(book_id)
+
+    def get_book_by_isbn(self, isbn: str) -> Optional[Dict]:
+        return database.get_book_by_isbn(isbn)
+
+    def get_books_by_isbns(self, isbns: List[str]) -> Dict[str, Dict]:
+        return database.get_books_by_isbns(isbns)
+
+    def insert_book(self, title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
+        return database.insert_book(title, author, isbn, total_copies, available_copies)
+
+    def update_book_availability(self, book_id: int, change: int) -> bool:
+        return database.update_book_availability(book_id, change)
+
+    def get_book_popularity(self) -> Dict[int, int]:
+        return database.get_book_popularity()
+
+    def get_patron_borrowed_books(self, patron_id: str) -> List[Dict]:
+        return database.get_patron_borrowed_books(patron_id)
+
+    def get_patron_borrow_history(self, patron_id: str) -> List[Dict]:
+        return database.get_patron_borrow_history(patron_id)
+
+    def get_patron_borrow_count(self, patron_id: str) -> int:
+        return database.get_patron_borrow_count(patron_id)
+
+    def insert_borrow_record(self, patron_id: str, book_id: int, borrow_date: datetime,
+                             due_date: datetime) -> bool:
+        return database.insert_borrow_record(patron_id, book_id, borrow_date, due_date)
+
+    def update_borrow_record_return_date(self, patron_id: str, book_id: int, return_date: datetime) -> bool:
+        return database.update_borrow_record_return_date(patron_id, book_id, return_date)
+
+    def archive_returned_loans(self, returned_before: datetime, after_id: int = 0,
+                               limit: int = 500) -> Tuple[int, int]:
+        return database.archive_returned_loans(returned_before, after_id, limit)
+
+    def insert_payment_transaction(self, transaction_id: str, patron_id: str, book_id: int, amount: float,
+                                   created_at: datetime) -> bool:
+        return database.insert_payment_transaction(transaction_id, patron_id, book_id, amount, created_at)
+
+    def get_payment_transactions(self, start: datetime, end: datetime) -> List[Dict]:
+        return database.get_payment_transactions(start, end)
+
+    def get_data_versions(self) -> Dict[str, Dict]:
+        return database.get_data_versions()
+
+    def get_availability_events(self, after_id: int = 0, limit: int = 1000) -> List[Dict]:
+        return database.get_availability_events(after_id, limit)
+
+    def get_latest_availability_events(self, limit: int) -> List[Dict]:
+        return database.get_latest_availability_events(limit)
+
+    def prune_availability_events(self, keep: int) -> int:
+        return database.prune_availability_events(keep)
+
+
+_repository: LibraryRepository = SqliteRepository()
+
+
+def get_repository() -> LibraryRepository:
+    """The repository the module-level functions currently use."""
+    return _repository
+
+
+def set_repository(repository: LibraryRepository) -> LibraryRepository:
+    """Make repository the process-wide default; returns the previous one."""
+    global _repository
+    previous, _repository = _repository, repository
+    return previous
+
+
+@contextmanager
+def use_repository(repository: LibraryRepository) -> Iterator[LibraryRepository]:
+    """Use repository inside the with block, then restore the previous one."""
+    previous = set_repository(repository)
+    try:
+        yield repository
+    finally:
+        set_repository(previous)
+
+
+# Module-level functions, each forwarding to the current repository
+
+def get_all_books() -> List[Dict]:
+    """Get all books, ordered by title."""
+    return _repository.get_all_books()
+
+def get_book_by_id(book_id: int) -> Optional[Dict]:
+    """Get a specific book by ID."""
+    return _repository.get_book_by_id(book_id)
+
+def get_book_by_isbn(isbn: str) -> Optional[Dict]:
+    """Get a specific book by ISBN."""
+    return _repository.get_book_by_isbn(isbn)
+
+def get_books_by_isbns(isbns: List[str]) -> Dict[str, Dict]:
+    """Get the books with any of the given ISBNs, keyed by ISBN."""
+    return _repository.get_books_by_isbns(isbns)
+
+def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
+    """Insert a new book."""
+    return _repository.insert_book(title, author, isbn, total_copies, available_copies)
+
+def update_book_availability(book_id: int, change: int) -> bool:
+    """Update the available copies of a book by a given amount."""
+    return _repository.update_book_availability(book_id, change)
+
+def get_book_popularity() -> Dict[int, int]:
+    """Get the number of times each book has been borrowed, keyed by book ID."""
+    return _repository.get_book_popularity()
+
+def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
+    """Get currently borrowed books for a patron."""
+    return _repository.get_patron_borrowed_books(patron_id)
+
+def get_patron_borrow_history(patron_id: str) -> List[Dict]:
+    """Get all of a patron's loans, returned or not and archived or not, oldest first."""
+    return _repository.get_patron_borrow_history(patron_id)
+
+def get_patron_borrow_count(patron_id: str) -> int:
+    """Get the number of books currently borrowed by a patron."""
+    return _repository.get_patron_borrow_count(patron_id)
+
+def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
+    """Insert a new borrow record."""
+    return _repository.insert_borrow_record(patron_id, book_id, borrow_date, due_date)
+
+def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime) -> bool:
+    """Update the return date for a borrow record."""
+    return _repository.update_borrow_record_return_date(patron_id, book_id, return_date)
+
+def archive_returned_loans(returned_before: datetime, after_id: int = 0, limit: int = 500) -> Tuple[int, int]:
+    """Move one batch of loans returned before returned_before to the archive."""
+    return _repository.archive_returned_loans(returned_before, after_id, limit)
+
+def insert_payment_transaction(transaction_id: str, patron_id: str, book_id: int, amount: float,
+                               created_at: datetime) -> bool:
+    """Record a payment the gateway reported as successful."""
+    return _repository.insert_payment_transaction(transaction_id, patron_id, book_id, amount, created_at)
+
+def get_payment_transactions(start: datetime, end: datetime) -> List[Dict]:
+    """Get recorded payments with start <= created_at < end, oldest first."""
+    return _repository.get_payment_transactions(start, end)
+
+def get_data_versions() -> Dict[str, Dict]:
+    """Get the change counter and last write time (unix seconds) of each versioned table."""
+    return _repository.get_data_versions()
+
+def get_availability_events(after_id: int = 0, limit: int = 1000) -> List[Dict]:
+    """Get availability changes with an ID greater than after_id, oldest first."""
+    return _repository.get_availability_events(after_id, limit)
+
+def get_latest_availability_events(limit: int) -> List[Dict]:
+    """Get the most recent availability changes, oldest first."""
+    return _repository.get_latest_availability_events(limit)
+
+def prune_availability_events(keep: int) -> int:
+    """Delete all but the newest keep availability changes. Returns the number deleted."""
+    return _repository.prune_availability_events(keep)
@@ -0,0 +1,71 @@
+"""
+Admin Routes - Operational endpoints for maintainers
+
+Requests need the X-Admin-Token header to match app.config['ADMIN_TOKEN'].
+Without a configured token everything is refused, unless ADMIN_ALLOW_LOCAL
+is set, in which case requests from the local host are served. Only opt
+in where nothing proxies to the app from the same host: behind such a
+proxy every request looks local.
+"""
+
+import hmac
+import os
+
+from flask import Blueprint, abort, current_app, jsonify, render_template, request, send_from_directory
+
+from db_instrumentation import query_stats
+from routes.profiling import REPORT_ID, list_profiles, profile_dir
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+@admin_bp.before_request
+def require_admin():
+    """Reject requests without the admin token (or, when none is set, all but opted-in local ones)."""
+    token = current_app.config.get('ADMIN_TOKEN')
+    if token:
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+            abort(403)
+    elif not (current_app.config.get('ADMIN_ALLOW_LOCAL') and request.remote_addr in LOCAL_ADDRESSES):
+        abort(403)
+
+@admin_bp.route('/queries')
+def query_stats_api():
+    """
+    Per-statement database timings of this worker process.
+
+    Query parameters: sort (total_ms, mean_ms, max_ms, calls, rows or
+    slow_calls; default total_ms) and limit.
+    """
+    sort = request.args.get('sort', 'total_ms')
+    if sort not in ('total_ms', 'mean_ms', 'max_ms', 'calls', 'rows', 'slow_calls'):
+        return jsonify({'error': f'Cannot sort by {sort}'}), 400
+    limit = request.args.get('limit', type=int)
+    statements = query_stats.snapshot(sort, limit)
+    return jsonify({
+        'pid': os.getpid(),
+        'slow_query_ms': query_stats.slow_threshold_ms,
+        'statements': statements,
+    })
+
+@admin_bp.route('/queries/reset', methods=['POST'])
+def reset_query_stats():
+    """Clear this worker's statement timings."""
+    query_stats.reset()
+    return jsonify({'pid': os.getpid(), 'reset': True})
+
+@admin_bp.route('/profiles')
+def profiles():
+    """Index of the newest request profiles written by routes/profiling.py."""
+    reports = list_profiles(profile_dir(current_app), current_app.config['PROFILE_KEEP'])
+    return render_template('profiles.html', reports=reports,
+                           sample_rate=current_app.config['PROFILE_SAMPLE_RATE'])
+
+@admin_bp.route('/profiles/<report_id>.<any(txt, prof, json):kind>')
+def profile_report(report_id, kind):
+    """One report: the text summary, the raw pstats file or the JSON summary."""
+    if not REPORT_ID.match(report_id):
+        abort(404)
+    return send_from_directory(profile_dir(current_app), f'{report_id}.{kind}',
+                               as_attachment=kind == 'prof', mimetype='text/plain' if kind == 'txt' else None)
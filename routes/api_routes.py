@@ -2,21 +2,36 @@
 API Routes - JSON API endpoints
 """
 
-from flask import Blueprint, jsonify, request
-from library_service import calculate_late_fee_for_book, search_books_in_catalog
+import json
+import time
+
+from flask import Blueprint, Response, current_app, jsonify, request
+from library_service import (
+    calculate_late_fee_for_book, search_books_in_catalog, search_books_in_catalog_batch
+)
+from services.availability_events import availability_hub
+from services.payment_service import gateway_breaker
+from services.suggest_index import suggest_index
+from routes.caching import conditional_get
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
 @api_bp.route('/late_fee/<patron_id>/<int:book_id>')
+@conditional_get('borrow_records', bucket_seconds=60)
 def get_late_fee(patron_id, book_id):
     """
     Calculate late fee for a specific book borrowed by a patron.
     API endpoint for R4: Late Fee Calculation
     """
     result = calculate_late_fee_for_book(patron_id, book_id)
-    return jsonify(result), 501 if 'not implemented' in result.get('status', '') else 200
+    # Same check as prepare_late_fee_payment: no fee information means the
+    # calculation is not available, not that the server failed
+    if not result or 'fee_amount' not in result:
+        return jsonify({'status': 'Late fee calculation not implemented'}), 501
+    return jsonify(result), 200
 
 @api_bp.route('/search')
+@conditional_get('books')
 def search_books_api():
     """
     Search for books via API endpoint.
@@ -37,3 +52,151 @@ def search_books_api():
         'results': books,
         'count': len(books)
     })
+
+# Limits for POST /api/search/batch
+MAX_BATCH_QUERIES = 50
+DEFAULT_BATCH_LIMIT = 20
+MAX_BATCH_LIMIT = 100
+SEARCH_TYPES = ('title', 'author', 'isbn')
+
+@api_bp.route('/search/batch', methods=['POST'])
+def search_books_batch_api():
+    """
+    Run many searches in one request.
+    Batch interface for R6: Book Search Functionality
+    
+    Request JSON:
+        {"queries": [{"id": "shelf-1", "q": "gatsby", "type": "title"}, ...],
+         "limit": 20}
+    
+    Response JSON has one entry per query under "results", keyed by the
+    query's "id" (or its position in the list when no id is given). Ids
+    must be unique and "type" one of title, author or isbn.
+    """
+    payload = request.get_json(silent=True) or {}
+    queries = payload.get('queries')
+    
+    if not isinstance(queries, list) or not queries:
+        return jsonify({'error': 'A non-empty "queries" list is required'}), 400
+    
+    if len(queries) > MAX_BATCH_QUERIES:
+        return jsonify({'error': f'At most {MAX_BATCH_QUERIES} queries per batch'}), 400
+    
+    try:
+        limit = int(payload.get('limit', DEFAULT_BATCH_LIMIT))
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Limit must be an integer'}), 400
+    limit = max(1, min(limit, MAX_BATCH_LIMIT))
+    
+    results = {}
+    keys = set()
+    valid = []
+    for position, query in enumerate(queries):
+        if not isinstance(query, dict):
+            return jsonify({'error': 'Each query must be an object'}), 400
+        key = str(query.get('id', position))
+        if key in keys:
+            return jsonify({'error': f'Duplicate query id "{key}"'}), 400
+        keys.add(key)
+        search_term = str(query.get('q', '')).strip()
+        search_type = query.get('type', 'title')
+        if not isinstance(search_type, str) or search_type not in SEARCH_TYPES:
+            return jsonify({'error': f'Query "{key}": type must be one of {", ".join(SEARCH_TYPES)}'}), 400
+        if not search_term:
+            results[key] = {'error': 'Search term is required'}
+        else:
+            valid.append((key, search_term, search_type))
+    
+    # Use business logic function
+    found = search_books_in_catalog_batch([(term, kind) for _, term, kind in valid], limit)
+    
+    for (key, search_term, search_type), books in zip(valid, found):
+        results[key] = {
+            'search_term': search_term,
+            'search_type': search_type,
+            'results': books,
+            'count': len(books)
+        }
+    
+    return jsonify({'results': results, 'limit': limit})
+
+# Limits for GET /api/suggest
+DEFAULT_SUGGEST_LIMIT = 8
+MAX_SUGGEST_QUERY_LENGTH = 100
+
+@api_bp.route('/suggest')
+def suggest_books_api():
+    """
+    Search-as-you-type suggestions for the catalog search box.
+    
+    Matches any word of a title or author that starts with q, most
+    borrowed books first. Served from the in-memory suggest index.
+    """
+    query = request.args.get('q', '')[:MAX_SUGGEST_QUERY_LENGTH]
+    limit = request.args.get('limit', DEFAULT_SUGGEST_LIMIT, type=int)
+    if limit < 1:
+        return jsonify({'error': 'limit must be a positive integer'}), 400
+    
+    refresh = current_app.extensions.get('suggest_refresh')
+    if refresh is not None:
+        refresh()
+    
+    results = suggest_index.suggest(query, min(limit, suggest_index.max_results))
+    return jsonify({'q': query, 'results': results, 'count': len(results)})
+
+@api_bp.route('/events')
+def availability_events():
+    """
+    Server-sent events stream of book availability changes.
+    
+    Each change is sent as an event with an "id:" field and data
+    {"book_id": ..., "available_copies": ...}. The client resumes after
+    the ID in the Last-Event-ID header (sent by reconnecting browsers) or
+    the last_event_id query parameter (rendered into the page, so changes
+    made between rendering and subscribing are not lost) and receives
+    what it missed; if that is no longer buffered it gets a "reset" event
+    and should reload.
+    
+    The stream stays open for EVENTS_STREAM_SECONDS (default 0: send
+    what is pending and close) and the browser reconnects after
+    EVENTS_RETRY_MS. An open stream holds a request thread, so only
+    raise the former on servers with threads to spare.
+    """
+    availability_hub.ensure_started()
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('last_event_id', type=int)
+    if last_id is None:
+        last_id = availability_hub.latest_id
+    stream_seconds = current_app.config['EVENTS_STREAM_SECONDS']
+    heartbeat_seconds = current_app.config['EVENTS_HEARTBEAT_SECONDS']
+    retry_ms = current_app.config['EVENTS_RETRY_MS']
+    
+    def generate(last_id):
+        yield f'retry: {retry_ms}\n\n'
+        deadline = time.monotonic() + stream_seconds
+        while True:
+            remaining = max(0.0, deadline - time.monotonic())
+            events = availability_hub.events_after(last_id, min(heartbeat_seconds, remaining))
+            if events is None:
+                last_id = availability_hub.latest_id
+                yield f'id: {last_id}\nevent: reset\ndata: {{}}\n\n'
+            elif events:
+                for event in events:
+                    data = json.dumps({'book_id': event['book_id'], 'available_copies': event['available_copies']})
+                    yield f"id: {event['id']}\ndata: {data}\n\n"
+                last_id = events[-1]['id']
+            elif remaining:
+                yield ': keep-alive\n\n'
+            if not remaining:
+                return
+    
+    return Response(generate(last_id), mimetype='text/event-stream',
+                    headers={'X-Accel-Buffering': 'no'})
+
+@api_bp.route('/payment/breaker')
+def payment_breaker_status():
+    """
+    Report the payment gateway circuit breaker state and trip counters.
+    """
+    return jsonify(gateway_breaker.snapshot())
@@ -0,0 +1,85 @@
+"""
+Async API Routes - Async variants of the JSON API endpoints
+
+Same responses as api_routes.py, but the views await the database and
+payment gateway instead of blocking on them (requires flask[async]).
+Under a WSGI server each request still occupies a worker thread while
+its view runs; the benefit is that independent I/O inside one request
+(several queries, several gateway calls) can be awaited concurrently.
+"""
+
+from flask import Blueprint, jsonify, request
+from async_database import run_db
+from library_service import (
+    calculate_late_fee_for_book, prepare_late_fee_payment, record_late_fee_payment, search_books_in_catalog
+)
+from routes.caching import conditional_get
+from services.async_payment_service import AsyncPaymentGateway
+
+async_api_bp = Blueprint('async_api', __name__, url_prefix='/api/async')
+
+@async_api_bp.route('/late_fee/<patron_id>/<int:book_id>')
+@conditional_get('borrow_records', bucket_seconds=60)
+async def get_late_fee(patron_id, book_id):
+    """
+    Calculate late fee for a specific book borrowed by a patron.
+    Async variant of /api/late_fee (R5)
+    """
+    result = await run_db(calculate_late_fee_for_book, patron_id, book_id)
+    # Same check as prepare_late_fee_payment: no fee information means the
+    # calculation is not available, not that the server failed
+    if not result or 'fee_amount' not in result:
+        return jsonify({'status': 'Late fee calculation not implemented'}), 501
+    return jsonify(result), 200
+
+@async_api_bp.route('/late_fee/<patron_id>/<int:book_id>/pay', methods=['POST'])
+async def pay_late_fee(patron_id, book_id):
+    """
+    Pay the late fee for a book through the payment gateway.
+    Async variant of pay_late_fees: the database steps run on the database
+    pool and only the charge on the gateway pool.
+    """
+    error, fee_amount, description = await run_db(prepare_late_fee_payment, patron_id, book_id)
+    if error:
+        return _payment_response(False, error, None)
+    
+    try:
+        success, transaction_id, message = await AsyncPaymentGateway().process_payment(
+            patron_id, fee_amount, description)
+    except Exception as e:
+        return _payment_response(False, f"Payment processing error: {str(e)}", None)
+    
+    if not success:
+        return _payment_response(False, f"Payment failed: {message}", None)
+    
+    await run_db(record_late_fee_payment, transaction_id, patron_id, book_id, fee_amount)
+    return _payment_response(True, f"Payment successful! {message}", transaction_id)
+
+def _payment_response(success, message, transaction_id):
+    return jsonify({
+        'success': success,
+        'message': message,
+        'transaction_id': transaction_id
+    }), 200 if success else 402
+
+@async_api_bp.route('/search')
+@conditional_get('books')
+async def search_books_api():
+    """
+    Search for books via API endpoint.
+    Async variant of /api/search (R6)
+    """
+    search_term = request.args.get('q', '').strip()
+    search_type = request.args.get('type', 'title')
+    
+    if not search_term:
+        return jsonify({'error': 'Search term is required'}), 400
+    
+    books = await run_db(search_books_in_catalog, search_term, search_type)
+    
+    return jsonify({
+        'search_term': search_term,
+        'search_type': search_type,
+        'results': books,
+        'count': len(books)
+    })
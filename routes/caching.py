@@ -0,0 +1,105 @@
+"""
+HTTP Caching - Conditional GET support for read-only views
+"""
+
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from repository import get_data_versions
+from metrics import cache_lookups
+
+
+def conditional_get(*tables, bucket_seconds=None):
+    """
+    Decorate a read-only view so unchanged responses are answered with 304.
+
+    The ETag is derived from the request URL and the change counters of the
+    given tables (bumped by triggers on every write), so a matching
+    If-None-Match (or an If-Modified-Since at or after the last write) is
+    answered without running the view: no query and no template render.
+
+    Write times have one-second resolution, so a write later in the same
+    second would not move Last-Modified. Until that second has passed the
+    response carries no Last-Modified and If-Modified-Since is ignored;
+    the ETag still applies.
+
+    Args:
+        tables: Tables the view reads from
+        bucket_seconds: Also vary by wall-clock time in buckets of this many
+            seconds, for views whose output depends on the current time
+            (e.g. late fees); a response is then reused for at most that long
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Works for async views too
+            run_view = current_app.ensure_sync(view)
+
+            # Pending flash messages are rendered into the page, so it cannot be reused
+            if '_flashes' in session:
+                return run_view(*args, **kwargs)
+
+            versions = get_data_versions()
+            parts = [request.full_path, str(versions['epoch']['version'])]
+            parts += [f"{table}:{versions[table]['version']}" for table in tables]
+            if bucket_seconds:
+                parts.append(str(int(time.time() // bucket_seconds)))
+            etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()[:24]
+            last_write = max(versions[table]['updated_at'] for table in tables)
+            last_modified = None
+            if not bucket_seconds and last_write < int(time.time()):
+                last_modified = datetime.fromtimestamp(last_write, tz=timezone.utc)
+
+            if _not_modified(etag, last_modified):
+                cache_lookups.inc('http_etag', 'hit')
+                response = make_response('', 304)
+            else:
+                cache_lookups.inc('http_etag', 'miss')
+                response = make_response(run_view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
+
+
+def _not_modified(etag, last_modified):
+    """
+    Evaluate the request's validators; If-None-Match takes precedence.
+    last_modified is None when If-Modified-Since cannot be trusted.
+    """
+    if request.if_none_match:
+        # Weak comparison, so tags weakened by compression still match
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def init_cache_control(app):
+    """
+    Apply per-route Cache-Control policies from app.config['CACHE_CONTROL'].
+
+    Keys are endpoint names ('catalog.catalog') or blueprint names
+    ('borrowing'); an endpoint entry wins over its blueprint's. Responses
+    that already carry a Cache-Control header are left alone.
+    """
+    app.config.setdefault('CACHE_CONTROL', {})
+
+    @app.after_request
+    def apply_cache_control(response):
+        if 'Cache-Control' in response.headers or request.endpoint is None:
+            return response
+        policies = app.config['CACHE_CONTROL']
+        policy = policies.get(request.endpoint)
+        if policy is None and request.blueprint:
+            policy = policies.get(request.blueprint)
+        if policy:
+            response.headers['Cache-Control'] = policy
+        return response
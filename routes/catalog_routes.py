@@ -3,8 +3,10 @@ Catalog Routes - Book catalog related endpoints
 """
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import get_all_books
+from repository import get_all_books, get_latest_availability_events
 from library_service import add_book_to_catalog
+from routes.caching import conditional_get
+from routes.fragment_cache import render_book_rows
 
 catalog_bp = Blueprint('catalog', __name__)
 
@@ -14,13 +16,19 @@ def index():
     return redirect(url_for('catalog.catalog'))
 
 @catalog_bp.route('/catalog')
+@conditional_get('books')
 def catalog():
     """
     Display all books in the catalog.
     Implements R2: Book Catalog Display
     """
+    # Read before the books: the page's live updates replay changes made after
+    # this ID, and replaying one the page already shows is harmless
+    latest = get_latest_availability_events(1)
+    last_event_id = latest[-1]['id'] if latest else 0
     books = get_all_books()
-    return render_template('catalog.html', books=books)
+    rows = render_book_rows('catalog_row', books)
+    return render_template('catalog.html', books=books, rows=rows, last_event_id=last_event_id)
 
 @catalog_bp.route('/add_book', methods=['GET', 'POST'])
 def add_book():
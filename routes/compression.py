@@ -0,0 +1,68 @@
+"""
+Response Compression - gzip/brotli encoding for HTML and JSON responses
+"""
+
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; fall back to gzip
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'text/plain', 'application/json', 'application/javascript')
+
+
+def init_compression(app):
+    """
+    Compress eligible responses according to the client's Accept-Encoding.
+
+    Uses app.config:
+        COMPRESS_MIN_SIZE: Smallest body (bytes) worth compressing
+        COMPRESS_LEVEL: gzip compression level (1-9)
+        COMPRESS_BROTLI_QUALITY: brotli quality (0-11), used when brotli is installed
+    """
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+
+    @app.after_request
+    def compress_response(response):
+        response.vary.add('Accept-Encoding')
+        if (response.status_code != 200
+                or response.direct_passthrough
+                or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding == 'br':
+            data = brotli.compress(data, quality=app.config['COMPRESS_BROTLI_QUALITY'])
+        elif encoding == 'gzip':
+            data = gzip.compress(data, compresslevel=app.config['COMPRESS_LEVEL'], mtime=0)
+        else:
+            return response
+
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        # The encoded body differs byte-for-byte from the identity one
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def choose_encoding(accept_encodings):
+    """Pick the best supported content coding from an Accept-Encoding header."""
+    if brotli is not None and accept_encodings['br'] > 0:
+        return 'br'
+    if accept_encodings['gzip'] > 0:
+        return 'gzip'
+    return None
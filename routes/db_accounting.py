@@ -0,0 +1,59 @@
+"""
+DB Accounting - Per-request database round trips in logs and debug headers
+"""
+
+import json
+import logging
+
+from flask import g, request
+
+from db_instrumentation import DbAccount, begin_account, end_account
+
+accounting_logger = logging.getLogger('library.db_accounting')
+
+
+def init_request_accounting(app):
+    """
+    Count each request's database round trips and report them.
+
+    Every request is logged to "library.db_accounting": at INFO, or at
+    WARNING when one statement ran at least N_PLUS_ONE_THRESHOLD times
+    (typically a query inside a loop). With DB_ACCOUNTING_HEADERS (on by
+    default in debug mode) responses also carry X-DB-Connections,
+    X-DB-Statements, X-DB-Rows and X-DB-Time-Ms.
+    """
+    app.config.setdefault('DB_ACCOUNTING_HEADERS', app.debug)
+    app.config.setdefault('N_PLUS_ONE_THRESHOLD', 10)
+
+    @app.before_request
+    def start_accounting():
+        account = DbAccount()
+        g.db_account = account
+        g.db_account_token = begin_account(account)
+
+    @app.after_request
+    def report_accounting(response):
+        account = g.get('db_account')
+        if account is None:
+            return response
+        if app.config['DB_ACCOUNTING_HEADERS']:
+            response.headers['X-DB-Connections'] = str(account.connections)
+            response.headers['X-DB-Statements'] = str(account.statements)
+            response.headers['X-DB-Rows'] = str(account.rows)
+            response.headers['X-DB-Time-Ms'] = f'{account.seconds * 1000:.3f}'
+
+        repeated = account.repeated(app.config['N_PLUS_ONE_THRESHOLD'])
+        level = logging.WARNING if repeated else logging.INFO
+        if accounting_logger.isEnabledFor(level):
+            details = dict(account.as_dict(), method=request.method, path=request.path,
+                           endpoint=request.endpoint)
+            if repeated:
+                details['repeated'] = [{'sql': sql, 'count': count} for sql, count in repeated]
+            accounting_logger.log(level, json.dumps(details))
+        return response
+
+    @app.teardown_request
+    def stop_accounting(exc):
+        token = g.pop('db_account_token', None)
+        if token is not None:
+            end_account(token)
@@ -0,0 +1,118 @@
+"""
+Fragment Cache - Reuse rendered catalog and search rows between requests
+
+A row only changes when its book changes, and update_book_availability
+bumps books.version whenever that happens, so a rendered row can be cached
+under (database, epoch, macro, book id, version) and pages are assembled
+from cached rows plus freshly rendered ones for changed books. The epoch
+(see get_data_versions) keeps rows of a recreated database, whose book
+ids and versions start over, from being served for the new one.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List
+
+from flask import get_template_attribute
+from markupsafe import Markup
+
+import database
+from repository import get_data_versions
+from metrics import cache_lookups
+
+ROW_TEMPLATE = '_book_rows.html'
+
+
+class FragmentCache:
+    """Thread-safe LRU cache of rendered HTML fragments, bounded by entry count."""
+
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: List[Hashable]) -> List:
+        """Look up keys under a single lock; missing entries come back as None."""
+        found = []
+        hits = 0
+        with self._lock:
+            for key in keys:
+                html = self._entries.get(key)
+                if html is not None:
+                    self._entries.move_to_end(key)
+                    hits += 1
+                found.append(html)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        if hits:
+            cache_lookups.inc('fragment', 'hit', amount=hits)
+        if len(keys) > hits:
+            cache_lookups.inc('fragment', 'miss', amount=len(keys) - hits)
+        return found
+
+    def put_many(self, items: Dict[Hashable, str]):
+        """Store rendered fragments, evicting the least recently used beyond max_entries."""
+        with self._lock:
+            self._entries.update(items)
+            for key in items:
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+row_cache = FragmentCache()
+
+
+def init_fragment_cache(app):
+    """Size the shared row cache from app.config['FRAGMENT_CACHE_SIZE']."""
+    app.config.setdefault('FRAGMENT_CACHE_SIZE', 20000)
+    row_cache.max_entries = app.config['FRAGMENT_CACHE_SIZE']
+
+
+def render_book_rows(macro_name: str, books: List[Dict]) -> Markup:
+    """
+    Render one table row per book with a macro from _book_rows.html.
+
+    Rows for books without a version (e.g. hand-built dicts) are rendered
+    every time rather than cached.
+
+    Args:
+        macro_name: 'catalog_row' or 'search_row'
+        books: Book dicts as returned by database.get_all_books
+
+    Returns:
+        Markup: The concatenated rows, ready to insert into a template
+    """
+    macro = get_template_attribute(ROW_TEMPLATE, macro_name)
+    keys = [None] * len(books)
+    if any('version' in book for book in books):
+        store = (database.DATABASE, get_data_versions()['epoch']['version'])
+        keys = [(store, macro_name, book['id'], book['version']) if 'version' in book else None
+                for book in books]
+    rows = row_cache.get_many([key for key in keys if key is not None])
+    cached = iter(rows)
+
+    parts = []
+    rendered = {}
+    for book, key in zip(books, keys):
+        html = next(cached) if key is not None else None
+        if html is None:
+            html = str(macro(book))
+            if key is not None:
+                rendered[key] = html
+        parts.append(html)
+
+    if rendered:
+        row_cache.put_many(rendered)
+    return Markup('\n'.join(parts))
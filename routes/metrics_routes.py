@@ -0,0 +1,128 @@
+"""
+Metrics Routes - Prometheus scrape endpoint and request instrumentation
+"""
+
+import atexit
+import os
+import threading
+import time
+
+from flask import Blueprint, Response, current_app, g, request
+
+import database
+from metrics import SqliteMetricsStore, http_request_duration, http_requests, registry
+
+metrics_bp = Blueprint('metrics', __name__)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_stores = {}
+_last_store = None
+_flusher_pid = None
+
+
+def get_metrics_store():
+    """
+    The shared store selected by app.config['METRICS_STORAGE'], or None for 'memory'.
+
+    'sqlite' (default) is a file next to the library database; any other
+    value is a path to a SQLite file.
+    """
+    global _last_store
+    storage = current_app.config['METRICS_STORAGE']
+    if storage == 'memory':
+        return None
+    location = database.DATABASE + '-metrics' if storage == 'sqlite' else storage
+    # Connections must not cross a fork, so each process opens its own
+    key = (os.getpid(), location)
+    if key not in _stores:
+        _stores[key] = SqliteMetricsStore(location)
+    _last_store = key
+    return _stores[key]
+
+
+@atexit.register
+def flush_metrics():
+    """
+    Flush this process's samples to the store it last used.
+
+    Called when a worker exits (serve.py's worker_exit hook, and atexit
+    otherwise), so a recycled worker's last samples are kept.
+    """
+    if _last_store is not None and _last_store[0] == os.getpid():
+        try:
+            registry.flush(_stores[_last_store])
+        except Exception:
+            pass
+
+
+@metrics_bp.route('/metrics')
+def prometheus_metrics():
+    """
+    All metrics in Prometheus text format.
+
+    With the shared store these are the totals of every worker process;
+    other workers' samples are at most METRICS_FLUSH_SECONDS old.
+    """
+    store = get_metrics_store()
+    if store is None:
+        totals = registry.collect()
+    else:
+        registry.flush(store)
+        totals = store.totals()
+    return Response(registry.render(totals), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def init_metrics(app):
+    """
+    Count and time every request, and flush this process's samples periodically.
+
+    Registered before the other request hooks so its timing covers them
+    (after_request hooks run in reverse order of registration).
+    METRICS_STORAGE is 'sqlite' (default), 'memory' (this process only), or
+    a path to a SQLite file. METRICS_FLUSH_SECONDS is the flush interval.
+    """
+    app.config.setdefault('METRICS_STORAGE', 'sqlite')
+    app.config.setdefault('METRICS_FLUSH_SECONDS', 5.0)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        blueprint = request.blueprint or ''
+        endpoint = request.endpoint or 'unmatched'
+        http_requests.inc(blueprint, endpoint, request.method, str(response.status_code))
+        started = g.get('request_started')
+        if started is not None:
+            http_request_duration.observe(time.perf_counter() - started, blueprint, endpoint)
+        if _flusher_pid != os.getpid():
+            _start_flusher(app)
+        return response
+
+
+def _start_flusher(app):
+    """
+    Flush this process's samples every METRICS_FLUSH_SECONDS on a daemon thread.
+
+    Started by the first request a process handles (i.e. after a fork), so
+    idle workers still publish what they recorded.
+    """
+    global _flusher_pid
+    _flusher_pid = os.getpid()
+    # Also remembers the store for flush_metrics() at exit
+    get_metrics_store()
+
+    def run():
+        while True:
+            time.sleep(app.config['METRICS_FLUSH_SECONDS'])
+            try:
+                with app.app_context():
+                    store = get_metrics_store()
+                if store is not None:
+                    registry.flush(store)
+            except Exception:
+                app.logger.exception("Flushing metrics failed")
+
+    threading.Thread(target=run, name='metrics-flush', daemon=True).start()
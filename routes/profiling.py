@@ -0,0 +1,208 @@
+"""
+Request Profiling - On-demand cProfile and tracemalloc reports for single requests
+
+A request is profiled when it carries PROFILE_TOKEN in the X-Profile-Token
+header, or at random for one request in PROFILE_SAMPLE_RATE. The token is
+not accepted as a query parameter, where it would end up in access and
+proxy logs. The report is written to PROFILE_DIR:
+    <id>.prof  pstats data (python -m pstats, snakeviz)
+    <id>.txt   the slowest functions and the biggest allocation sites
+    <id>.json  request summary, listed at /admin/profiles
+The response names the report in an X-Profile-Id header. Only the newest
+PROFILE_KEEP reports are kept.
+
+cProfile only follows the request's own thread, but tracemalloc traces the
+whole process, so each process profiles one request at a time and others
+arriving meanwhile run unprofiled.
+"""
+
+import cProfile
+import hmac
+import io
+import itertools
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+from flask import g, request
+
+import database
+
+# Report IDs, as generated by _report_id; also what the admin routes accept
+# (including the shorter IDs of reports written by earlier versions)
+REPORT_ID = re.compile(r'^[0-9]{8}-[0-9]{6}(-[0-9]+){2,3}-[A-Za-z0-9_.]+$')
+
+_profiling = threading.Lock()
+_sequence = itertools.count(1)
+
+
+def profile_dir(app) -> str:
+    """Directory reports are written to (default: 'profiles' next to the library database)."""
+    return app.config['PROFILE_DIR'] or os.path.join(
+        os.path.dirname(os.path.abspath(database.DATABASE)), 'profiles')
+
+
+def list_profiles(directory: str, limit: Optional[int] = None) -> List[Dict]:
+    """Summaries of the reports in directory, newest first."""
+    try:
+        names = [name[:-5] for name in os.listdir(directory) if name.endswith('.json')]
+    except FileNotFoundError:
+        return []
+    summaries = []
+    for report_id in sorted(names, reverse=True)[:limit]:
+        try:
+            with open(os.path.join(directory, report_id + '.json')) as f:
+                summaries.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return summaries
+
+
+class RequestProfile:
+    """cProfile and tracemalloc running around one request on this thread."""
+
+    def __init__(self, trigger: str, top: int):
+        self.trigger = trigger
+        self.top = top
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self.before = tracemalloc.take_snapshot()
+        self.started = time.perf_counter()
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def finish(self, directory: str, status: int) -> str:
+        """Stop profiling and write the report; returns its ID."""
+        self.profiler.disable()
+        seconds = time.perf_counter() - self.started
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if self.started_tracing:
+            tracemalloc.stop()
+
+        report_id = _report_id(request.endpoint)
+        summary = {
+            'id': report_id,
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': status,
+            'ms': round(seconds * 1000, 2),
+            'trigger': self.trigger,
+            'peak_kb': round(peak / 1024, 1),
+            'pid': os.getpid(),
+        }
+        allocations = after.compare_to(self.before, 'lineno')
+
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, report_id)
+        self.profiler.dump_stats(base + '.prof')
+        with open(base + '.txt', 'w') as f:
+            f.write(self._text_report(summary, allocations))
+        # Written last: the index only lists complete reports
+        with open(base + '.json', 'w') as f:
+            json.dump(summary, f)
+        return report_id
+
+    def _text_report(self, summary: Dict, allocations) -> str:
+        out = io.StringIO()
+        out.write(f"{summary['method']} {summary['path']} -> {summary['status']} in {summary['ms']} ms "
+                  f"(endpoint {summary['endpoint']}, {summary['trigger']}, pid {summary['pid']})\n")
+        out.write(f"Peak traced memory: {summary['peak_kb']} KiB\n\n")
+        stats = pstats.Stats(self.profiler, stream=out)
+        stats.sort_stats('cumulative').print_stats(self.top)
+        out.write(f"Top {self.top} allocation sites (net change during the request):\n")
+        for stat in allocations[:self.top]:
+            out.write(f"  {stat}\n")
+        return out.getvalue()
+
+
+def _report_id(endpoint: Optional[str]) -> str:
+    """
+    UTC time to the nanosecond, pid, sequence number and endpoint, every
+    number zero-padded, so that sorting IDs as strings sorts them by time
+    (list_profiles and _prune rely on it) across all worker processes.
+    """
+    label = re.sub(r'[^A-Za-z0-9_.]', '_', endpoint or 'unmatched')
+    seconds, nanoseconds = divmod(time.time_ns(), 1_000_000_000)
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.gmtime(seconds))
+    return f"{stamp}-{nanoseconds:09d}-{os.getpid():07d}-{next(_sequence):06d}-{label}"
+
+
+def _prune(directory: str, keep: int):
+    for summary in list_profiles(directory)[keep:]:
+        for suffix in ('.json', '.prof', '.txt'):
+            try:
+                os.remove(os.path.join(directory, summary['id'] + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def init_profiling(app):
+    """
+    Profile requests that ask for it, and optionally a random sample of all requests.
+
+    Uses app.config:
+        PROFILE_TOKEN: Secret that requests a profile; unset disables on-demand profiling
+        PROFILE_SAMPLE_RATE: Profile one request in this many at random (0 = never)
+        PROFILE_DIR: Where reports go (default: 'profiles' next to the library database)
+        PROFILE_KEEP: Number of reports kept
+        PROFILE_TOP: Functions and allocation sites listed in each text report
+    """
+    app.config.setdefault('PROFILE_TOKEN', os.environ.get('PROFILE_TOKEN'))
+    app.config.setdefault('PROFILE_SAMPLE_RATE', int(os.environ.get('PROFILE_SAMPLE_RATE', '0')))
+    app.config.setdefault('PROFILE_DIR', os.environ.get('PROFILE_DIR'))
+    app.config.setdefault('PROFILE_KEEP', 200)
+    app.config.setdefault('PROFILE_TOP', 40)
+
+    def trigger() -> Optional[str]:
+        token = app.config['PROFILE_TOKEN']
+        if token:
+            given = request.headers.get('X-Profile-Token')
+            if given and hmac.compare_digest(given, token):
+                return 'requested'
+        rate = app.config['PROFILE_SAMPLE_RATE']
+        if rate and random.randrange(rate) == 0:
+            return 'sampled'
+        return None
+
+    @app.before_request
+    def start_profile():
+        reason = trigger()
+        if reason and _profiling.acquire(blocking=False):
+            g.request_profile = RequestProfile(reason, app.config['PROFILE_TOP'])
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            try:
+                response.headers['X-Profile-Id'] = _write(profile, response.status_code)
+            finally:
+                _profiling.release()
+        return response
+
+    @app.teardown_request
+    def abandon_profile(exc):
+        # The view raised, so after_request never ran
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            try:
+                _write(profile, 500)
+            finally:
+                _profiling.release()
+
+    def _write(profile: RequestProfile, status: int) -> str:
+        directory = profile_dir(app)
+        report_id = profile.finish(directory, status)
+        _prune(directory, app.config['PROFILE_KEEP'])
+        return report_id
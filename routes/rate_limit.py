@@ -0,0 +1,174 @@
+"""
+Rate Limiting - Token-bucket admission control for write endpoints
+
+Each (blueprint, patron ID) and (blueprint, client IP) pair gets a token
+bucket; a write request takes one token from each and is rejected with
+429 and Retry-After when either is empty, in which case it takes none.
+The patron ID comes from the form or the URL. Buckets live in a small
+SQLite file next to the library database so every worker process on the
+host shares them; the check is one short transaction on a per-thread
+connection, and buckets that have refilled completely are deleted.
+"""
+
+import math
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Sequence, Tuple
+
+from flask import Response, request
+
+import database
+
+CREATE_BUCKETS = '''
+    CREATE TABLE IF NOT EXISTS token_buckets (
+        key TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated REAL NOT NULL,
+        full_at REAL NOT NULL
+    )
+'''
+
+SAVE_BUCKET = '''
+    INSERT INTO token_buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = excluded.tokens, updated = excluded.updated, full_at = excluded.full_at
+'''
+
+# Seconds between deletions of buckets that have refilled completely; a
+# full bucket behaves exactly like a missing one, so nothing is lost
+PRUNE_INTERVAL = 60
+
+
+def _refill(bucket: Optional[Tuple[float, float, float]], burst: float, rate: float, now: float) -> float:
+    """Tokens in a (tokens, updated, full_at) bucket at now; a missing bucket is full."""
+    if bucket is None:
+        return burst
+    tokens, updated, _ = bucket
+    return min(burst, tokens + (now - updated) * rate)
+
+
+def _decide(levels: List[float], rate: float) -> Tuple[bool, float]:
+    """Allowed only if every bucket has a token; otherwise how long until they all do."""
+    if all(level >= 1 for level in levels):
+        return True, 0.0
+    return False, max((1 - level) / rate for level in levels if level < 1)
+
+
+class SqliteBucketStore:
+    """Token buckets in a SQLite file, shared by all processes that open it."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._pruned_at = time.time()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+            # Bucket state is disposable; trade durability for speed
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(CREATE_BUCKETS)
+            self._local.conn = conn
+        return conn
+
+    def take(self, keys: Sequence[str], burst: float, rate: float) -> Tuple[bool, float]:
+        """
+        Take one token from each of the buckets for keys, or from none of them.
+
+        A request rejected by one bucket doesn't spend tokens from the
+        others, so it can't drain, say, the bucket of a patron ID it names.
+
+        Returns:
+            tuple: (allowed: bool, retry_after_seconds: float)
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            placeholders = ', '.join('?' for _ in keys)
+            stored = {row[0]: row[1:] for row in conn.execute(
+                f'SELECT key, tokens, updated, full_at FROM token_buckets WHERE key IN ({placeholders})', list(keys))}
+            levels = [_refill(stored.get(key), burst, rate, now) for key in keys]
+            allowed, retry_after = _decide(levels, rate)
+            if allowed:
+                conn.executemany(SAVE_BUCKET, [(key, level - 1, now, now + (burst - level + 1) / rate)
+                                               for key, level in zip(keys, levels)])
+            if now - self._pruned_at > PRUNE_INTERVAL:
+                self._pruned_at = now
+                conn.execute('DELETE FROM token_buckets WHERE full_at <= ?', (now,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+
+class MemoryBucketStore:
+    """Token buckets in process memory (single-process servers and tests)."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._pruned_at = time.time()
+
+    def take(self, keys: Sequence[str], burst: float, rate: float) -> Tuple[bool, float]:
+        """See SqliteBucketStore.take."""
+        now = time.time()
+        with self._lock:
+            levels = [_refill(self._buckets.get(key), burst, rate, now) for key in keys]
+            allowed, retry_after = _decide(levels, rate)
+            if allowed:
+                for key, level in zip(keys, levels):
+                    self._buckets[key] = (level - 1, now, now + (burst - level + 1) / rate)
+            if now - self._pruned_at > PRUNE_INTERVAL:
+                self._pruned_at = now
+                self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+        return allowed, retry_after
+
+
+def init_rate_limiting(app):
+    """
+    Enforce app.config['RATE_LIMITS'] on write requests.
+
+    RATE_LIMITS maps a blueprint name to {'burst': tokens, 'rate': tokens
+    per second}. RATE_LIMIT_STORAGE is 'sqlite' (default; a file next to
+    the library database), 'memory', or a path to a SQLite file.
+    """
+    app.config.setdefault('RATE_LIMITS', {})
+    app.config.setdefault('RATE_LIMIT_STORAGE', 'sqlite')
+    app.config.setdefault('RATE_LIMIT_METHODS', ('POST', 'PUT', 'PATCH', 'DELETE'))
+    stores = {}
+
+    def get_store():
+        storage = app.config['RATE_LIMIT_STORAGE']
+        if storage == 'memory':
+            location = 'memory'
+        elif storage == 'sqlite':
+            location = database.DATABASE + '-ratelimit'
+        else:
+            location = storage
+        if location not in stores:
+            stores[location] = MemoryBucketStore() if location == 'memory' else SqliteBucketStore(location)
+        return stores[location]
+
+    @app.before_request
+    def check_rate_limit():
+        limit = app.config['RATE_LIMITS'].get(request.blueprint)
+        if limit is None or request.method not in app.config['RATE_LIMIT_METHODS']:
+            return None
+
+        store = get_store()
+        keys = [f'{request.blueprint}:ip:{request.remote_addr}']
+        patron_id = request.form.get('patron_id') or (request.view_args or {}).get('patron_id') or ''
+        patron_id = str(patron_id).strip()
+        if patron_id:
+            keys.append(f'{request.blueprint}:patron:{patron_id}')
+
+        allowed, retry_after = store.take(keys, limit['burst'], limit['rate'])
+        if not allowed:
+            return Response('Too many requests. Please try again later.', 429,
+                            {'Retry-After': str(max(1, math.ceil(retry_after)))}, mimetype='text/plain')
+        return None
@@ -4,6 +4,7 @@ Search Routes - Book search functionality
 
 from flask import Blueprint, render_template, request, flash
 from library_service import search_books_in_catalog
+from routes.fragment_cache import render_book_rows
 
 search_bp = Blueprint('search', __name__)
 
@@ -25,4 +26,5 @@ def search_books():
     if not books:
         flash('Search functionality is not yet implemented.', 'error')
     
-    return render_template('search.html', books=books, search_term=search_term, search_type=search_type)
+    rows = render_book_rows('search_row', books)
+    return render_template('search.html', books=books, rows=rows, search_term=search_term, search_type=search_type)
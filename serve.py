@@ -0,0 +1,92 @@
+"""
+Production server entry point for the Library Management System.
+
+Runs the app from create_app() under gunicorn with preforked worker
+processes, each serving requests on a small thread pool. The app (and so
+init_database()) is loaded once in the master process before forking;
+workers inherit it instead of each initializing the database again.
+
+Usage:
+    python serve.py --bind 0.0.0.0:5000 --workers 4 --threads 4 --max-requests 1000
+
+Signals to the master process:
+    HUP  - gracefully replace all workers (in-flight requests finish first)
+    TERM - graceful shutdown
+    USR2 - start a new master with re-imported code (then TERM the old one)
+
+`python app.py` remains the single-process debug server for development.
+"""
+
+import argparse
+import multiprocessing
+import os
+
+from app import create_app
+from routes.metrics_routes import flush_metrics
+
+
+def default_workers() -> int:
+    """Worker processes: gunicorn's usual 2 x cores + 1."""
+    return multiprocessing.cpu_count() * 2 + 1
+
+
+def default_threads() -> int:
+    """Threads per worker: one per core, at least two so a slow request doesn't block the worker."""
+    return max(2, multiprocessing.cpu_count())
+
+
+def build_options(argv=None) -> dict:
+    """Parse command line options (each also settable through an environment variable)."""
+    env = os.environ.get
+    parser = argparse.ArgumentParser(description="Run the library app under a preforking server.")
+    parser.add_argument('--bind', default=env('LIBRARY_BIND', '0.0.0.0:5000'))
+    parser.add_argument('--workers', type=int, default=int(env('LIBRARY_WORKERS', default_workers())))
+    parser.add_argument('--threads', type=int, default=int(env('LIBRARY_THREADS', default_threads())))
+    parser.add_argument('--max-requests', type=int, default=int(env('LIBRARY_MAX_REQUESTS', 1000)),
+                        help="Recycle a worker after this many requests (0 disables)")
+    parser.add_argument('--max-requests-jitter', type=int, default=int(env('LIBRARY_MAX_REQUESTS_JITTER', 100)),
+                        help="Random extra requests per worker so they don't all recycle at once")
+    parser.add_argument('--timeout', type=int, default=int(env('LIBRARY_TIMEOUT', 30)))
+    parser.add_argument('--graceful-timeout', type=int, default=int(env('LIBRARY_GRACEFUL_TIMEOUT', 30)))
+    parser.add_argument('--access-log', default=env('LIBRARY_ACCESS_LOG'),
+                        help="Access log file, '-' for stdout (off by default)")
+    args = parser.parse_args(argv)
+
+    return {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests_jitter,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'accesslog': args.access_log,
+        'preload_app': True,
+        # Recycled workers publish their last metrics before exiting
+        'worker_exit': lambda server, worker: flush_metrics(),
+    }
+
+
+def main(argv=None):
+    """Initialize the app once, then hand it to gunicorn's arbiter."""
+    # Imported here so this module can be imported on platforms without gunicorn
+    from gunicorn.app.base import BaseApplication
+
+    options = build_options(argv)
+    app = create_app()
+
+    class LibraryServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    LibraryServer().run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Loan Archival Module - Move old returned loans out of borrow_records
+
+borrow_records only needs the loans that borrowing and returning look
+at, but every returned loan used to stay in it forever. This job moves
+loans returned more than --days days ago to borrow_records_archive,
+walking the table in ID order in batches of --batch-size. Each batch is
+its own short write transaction, with an optional --pause-ms between
+batches so other writers get the lock. Loans returned later are picked
+up by the next run, so the job is safe to run as often as wanted (e.g.
+nightly from cron) and to interrupt at any point.
+
+History reads (get_patron_borrow_history, get_book_popularity) cover
+both tables, so archiving changes no results.
+
+Usage:
+    python -m services.archival --days 365 --batch-size 500 --pause-ms 10
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from repository import archive_returned_loans
+
+
+def archive_loans(older_than_days: int = 365, batch_size: int = 500, pause_ms: float = 0,
+                  now: Optional[datetime] = None) -> Dict:
+    """
+    Archive every loan returned more than older_than_days days before now.
+
+    Returns:
+        dict: Loans moved, batches run, the cutoff and elapsed seconds
+    """
+    started = time.perf_counter()
+    cutoff = (now or datetime.now()) - timedelta(days=older_than_days)
+    moved = batches = 0
+    last_id = 0
+    while True:
+        count, next_id = archive_returned_loans(cutoff, last_id, batch_size)
+        if next_id == last_id:
+            break
+        moved += count
+        batches += 1
+        last_id = next_id
+        if pause_ms:
+            time.sleep(pause_ms / 1000)
+    return {
+        'archived': moved,
+        'batches': batches,
+        'returned_before': cutoff.isoformat(),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Move loans returned long ago to borrow_records_archive.")
+    parser.add_argument('--days', type=int, default=365, help="Archive loans returned more than this many days ago")
+    parser.add_argument('--batch-size', type=int, default=500, help="Loans moved per write transaction")
+    parser.add_argument('--pause-ms', type=float, default=0, help="Sleep between batches")
+    args = parser.parse_args(argv)
+
+    print(json.dumps(archive_loans(args.days, args.batch_size, args.pause_ms)))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,57 @@
+"""
+Async Payment Service Module - Awaitable payment gateway calls
+Gateway requests run on their own thread pool, separate from the database
+pool in async_database.py, so a slow payment provider cannot starve
+database work. Several gateway calls can be awaited concurrently, e.g.
+with asyncio.gather.
+"""
+
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from services.payment_service import PaymentGateway
+
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('PAYMENT_GATEWAY_THREADS', '16')),
+                               thread_name_prefix='payment-gateway')
+
+
+async def run_gateway(func, *args, **kwargs):
+    """Run a blocking gateway call on the gateway thread pool and await it."""
+    # Imported on first use: asyncio is only needed once an async view runs
+    import asyncio
+    loop = asyncio.get_running_loop()
+    # Run in a copy of the caller's context, as run_db does, so per-request accounting follows the call
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await loop.run_in_executor(_executor, call)
+
+
+class AsyncPaymentGateway:
+    """
+    Awaitable facade over PaymentGateway.
+
+    Usage:
+        gateway = AsyncPaymentGateway()
+        success, txn_id, msg = await gateway.process_payment("123456", 10.50, "Late fees")
+    """
+
+    def __init__(self, gateway: Optional[PaymentGateway] = None):
+        """
+        Args:
+            gateway: Synchronous gateway to delegate to (a new PaymentGateway by default)
+        """
+        self.gateway = gateway or PaymentGateway()
+
+    async def process_payment(self, patron_id: str, amount: float, description: str = "") -> Tuple[bool, str, str]:
+        """Process a payment; see PaymentGateway.process_payment."""
+        return await run_gateway(self.gateway.process_payment, patron_id, amount, description)
+
+    async def refund_payment(self, transaction_id: str, amount: float) -> Tuple[bool, str]:
+        """Refund a previous payment; see PaymentGateway.refund_payment."""
+        return await run_gateway(self.gateway.refund_payment, transaction_id, amount)
+
+    async def verify_payment_status(self, transaction_id: str) -> Dict:
+        """Check the status of a payment; see PaymentGateway.verify_payment_status."""
+        return await run_gateway(self.gateway.verify_payment_status, transaction_id)
@@ -0,0 +1,176 @@
+"""
+Availability Events Module - Fan-out of book availability changes
+
+A trigger on books appends every available_copies change to the
+availability_events table, so changes made by any worker process get one
+global, ordered ID. Each process runs a single poller thread that reads
+new rows into a ring buffer and wakes the waiting subscribers (the
+/api/events streams). However many clients are subscribed, a process
+holds at most one database connection for this at a time. The buffer
+also serves Last-Event-ID resumes after a reconnect.
+
+update_book_availability wakes the poller through a write listener, so
+changes made in the same process are pushed without waiting for the
+next poll.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import database
+import repository
+
+logger = logging.getLogger(__name__)
+
+
+class AvailabilityHub:
+    """Per-process buffer of recent availability changes that subscribers wait on."""
+
+    def __init__(self, buffer_size: int = 1000, poll_interval: float = 1.0,
+                 log_size: int = 10000, prune_interval: float = 300):
+        """
+        Args:
+            buffer_size: Changes kept in memory for Last-Event-ID resumes
+            poll_interval: Seconds between checks for changes made by other processes
+            log_size: Rows kept in the availability_events table when pruning
+            prune_interval: Seconds between prunes of the table
+        """
+        self.buffer_size = buffer_size
+        self.poll_interval = poll_interval
+        self.log_size = log_size
+        self.prune_interval = prune_interval
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._events = deque()
+        self._last_id = 0
+        self._dropped_through = 0
+        self._owner = None
+        self._generation = 0
+
+    def ensure_started(self):
+        """
+        Start the poller for this process and repository if it isn't running.
+
+        Started lazily on the first subscription rather than at app
+        creation, so preforked workers each start their own thread after
+        the fork.
+        """
+        owner = (os.getpid(), database.DATABASE, repository.get_repository())
+        with self._cond:
+            if self._owner == owner:
+                return
+            self._owner = owner
+            self._generation += 1
+            recent = repository.get_latest_availability_events(self.buffer_size)
+            self._events = deque(recent)
+            self._last_id = recent[-1]['id'] if recent else 0
+            self._dropped_through = recent[0]['id'] - 1 if recent else 0
+            generation = self._generation
+        threading.Thread(target=self._run, args=(generation,), name='availability-events',
+                         daemon=True).start()
+
+    def stop(self):
+        """Stop the poller; the next ensure_started() starts a fresh one."""
+        with self._cond:
+            self._owner = None
+            self._generation += 1
+            self._cond.notify_all()
+        self._wake.set()
+
+    def wake(self):
+        """Poll now instead of at the next interval."""
+        self._wake.set()
+
+    @property
+    def latest_id(self) -> int:
+        """ID of the newest change this process has seen."""
+        return self._last_id
+
+    def poll(self):
+        """Read changes made since the last poll into the buffer and wake subscribers."""
+        while True:
+            rows = repository.get_availability_events(self._last_id, self.buffer_size)
+            if not rows:
+                return
+            with self._cond:
+                for row in rows:
+                    if row['id'] <= self._last_id:
+                        continue
+                    if len(self._events) >= self.buffer_size:
+                        self._dropped_through = self._events.popleft()['id']
+                    self._events.append(row)
+                    self._last_id = row['id']
+                self._cond.notify_all()
+            if len(rows) < self.buffer_size:
+                return
+
+    def events_after(self, last_id: int, timeout: float) -> Optional[List[Dict]]:
+        """
+        Wait up to timeout seconds for changes newer than last_id.
+
+        Returns:
+            list: The changes after last_id, oldest first (empty on timeout),
+            or None if some of them are no longer buffered and the
+            subscriber has to reload instead of resuming
+        """
+        with self._cond:
+            if last_id < self._dropped_through:
+                return None
+            self._cond.wait_for(lambda: self._last_id > last_id, timeout)
+            newer = []
+            for event in reversed(self._events):
+                if event['id'] <= last_id:
+                    break
+                newer.append(event)
+            newer.reverse()
+            return newer
+
+    def _run(self, generation: int):
+        last_prune = time.monotonic()
+        while generation == self._generation:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if generation != self._generation:
+                return
+            try:
+                self.poll()
+                if time.monotonic() - last_prune > self.prune_interval:
+                    last_prune = time.monotonic()
+                    repository.prune_availability_events(self.log_size)
+            except Exception:
+                logger.exception("Polling availability events failed")
+
+
+availability_hub = AvailabilityHub()
+
+
+def _on_availability_changed(book_id: int):
+    availability_hub.wake()
+
+
+database.add_write_listener('availability_changed', _on_availability_changed)
+
+
+def init_availability_events(app):
+    """
+    Configure the shared hub and the /api/events stream from app.config.
+
+    EVENTS_STREAM_SECONDS: how long one stream stays open before the client
+    reconnects (with Last-Event-ID). The default of 0 sends what is pending
+    and closes, so a subscribed page doesn't hold a request thread between
+    changes. EVENTS_RETRY_MS: how long the browser waits before
+    reconnecting, i.e. the update latency when streams don't stay open.
+    EVENTS_HEARTBEAT_SECONDS: interval of keep-alive comments on an idle
+    stream. EVENTS_BUFFER_SIZE and EVENTS_POLL_SECONDS tune the hub.
+    """
+    app.config.setdefault('EVENTS_STREAM_SECONDS', 0)
+    app.config.setdefault('EVENTS_RETRY_MS', 3000)
+    app.config.setdefault('EVENTS_HEARTBEAT_SECONDS', 15)
+    app.config.setdefault('EVENTS_BUFFER_SIZE', 1000)
+    app.config.setdefault('EVENTS_POLL_SECONDS', 1.0)
+    availability_hub.buffer_size = app.config['EVENTS_BUFFER_SIZE']
+    availability_hub.poll_interval = app.config['EVENTS_POLL_SECONDS']
@@ -0,0 +1,180 @@
+"""
+Circuit Breaker Module - Fail fast when a downstream service is unhealthy
+Used around PaymentGateway HTTP calls so that an outage at the payment
+provider does not tie up request threads waiting on timeouts.
+
+States:
+    closed    - calls pass through; consecutive failures are counted
+    open      - calls are rejected immediately with CircuitOpenError
+    half_open - after reset_timeout a limited number of trial calls pass;
+                a success closes the circuit, a failure re-opens it
+
+Every state change starts a new generation. A call only affects the state
+if it finishes in the generation it was admitted in, so a slow call that
+started while the circuit was closed cannot close (or re-open) it as if
+it were a half-open trial.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Tuple, Type
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the protected function while the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker.
+
+    Usage:
+        breaker = CircuitBreaker('payment_gateway', failure_threshold=5, reset_timeout=30)
+        result = breaker.call(gateway_request, ...)
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 half_open_max_calls: int = 1,
+                 failure_exceptions: Tuple[Type[BaseException], ...] = (Exception,),
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            name: Name used in status output
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds to stay open before allowing trial calls
+            half_open_max_calls: Trial calls allowed concurrently while half-open
+            failure_exceptions: Exception types that count as failures; others
+                propagate without affecting the breaker
+            clock: Monotonic time source (injectable for testing)
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.failure_exceptions = failure_exceptions
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.reset()
+
+    def reset(self):
+        """Close the circuit and clear all counters."""
+        with self._lock:
+            self._set_state(CLOSED)
+            self._consecutive_failures = 0
+            self._opened_at = 0.0
+            self._half_open_in_flight = 0
+            self.calls = 0
+            self.successes = 0
+            self.failures = 0
+            self.rejected = 0
+            self.trips = 0
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the reset timeout has passed."""
+        with self._lock:
+            self._refresh_state()
+            return self._state
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        Call func through the breaker.
+
+        Raises:
+            CircuitOpenError: If the circuit is open (func is not called)
+        """
+        generation = self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except self.failure_exceptions:
+            self._record(generation, success=False)
+            raise
+        except BaseException:
+            # Not a downstream failure, but not a success either: only release any half-open slot
+            self._release_trial(generation)
+            raise
+        self._record(generation, success=True)
+        return result
+
+    def snapshot(self) -> Dict:
+        """Return state and counters for monitoring endpoints."""
+        with self._lock:
+            self._refresh_state()
+            retry_in = 0.0
+            if self._state == OPEN:
+                retry_in = max(0.0, self._opened_at + self.reset_timeout - self._clock())
+            return {
+                'name': self.name,
+                'state': self._state,
+                'consecutive_failures': self._consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'retry_in': round(retry_in, 3),
+                'calls': self.calls,
+                'successes': self.successes,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'trips': self.trips
+            }
+
+    def _set_state(self, state: str):
+        # Caller holds the lock
+        self._state = state
+        self._generation += 1
+
+    def _refresh_state(self):
+        # Caller holds the lock
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._set_state(HALF_OPEN)
+            self._half_open_in_flight = 0
+
+    def _before_call(self) -> int:
+        """Admit a call or raise CircuitOpenError; returns the generation it was admitted in."""
+        with self._lock:
+            self._refresh_state()
+            if self._state == OPEN or (
+                    self._state == HALF_OPEN and self._half_open_in_flight >= self.half_open_max_calls):
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit '{self.name}' is open; failing fast")
+            if self._state == HALF_OPEN:
+                self._half_open_in_flight += 1
+            self.calls += 1
+            return self._generation
+
+    def _release_trial(self, generation: int):
+        with self._lock:
+            if generation == self._generation and self._state == HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+
+    def _record(self, generation: int, success: bool):
+        with self._lock:
+            if success:
+                self.successes += 1
+            else:
+                self.failures += 1
+            if generation != self._generation:
+                # Admitted before the last state change; counted, but it says
+                # nothing about the downstream service since then
+                return
+
+            was_trial = self._state == HALF_OPEN
+            if was_trial:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+
+            if success:
+                self._consecutive_failures = 0
+                if was_trial:
+                    self._set_state(CLOSED)
+                return
+
+            self._consecutive_failures += 1
+            if was_trial or (self._state == CLOSED and self._consecutive_failures >= self.failure_threshold):
+                self._set_state(OPEN)
+                self._opened_at = self._clock()
+                self.trips += 1
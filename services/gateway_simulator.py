@@ -0,0 +1,361 @@
+"""
+Payment Gateway Simulator - Local stand-in for the external payment API
+Serves the charge, refund and status endpoints that PaymentGateway talks to
+when it is configured with a base URL, with configurable latency, error
+rates, hanging requests and rate limits.
+
+Run it from the command line:
+    python -m services.gateway_simulator --port 8900 --profile realistic
+
+and point the application at it:
+    PAYMENT_GATEWAY_URL=http://127.0.0.1:8900 python app.py
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'normal', 'lognormal', 'exponential')
+
+
+@dataclass
+class GatewayProfile:
+    """
+    Behaviour of the simulated gateway.
+
+    Attributes:
+        latency_dist: One of LATENCY_DISTRIBUTIONS
+        latency_ms: Mean (or fixed) response latency in milliseconds
+        latency_spread_ms: Spread of the distribution (half-width for uniform,
+            standard deviation for normal/lognormal, unused otherwise)
+        error_rate: Fraction of requests answered with HTTP 503
+        timeout_rate: Fraction of requests that hang for hang_seconds
+        hang_seconds: How long a "timed out" request hangs before answering
+        rate_limit: Sustained requests per second allowed (0 disables)
+        rate_burst: Bucket size for the rate limiter
+    """
+    latency_dist: str = 'fixed'
+    latency_ms: float = 0.0
+    latency_spread_ms: float = 0.0
+    error_rate: float = 0.0
+    timeout_rate: float = 0.0
+    hang_seconds: float = 30.0
+    rate_limit: float = 0.0
+    rate_burst: int = 10
+
+
+PROFILES = {
+    'ideal': GatewayProfile(),
+    'realistic': GatewayProfile(latency_dist='lognormal', latency_ms=120, latency_spread_ms=60,
+                                error_rate=0.01, timeout_rate=0.002, rate_limit=100, rate_burst=50),
+    'slow': GatewayProfile(latency_dist='normal', latency_ms=500, latency_spread_ms=150),
+    'degraded': GatewayProfile(latency_dist='lognormal', latency_ms=800, latency_spread_ms=600,
+                               error_rate=0.2, timeout_rate=0.05),
+    'outage': GatewayProfile(latency_ms=50, error_rate=1.0),
+}
+
+
+class GatewaySimulator:
+    """
+    Threaded HTTP server emulating the payment provider.
+
+    Usage:
+        with GatewaySimulator(profile='realistic') as simulator:
+            gateway = PaymentGateway(base_url=simulator.url)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, profile='ideal', seed: Optional[int] = None):
+        """
+        Args:
+            host: Interface to bind to
+            port: Port to listen on (0 picks a free port)
+            profile: A GatewayProfile or the name of one in PROFILES
+            seed: Seed for the latency/failure random generator
+        """
+        self.profile = PROFILES[profile] if isinstance(profile, str) else profile
+        if self.profile.latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {self.profile.latency_dist}")
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._charges: Dict[str, Dict] = {}
+        self._sequence = 0
+        self._tokens = float(self.profile.rate_burst)
+        self._last_refill = time.monotonic()
+        self.request_count = 0
+
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass to PaymentGateway."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'GatewaySimulator':
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05},
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the port."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def serve_forever(self):
+        """Serve requests on the current thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def set_profile(self, profile):
+        """Switch behaviour at runtime, e.g. to start or end a simulated outage."""
+        with self._lock:
+            self.profile = PROFILES[profile] if isinstance(profile, str) else profile
+            self._tokens = float(self.profile.rate_burst)
+            self._last_refill = time.monotonic()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # Request handling
+
+    def sample_latency(self) -> float:
+        """Draw one response latency in seconds from the profile's distribution."""
+        p = self.profile
+        with self._lock:
+            if p.latency_dist == 'uniform':
+                ms = self._random.uniform(p.latency_ms - p.latency_spread_ms, p.latency_ms + p.latency_spread_ms)
+            elif p.latency_dist == 'normal':
+                ms = self._random.gauss(p.latency_ms, p.latency_spread_ms)
+            elif p.latency_dist == 'lognormal' and p.latency_ms > 0:
+                # Parameterise the underlying normal so the result has the requested mean/stddev
+                sigma2 = math.log1p((p.latency_spread_ms / p.latency_ms) ** 2)
+                mu = math.log(p.latency_ms) - sigma2 / 2
+                ms = self._random.lognormvariate(mu, sigma2 ** 0.5)
+            elif p.latency_dist == 'exponential' and p.latency_ms > 0:
+                ms = self._random.expovariate(1.0 / p.latency_ms)
+            else:
+                ms = p.latency_ms
+        return max(ms, 0.0) / 1000.0
+
+    def admit(self) -> Tuple[bool, float]:
+        """
+        Apply the token-bucket rate limit.
+
+        Returns:
+            tuple: (admitted: bool, retry_after_seconds: float)
+        """
+        p = self.profile
+        with self._lock:
+            self.request_count += 1
+            if p.rate_limit <= 0:
+                return True, 0.0
+            now = time.monotonic()
+            self._tokens = min(p.rate_burst, self._tokens + (now - self._last_refill) * p.rate_limit)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True, 0.0
+            return False, (1 - self._tokens) / p.rate_limit
+
+    def draw_failure(self) -> Optional[str]:
+        """Decide whether this request fails: 'hang', 'error' or None."""
+        p = self.profile
+        with self._lock:
+            roll = self._random.random()
+        if roll < p.timeout_rate:
+            return 'hang'
+        if roll < p.timeout_rate + p.error_rate:
+            return 'error'
+        return None
+
+    def create_charge(self, body: Dict) -> Tuple[int, Dict]:
+        """Validate and record a charge, mirroring PaymentGateway's simulated rules."""
+        patron_id = str(body.get('customer_id', ''))
+        try:
+            amount = float(body.get('amount', 0))
+        except (TypeError, ValueError):
+            return 400, {'error': 'Invalid amount: must be greater than 0'}
+
+        if amount <= 0:
+            return 400, {'error': 'Invalid amount: must be greater than 0'}
+        if amount > 1000:
+            return 402, {'error': 'Payment declined: amount exceeds limit'}
+        if len(patron_id) != 6:
+            return 400, {'error': 'Invalid patron ID format'}
+
+        with self._lock:
+            self._sequence += 1
+            transaction_id = f"txn_{patron_id}_{int(time.time())}_{self._sequence}"
+            self._charges[transaction_id] = {
+                'transaction_id': transaction_id,
+                'status': 'completed',
+                'amount': amount,
+                'timestamp': time.time()
+            }
+        return 200, {
+            'id': transaction_id,
+            'status': 'succeeded',
+            'message': f"Payment of ${amount:.2f} processed successfully"
+        }
+
+    def create_refund(self, body: Dict) -> Tuple[int, Dict]:
+        """Refund (part of) a recorded charge."""
+        transaction_id = str(body.get('charge_id', ''))
+        try:
+            amount = float(body.get('amount', 0))
+        except (TypeError, ValueError):
+            return 400, {'error': 'Invalid refund amount'}
+
+        if not transaction_id.startswith('txn_'):
+            return 400, {'error': 'Invalid transaction ID'}
+        if amount <= 0:
+            return 400, {'error': 'Invalid refund amount'}
+
+        with self._lock:
+            charge = self._charges.get(transaction_id)
+            if charge is None:
+                return 404, {'error': 'Transaction not found'}
+            if amount > charge['amount']:
+                return 400, {'error': 'Refund amount exceeds original charge'}
+            charge['status'] = 'refunded'
+        return 200, {'id': f"refund_{transaction_id}_{int(time.time())}", 'status': 'succeeded'}
+
+    def get_charge(self, transaction_id: str) -> Tuple[int, Dict]:
+        """Look up the status of a recorded charge."""
+        with self._lock:
+            charge = self._charges.get(transaction_id)
+            if charge is None:
+                return 404, {'status': 'not_found', 'message': 'Transaction not found'}
+            return 200, dict(charge)
+
+
+def _make_handler(simulator: GatewaySimulator):
+    """Build a request handler class bound to a simulator instance."""
+
+    charge_path = re.compile(r'^/charges/([^/]+)$')
+
+    class GatewayRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes; with Nagle on, every
+        # keep-alive response waits ~40 ms for the client's delayed ACK
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            # Keep load tests quiet
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                return self._send(400, {'error': 'Malformed JSON body'})
+
+            if self.path == '/charges':
+                self._handle(lambda: simulator.create_charge(body))
+            elif self.path == '/refunds':
+                self._handle(lambda: simulator.create_refund(body))
+            else:
+                self._send(404, {'error': 'Not found'})
+
+        def do_GET(self):
+            match = charge_path.match(self.path)
+            if match:
+                self._handle(lambda: simulator.get_charge(match.group(1)))
+            else:
+                self._send(404, {'error': 'Not found'})
+
+        def _handle(self, operation):
+            admitted, retry_after = simulator.admit()
+            if not admitted:
+                return self._send(429, {'error': 'Rate limit exceeded'},
+                                  {'Retry-After': str(max(1, round(retry_after)))})
+
+            if not self.headers.get('Authorization', '').startswith('Bearer '):
+                return self._send(401, {'error': 'Missing API key'})
+
+            time.sleep(simulator.sample_latency())
+
+            failure = simulator.draw_failure()
+            if failure == 'hang':
+                time.sleep(simulator.profile.hang_seconds)
+                return self._send(504, {'error': 'Upstream timeout'})
+            if failure == 'error':
+                return self._send(503, {'error': 'Service unavailable'})
+
+            status, payload = operation()
+            self._send(status, payload)
+
+        def _send(self, status: int, payload: Dict, headers: Optional[Dict] = None):
+            data = json.dumps(payload).encode()
+            try:
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                # Client gave up (e.g. its timeout fired while we were hanging)
+                pass
+
+    return GatewayRequestHandler
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Run the simulated payment gateway.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='realistic',
+                        help="Base behaviour; the options below override individual fields")
+    parser.add_argument('--latency-dist', choices=LATENCY_DISTRIBUTIONS)
+    parser.add_argument('--latency-ms', type=float)
+    parser.add_argument('--latency-spread-ms', type=float)
+    parser.add_argument('--error-rate', type=float)
+    parser.add_argument('--timeout-rate', type=float)
+    parser.add_argument('--hang-seconds', type=float)
+    parser.add_argument('--rate-limit', type=float)
+    parser.add_argument('--rate-burst', type=int)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    overrides = {
+        field: getattr(args, field)
+        for field in ('latency_dist', 'latency_ms', 'latency_spread_ms', 'error_rate',
+                      'timeout_rate', 'hang_seconds', 'rate_limit', 'rate_burst')
+        if getattr(args, field) is not None
+    }
+    profile = replace(PROFILES[args.profile], **overrides)
+
+    simulator = GatewaySimulator(args.host, args.port, profile, seed=args.seed)
+    print(f"Simulated payment gateway listening on {simulator.url} ({args.profile}: {profile})")
+    try:
+        simulator.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -6,9 +6,34 @@ For Assignment 3: You will learn to mock this service in their tests
 since we cannot make actual payment API calls during testing.
 """
 
-import requests
-from typing import Dict, Tuple
+import os
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
 import time
+import uuid
+from metrics import payment_gateway_calls, payment_gateway_duration
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+# requests is only needed when talking to a real gateway URL; importing it
+# lazily keeps it off the startup path of every process that loads the app
+if TYPE_CHECKING:
+    import requests
+
+
+DEFAULT_BASE_URL = "https://api.payment-gateway.example.com"
+
+
+class PaymentGatewayError(Exception):
+    """Raised when the gateway cannot be reached or answers with a server-side error."""
+
+
+# Shared by all gateway instances in this process so an outage detected by one
+# request makes every other request fail fast. Exposed at /api/payment/breaker.
+gateway_breaker = CircuitBreaker(
+    'payment_gateway',
+    failure_threshold=int(os.environ.get("PAYMENT_BREAKER_FAILURES", "5")),
+    reset_timeout=float(os.environ.get("PAYMENT_BREAKER_RESET", "30")),
+    failure_exceptions=(PaymentGatewayError,)
+)
 
 
 class PaymentGateway:
@@ -22,15 +47,36 @@ class PaymentGateway:
     - Incurring costs or rate limits
     """
     
-    def __init__(self, api_key: str = "test_key_12345"):
+    def __init__(self, api_key: str = "test_key_12345", base_url: Optional[str] = None,
+                 timeout: Optional[float] = None, breaker: Optional[CircuitBreaker] = None):
         """
         Initialize payment gateway with API credentials.
         
+        When a base URL is given (or set through the PAYMENT_GATEWAY_URL
+        environment variable) the gateway makes real HTTP requests to it,
+        e.g. to the local simulator in services/gateway_simulator.py.
+        Otherwise the calls are simulated in-process as before.
+        
         Args:
             api_key: API key for authentication (default is test key)
+            base_url: Gateway URL to send HTTP requests to (optional)
+            timeout: Per-request timeout in seconds for HTTP calls
+            breaker: Circuit breaker guarding HTTP calls (defaults to the
+                process-wide gateway_breaker)
         """
         self.api_key = api_key
-        self.base_url = "https://api.payment-gateway.example.com"
+        configured_url = base_url or os.environ.get("PAYMENT_GATEWAY_URL")
+        self.base_url = (configured_url or DEFAULT_BASE_URL).rstrip("/")
+        self.use_http = bool(configured_url)
+        if timeout is None:
+            timeout = float(os.environ.get("PAYMENT_GATEWAY_TIMEOUT", "2"))
+        self.timeout = timeout
+        self.breaker = breaker or gateway_breaker
+        # Reuse connections across calls when talking to a real endpoint
+        self._session = None
+        if self.use_http:
+            import requests
+            self._session = requests.Session()
     
     def process_payment(self, patron_id: str, amount: float, description: str = "") -> Tuple[bool, str, str]:
         """
@@ -51,21 +97,21 @@ class PaymentGateway:
             gateway = PaymentGateway()
             success, txn_id, msg = gateway.process_payment("123456", 10.50, "Late fees")
         """
+        if self.use_http:
+            response = self._request("POST", "/charges", json={
+                "customer_id": patron_id,
+                "amount": amount,
+                "currency": "usd",
+                "description": description
+            })
+            data = response.json()
+            if response.ok:
+                return True, data["id"], data["message"]
+            return False, "", data.get("error", "Payment declined")
+        
         # Simulate API call delay
         time.sleep(0.5)
         
-        # In a real implementation, this would make an HTTP request:
-        # response = requests.post(
-        #     f"{self.base_url}/charges",
-        #     headers={"Authorization": f"Bearer {self.api_key}"},
-        #     json={
-        #         "customer_id": patron_id,
-        #         "amount": amount,
-        #         "currency": "usd",
-        #         "description": description
-        #     }
-        # )
-        
         # For this template, we simulate different scenarios based on amount
         # This allows testing without a real API
         
@@ -79,7 +125,7 @@ class PaymentGateway:
             return False, "", "Invalid patron ID format"
         
         # Simulate successful payment
-        transaction_id = f"txn_{patron_id}_{int(time.time())}"
+        transaction_id = f"txn_{patron_id}_{uuid.uuid4().hex}"
         return True, transaction_id, f"Payment of ${amount:.2f} processed successfully"
     
     def refund_payment(self, transaction_id: str, amount: float) -> Tuple[bool, str]:
@@ -96,6 +142,16 @@ class PaymentGateway:
         Returns:
             tuple: (success: bool, message: str)
         """
+        if self.use_http:
+            response = self._request("POST", "/refunds", json={
+                "charge_id": transaction_id,
+                "amount": amount
+            })
+            data = response.json()
+            if response.ok:
+                return True, f"Refund of ${amount:.2f} processed successfully. Refund ID: {data['id']}"
+            return False, data.get("error", "Refund declined")
+        
         time.sleep(0.5)
         
         if not transaction_id or not transaction_id.startswith("txn_"):
@@ -120,17 +176,64 @@ class PaymentGateway:
         Returns:
             dict: Payment status information
         """
+        if self.use_http:
+            response = self._request("GET", f"/charges/{transaction_id}")
+            return response.json()
+        
         time.sleep(0.3)
         
         if not transaction_id or not transaction_id.startswith("txn_"):
             return {"status": "not_found", "message": "Transaction not found"}
         
-        # Simulate status check
+        # Simulate status check. The stub keeps no record of charges, so it
+        # can't know the amount; None tells reconciliation not to compare it.
         return {
             "transaction_id": transaction_id,
             "status": "completed",
-            "amount": 10.50,
+            "amount": None,
             "timestamp": time.time()
         }
-    
-    
\ No newline at end of file
+
+    def _request(self, method: str, path: str, json: Optional[Dict] = None) -> "requests.Response":
+        """
+        Send an HTTP request to the configured gateway.
+        
+        Declines and validation errors (4xx) are returned to the caller;
+        transport failures, rate limiting and 5xx answers raise
+        PaymentGatewayError so callers can treat them as outages. The
+        request goes through the circuit breaker, so while the gateway is
+        known to be down this fails immediately instead of waiting for
+        the timeout.
+        """
+        resource = path.strip("/").split("/")[0]
+        started = time.perf_counter()
+        try:
+            response = self.breaker.call(self._send, method, path, json)
+        except CircuitOpenError as e:
+            payment_gateway_calls.inc(method, resource, "rejected")
+            raise PaymentGatewayError(f"Payment gateway unavailable: {e}") from e
+        except PaymentGatewayError:
+            payment_gateway_calls.inc(method, resource, "error")
+            payment_gateway_duration.observe(time.perf_counter() - started, method, resource)
+            raise
+        payment_gateway_calls.inc(method, resource, "ok" if response.ok else "declined")
+        payment_gateway_duration.observe(time.perf_counter() - started, method, resource)
+        return response
+
+    def _send(self, method: str, path: str, json: Optional[Dict]) -> "requests.Response":
+        """Perform a single HTTP request without breaker protection."""
+        import requests
+        try:
+            response = self._session.request(
+                method,
+                f"{self.base_url}{path}",
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                json=json,
+                timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise PaymentGatewayError(f"Gateway request failed: {e}") from e
+        
+        if response.status_code == 429 or response.status_code >= 500:
+            raise PaymentGatewayError(f"Gateway returned HTTP {response.status_code}")
+        return response
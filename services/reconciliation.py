@@ -0,0 +1,197 @@
+"""
+Payment Reconciliation Module - Verify recorded payments against the gateway
+Reads the late fee payments recorded in payment_transactions for a date
+range, checks each one with PaymentGateway.verify_payment_status on a
+bounded thread pool and writes a CSV report of every discrepancy.
+
+Progress is appended to a checkpoint file as each transaction is verified,
+so an interrupted run started again with the same checkpoint only checks
+what is left. Transactions whose check failed (gateway error, open
+circuit) are not checkpointed and are retried on the next run.
+
+Usage:
+    python -m services.reconciliation --start 2026-10-01 --end 2026-10-07 \\
+        --workers 16 --report discrepancies.csv --checkpoint reconcile.ckpt
+"""
+
+import argparse
+import csv
+import json
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from repository import get_payment_transactions
+from services.payment_service import PaymentGateway
+
+REPORT_FIELDS = ['transaction_id', 'patron_id', 'book_id', 'recorded_amount',
+                 'gateway_status', 'gateway_amount', 'issue']
+
+SETTLED_STATUSES = ('completed',)
+
+
+def compare_transaction(record: Dict, status: Dict) -> Optional[str]:
+    """
+    Compare a recorded payment with the gateway's view of it.
+
+    Returns:
+        str: Description of the discrepancy, or None if the payment settled as recorded.
+        The amount is only compared when the gateway reports one (the
+        in-process stub gateway doesn't).
+    """
+    gateway_status = status.get('status')
+    if gateway_status == 'not_found':
+        return 'missing_at_gateway'
+    if gateway_status not in SETTLED_STATUSES:
+        return f'status_{gateway_status}'
+    gateway_amount = status.get('amount')
+    if gateway_amount is not None and abs(float(gateway_amount) - float(record['amount'])) > 0.005:
+        return 'amount_mismatch'
+    return None
+
+
+def load_checkpoint(path: Optional[str]) -> Dict[str, Dict]:
+    """Load verified transactions from a checkpoint file, keyed by transaction_id."""
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A partially written last line from an interrupted run
+                continue
+            done[entry['transaction_id']] = entry
+    return done
+
+
+def reconcile(start: datetime, end: datetime, report_path: str, checkpoint_path: Optional[str] = None,
+              workers: int = 8, gateway_factory: Callable[[], PaymentGateway] = PaymentGateway) -> Dict:
+    """
+    Reconcile payments recorded with start <= created_at < end.
+
+    Args:
+        start: Start of the date range (inclusive)
+        end: End of the date range (exclusive)
+        report_path: CSV file to write discrepancies to
+        checkpoint_path: JSON lines file recording verified transactions
+        workers: Maximum concurrent gateway requests
+        gateway_factory: Builds one gateway per worker thread
+
+    Returns:
+        dict: Summary counts (total, skipped, verified, discrepancies, errors)
+    """
+    transactions = get_payment_transactions(start, end)
+    done = load_checkpoint(checkpoint_path)
+    pending = [t for t in transactions if t['transaction_id'] not in done]
+
+    summary = {
+        'total': len(transactions),
+        'skipped': len(transactions) - len(pending),
+        'verified': 0,
+        'discrepancies': 0,
+        'errors': 0
+    }
+
+    local = threading.local()
+
+    def verify(record: Dict) -> Dict:
+        if not hasattr(local, 'gateway'):
+            local.gateway = gateway_factory()
+        status = local.gateway.verify_payment_status(record['transaction_id'])
+        return {
+            'transaction_id': record['transaction_id'],
+            'patron_id': record['patron_id'],
+            'book_id': record['book_id'],
+            'recorded_amount': record['amount'],
+            'gateway_status': status.get('status'),
+            'gateway_amount': status.get('amount'),
+            'issue': compare_transaction(record, status)
+        }
+
+    checkpoint = _open_checkpoint(checkpoint_path) if checkpoint_path else None
+    try:
+        for result in _run_bounded(verify, pending, workers, summary):
+            done[result['transaction_id']] = result
+            summary['verified'] += 1
+            if checkpoint:
+                checkpoint.write(json.dumps(result) + '\n')
+                checkpoint.flush()
+    finally:
+        if checkpoint:
+            checkpoint.close()
+
+    in_range = {t['transaction_id'] for t in transactions}
+    discrepancies = [r for tid, r in done.items() if tid in in_range and r['issue']]
+    summary['discrepancies'] = len(discrepancies)
+    write_report(report_path, discrepancies)
+    return summary
+
+
+def _open_checkpoint(path: str):
+    """Open a checkpoint for appending, terminating any partial line left by a crash."""
+    f = open(path, 'a+')
+    if f.tell() > 0:
+        f.seek(f.tell() - 1)
+        if f.read(1) != '\n':
+            f.write('\n')
+    return f
+
+
+def _run_bounded(func: Callable, items: List, workers: int, summary: Dict) -> Iterable:
+    """Run func over items with at most `workers` in flight, yielding results as they finish."""
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        while True:
+            while len(in_flight) < workers:
+                item = next(items, None)
+                if item is None:
+                    break
+                in_flight.add(executor.submit(func, item))
+            if not in_flight:
+                return
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                try:
+                    yield future.result()
+                except Exception:
+                    # Left out of the checkpoint so the next run retries it
+                    summary['errors'] += 1
+
+
+def write_report(path: str, discrepancies: List[Dict]):
+    """Write discrepancies to a CSV file, sorted by transaction ID."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        for row in sorted(discrepancies, key=lambda r: r['transaction_id']):
+            writer.writerow({field: row.get(field) for field in REPORT_FIELDS})
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Reconcile recorded payments against the payment gateway.")
+    parser.add_argument('--start', required=True, help="First day to check (YYYY-MM-DD)")
+    parser.add_argument('--end', required=True, help="Last day to check, inclusive (YYYY-MM-DD)")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--report', default='reconciliation_report.csv')
+    parser.add_argument('--checkpoint', help="Resume from / record progress in this file")
+    args = parser.parse_args(argv)
+
+    start = datetime.fromisoformat(args.start)
+    end = datetime.fromisoformat(args.end) + timedelta(days=1)
+    summary = reconcile(start, end, args.report, args.checkpoint, args.workers)
+
+    print(json.dumps(summary))
+    if summary['errors']:
+        print(f"{summary['errors']} transaction(s) could not be verified; run again to retry.")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
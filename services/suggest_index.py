@@ -0,0 +1,251 @@
+"""
+Suggest Index Module - In-memory prefix index for search-as-you-type
+
+Titles and authors are normalized (case-folded, accents and punctuation
+removed) and every word-start suffix is stored in one sorted array, so
+"gat" finds "The Great Gatsby" with two bisects. Matches are ranked by
+popularity (times borrowed).
+
+The index is built from the books table on first use and updated in
+place by insert_book through a write listener. Every so often a request
+checks for writes made by other processes: a moved catalog change
+counter (books added or removed, titles, authors or ISBNs edited)
+triggers a rebuild on a background thread, while loans only change
+popularity, which is updated from the availability event log without
+a rebuild.
+"""
+
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+import database
+import repository
+
+# Prefix ranges larger than this have their top results memoized
+MEMO_THRESHOLD = 500
+
+# Availability events read per query when catching up
+EVENT_BATCH = 1000
+
+_non_alnum = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and collapse everything but letters and digits to single spaces."""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _non_alnum.sub(' ', stripped).strip()
+
+
+def index_keys(book: Dict) -> List[str]:
+    """Keys for a book: every word-start suffix of its normalized title and author."""
+    keys = []
+    for field in ('title', 'author'):
+        words = normalize(book.get(field) or '').split()
+        keys.extend(' '.join(words[i:]) for i in range(len(words)))
+    return list(dict.fromkeys(keys))
+
+
+class SuggestIndex:
+    """Sorted-array prefix index over book titles and authors."""
+
+    def __init__(self, max_results: int = 10):
+        """
+        Args:
+            max_results: Largest k a query may ask for
+        """
+        self.max_results = max_results
+        self._lock = threading.RLock()
+        self._keys: List[str] = []
+        self._ids: List[int] = []
+        self._books: Dict[int, Dict] = {}
+        self._popularity: Dict[int, int] = {}
+        self._available: Dict[int, int] = {}
+        self._memo: Dict[str, List[int]] = {}
+        # (epoch, catalog version) the index reflects; None until built
+        self.catalog_version: Optional[Tuple[int, int]] = None
+        # Newest availability event reflected in the popularity counts
+        self.last_event_id = 0
+
+    def build(self, books: List[Dict], popularity: Dict[int, int],
+              catalog_version: Optional[Tuple[int, int]] = None, last_event_id: int = 0):
+        """Replace the index contents with the given books."""
+        pairs = sorted((key, book['id']) for book in books for key in index_keys(book))
+        summaries = {book['id']: _summary(book) for book in books}
+        available = {book['id']: book.get('available_copies', 0) for book in books}
+        with self._lock:
+            self._keys = [key for key, _ in pairs]
+            self._ids = [book_id for _, book_id in pairs]
+            self._books = summaries
+            self._popularity = dict(popularity)
+            self._available = available
+            self._memo = {}
+            self.catalog_version = catalog_version
+            self.last_event_id = last_event_id
+
+    def add_book(self, book: Dict):
+        """Index one new book."""
+        with self._lock:
+            self._books[book['id']] = _summary(book)
+            self._available[book['id']] = book.get('available_copies', 0)
+            for key in index_keys(book):
+                position = bisect_left(self._keys, key)
+                self._keys.insert(position, key)
+                self._ids.insert(position, book['id'])
+                self._forget_prefixes(key)
+            # The insert moved the catalog counter by one, and the index has it
+            if self.catalog_version is not None:
+                epoch, version = self.catalog_version
+                self.catalog_version = (epoch, version + 1)
+
+    def apply_availability_events(self, events: List[Dict]) -> bool:
+        """
+        Count the loans shown by availability changes newer than last_event_id.
+
+        A book's available copies dropping by n means n more loans; rises
+        are returns and don't change popularity.
+
+        Returns:
+            bool: False if events are missing (pruned from the log before
+            they were seen), in which case the index needs a rebuild
+        """
+        with self._lock:
+            for event in events:
+                if event['id'] <= self.last_event_id:
+                    continue
+                if event['id'] != self.last_event_id + 1:
+                    return False
+                self.last_event_id = event['id']
+                book_id = event['book_id']
+                previous = self._available.get(book_id)
+                self._available[book_id] = event['available_copies']
+                if book_id in self._books and previous is not None and event['available_copies'] < previous:
+                    self._popularity[book_id] = (self._popularity.get(book_id, 0)
+                                                 + previous - event['available_copies'])
+                    for key in index_keys(self._books[book_id]):
+                        self._forget_prefixes(key)
+            return True
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict]:
+        """
+        Return up to limit books whose title or author has a word starting with query.
+
+        Results are ordered by popularity, then by title.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        limit = max(1, min(limit, self.max_results))
+
+        with self._lock:
+            ranked = self._memo.get(prefix)
+            if ranked is None:
+                lo = bisect_left(self._keys, prefix)
+                hi = bisect_left(self._keys, prefix + '\uffff', lo)
+                ranked = self._rank(set(self._ids[lo:hi]))
+                if hi - lo > MEMO_THRESHOLD:
+                    self._memo[prefix] = ranked
+            return [dict(self._books[book_id], popularity=self._popularity.get(book_id, 0))
+                    for book_id in ranked[:limit]]
+
+    def __len__(self):
+        return len(self._books)
+
+    def _rank(self, book_ids) -> List[int]:
+        popularity = self._popularity
+        books = self._books
+        return heapq.nsmallest(self.max_results, book_ids,
+                               key=lambda book_id: (-popularity.get(book_id, 0), books[book_id]['title']))
+
+    def _forget_prefixes(self, key: str):
+        # A new key can change the top results of any of its prefixes
+        if self._memo:
+            for end in range(1, len(key) + 1):
+                self._memo.pop(key[:end], None)
+
+
+def _summary(book: Dict) -> Dict:
+    return {'id': book['id'], 'title': book['title'], 'author': book['author']}
+
+
+suggest_index = SuggestIndex()
+
+
+def _catalog_version(versions: Dict[str, Dict]) -> Tuple[int, int]:
+    return versions['epoch']['version'], versions['catalog']['version']
+
+
+def rebuild_suggest_index():
+    """Rebuild the shared index from the database."""
+    versions = repository.get_data_versions()
+    # Changes logged after this are applied by later refreshes; ones already
+    # reflected in the books read below apply as no change
+    latest = repository.get_latest_availability_events(1)
+    popularity = repository.get_book_popularity()
+    suggest_index.build(repository.get_all_books(), popularity, _catalog_version(versions),
+                        latest[-1]['id'] if latest else 0)
+
+
+def apply_new_loans() -> bool:
+    """Update popularity from availability changes since the last build or call; False if a rebuild is needed."""
+    while True:
+        events = repository.get_availability_events(suggest_index.last_event_id, EVENT_BATCH)
+        if not suggest_index.apply_availability_events(events):
+            return False
+        if len(events) < EVENT_BATCH:
+            return True
+
+
+def _on_book_inserted(book: Dict):
+    suggest_index.add_book(book)
+
+
+def init_suggest_index(app):
+    """
+    Keep the shared index current. It is built by the first suggest request, not here.
+
+    Uses app.config['SUGGEST_REFRESH_SECONDS']: how often a request checks
+    for writes made by other processes. Loans are applied to popularity
+    on the spot; catalog changes trigger a rebuild on a background thread.
+    """
+    app.config.setdefault('SUGGEST_REFRESH_SECONDS', 60)
+    # Drop an index built for another app or database
+    suggest_index.build([], {})
+    database.remove_write_listener('book_inserted', _on_book_inserted)
+    database.add_write_listener('book_inserted', _on_book_inserted)
+    state = {'checked_at': time.monotonic(), 'rebuilding': False}
+    state_lock = threading.Lock()
+    build_lock = threading.Lock()
+
+    def refresh_if_stale():
+        """Called by the suggest endpoint; cheap unless the index is unbuilt or the refresh interval has passed."""
+        if suggest_index.catalog_version is None:
+            with build_lock:
+                if suggest_index.catalog_version is None:
+                    rebuild_suggest_index()
+                    state['checked_at'] = time.monotonic()
+            return
+        now = time.monotonic()
+        with state_lock:
+            if state['rebuilding'] or now - state['checked_at'] < app.config['SUGGEST_REFRESH_SECONDS']:
+                return
+            state['checked_at'] = now
+        if (_catalog_version(repository.get_data_versions()) == suggest_index.catalog_version
+                and apply_new_loans()):
+            return
+
+        def rebuild():
+            try:
+                rebuild_suggest_index()
+            finally:
+                state['rebuilding'] = False
+
+        state['rebuilding'] = True
+        threading.Thread(target=rebuild, daemon=True).start()
+
+    app.extensions['suggest_refresh'] = refresh_if_stale
@@ -0,0 +1,59 @@
+# tests/conftest.py
+import pytest
+import database as db
+from app import create_app
+
+@pytest.fixture(autouse=True)
+def _fresh_db(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(db, "DATABASE", str(tmp_path / "test_library.db"))
+
+    db.init_database()
+    db.add_sample_data()
+    yield
+
+
+@pytest.fixture
+def app():
+    """
+    The application in testing mode. Modules that need other settings
+    override it with a fixture of the same name that takes this one:
+
+        @pytest.fixture
+        def app(app):
+            app.config.update(RATE_LIMITS={})
+            return app
+    """
+    app = create_app()
+    app.config["TESTING"] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    """A test client for the app fixture."""
+    return app.test_client()
+
+
+@pytest.fixture
+def max_queries():
+    """
+    Assert an upper bound on database round trips, e.g.
+    with max_queries(statements=5, connections=4): borrow_book_by_patron(...)
+    """
+    from db_instrumentation import assert_max_queries
+    return assert_max_queries
+
+
+@pytest.fixture
+def memory_repository():
+    """
+    Run the test against an in-memory repository holding the sample data
+    instead of the SQLite database.
+    """
+    from memory_repository import MemoryRepository
+    from repository import use_repository
+    repository = MemoryRepository()
+    repository.add_sample_data()
+    with use_repository(repository):
+        yield repository
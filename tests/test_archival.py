@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import database as db
+from memory_repository import MemoryRepository
+from repository import use_repository
+from services.archival import archive_loans, main
+
+NOW = datetime(2026, 6, 1, 12, 0)
+
+
+def _loan(patron_id, book_id, days_ago, returned_days_ago=None):
+    borrowed = NOW - timedelta(days=days_ago)
+    db.insert_borrow_record(patron_id, book_id, borrowed, borrowed + timedelta(days=14))
+    if returned_days_ago is not None:
+        db.update_borrow_record_return_date(patron_id, book_id, NOW - timedelta(days=returned_days_ago))
+
+
+def _seed():
+    _loan("777777", 1, 800, 790)
+    _loan("777777", 2, 500, 480)
+    _loan("777777", 1, 100, 95)
+    _loan("777777", 2, 10)
+    _loan("888888", 1, 400, 390)
+
+
+def test_old_returned_loans_move_in_batches_and_history_is_unchanged():
+    _seed()
+    history = db.get_patron_borrow_history("777777")
+    popularity = db.get_book_popularity()
+
+    summary = archive_loans(older_than_days=365, batch_size=1, now=NOW)
+
+    assert (summary["archived"], summary["batches"]) == (3, 3)
+    conn = db.get_read_connection()
+    assert conn.execute("SELECT COUNT(*) FROM borrow_records").fetchone()[0] == 3
+    assert conn.execute("SELECT COUNT(*) FROM borrow_records_archive").fetchone()[0] == 3
+    assert db.get_patron_borrow_history("777777") == history
+    assert [loan["return_date"] is None for loan in history] == [False, False, False, True]
+    assert db.get_book_popularity() == popularity
+    assert db.get_patron_borrow_count("777777") == 1
+
+    # Nothing left to move; loans still out or returned recently stay hot
+    assert archive_loans(older_than_days=365, now=NOW)["archived"] == 0
+
+
+def test_memory_repository_archives_the_same_way():
+    _seed()
+    repository = MemoryRepository.from_database()
+    expected = archive_loans(older_than_days=365, batch_size=2, now=NOW)
+    with use_repository(repository):
+        summary = archive_loans(older_than_days=365, batch_size=2, now=NOW)
+        assert repository.get_patron_borrow_history("777777") == db.get_patron_borrow_history("777777")
+        assert repository.get_book_popularity() == db.get_book_popularity()
+    assert (summary["archived"], summary["batches"]) == (expected["archived"], expected["batches"]) == (3, 2)
+
+
+def test_command_line(capsys):
+    _seed()
+    assert main(["--days", "0", "--batch-size", "10"]) == 0
+    assert '"archived": 4' in capsys.readouterr().out
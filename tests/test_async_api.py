@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import database as db
+from services.async_payment_service import AsyncPaymentGateway
+from services.gateway_simulator import GatewayProfile, GatewaySimulator
+from services.payment_service import PaymentGateway, gateway_breaker
+
+
+def test_async_search_matches_sync(client, mocker):
+    mocker.patch("routes.async_api_routes.search_books_in_catalog",
+                 return_value=[{"id": 1, "title": "1984"}])
+    mocker.patch("routes.api_routes.search_books_in_catalog",
+                 return_value=[{"id": 1, "title": "1984"}])
+
+    sync = client.get("/api/search?q=1984")
+    async_ = client.get("/api/async/search?q=1984")
+
+    assert async_.status_code == 200
+    assert async_.get_json() == sync.get_json()
+    assert client.get("/api/async/search?q=1984",
+                      headers={"If-None-Match": async_.headers["ETag"]}).status_code == 304
+
+
+def test_async_search_requires_term(client):
+    response = client.get("/api/async/search?q=")
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Search term is required"}
+
+
+def test_async_late_fee_unavailable_matches_sync(client):
+    sync = client.get("/api/late_fee/123456/1")
+    async_ = client.get("/api/async/late_fee/123456/1")
+
+    assert async_.status_code == sync.status_code == 501
+    assert async_.get_json() == sync.get_json() == {"status": "Late fee calculation not implemented"}
+
+
+def test_async_late_fee(client, mocker):
+    fee = {"fee_amount": 1.50, "days_overdue": 3, "status": "ok"}
+    mocker.patch("routes.async_api_routes.calculate_late_fee_for_book", return_value=fee)
+
+    response = client.get("/api/async/late_fee/123456/1")
+
+    assert response.status_code == 200
+    assert response.get_json() == fee
+
+
+def test_async_pay_late_fee(client, mocker):
+    threads = {}
+
+    def prepare(patron_id, book_id):
+        threads["prepare"] = threading.current_thread().name
+        return None, 4.50, "Late fees for '1984'"
+
+    def charge(self, patron_id, amount, description=""):
+        threads["charge"] = threading.current_thread().name
+        return True, "txn_123456_1", "ok"
+
+    mocker.patch("routes.async_api_routes.prepare_late_fee_payment", prepare)
+    mocker.patch.object(PaymentGateway, "process_payment", charge)
+
+    response = client.post("/api/async/late_fee/123456/1/pay")
+
+    assert response.status_code == 200
+    assert response.get_json() == {"success": True, "message": "Payment successful! ok",
+                                   "transaction_id": "txn_123456_1"}
+    assert threads["prepare"].startswith("library-db")
+    assert threads["charge"].startswith("payment-gateway")
+    assert [p["transaction_id"] for p in db.get_payment_transactions(
+        datetime.now() - timedelta(minutes=1), datetime.now() + timedelta(minutes=1))] == ["txn_123456_1"]
+
+
+def test_async_pay_late_fee_rejects_before_charging(client, mocker):
+    charge = mocker.patch.object(PaymentGateway, "process_payment")
+
+    response = client.post("/api/async/late_fee/12345/1/pay")
+
+    assert response.status_code == 402
+    assert response.get_json()["message"] == "Invalid patron ID. Must be exactly 6 digits."
+    charge.assert_not_called()
+
+
+def test_gateway_calls_awaited_concurrently():
+    gateway_breaker.reset()
+    with GatewaySimulator(profile=GatewayProfile(latency_ms=200)) as simulator:
+        gateway = AsyncPaymentGateway(PaymentGateway(base_url=simulator.url))
+
+        async def check_all():
+            return await asyncio.gather(*(gateway.verify_payment_status(f"txn_{i}") for i in range(5)))
+
+        start = time.perf_counter()
+        results = asyncio.run(check_all())
+        elapsed = time.perf_counter() - start
+
+    assert [r["status"] for r in results] == ["not_found"] * 5
+    assert elapsed < 0.6
@@ -0,0 +1,103 @@
+import json
+import pytest
+import database as db
+from app import create_app
+from services.availability_events import AvailabilityHub, availability_hub
+
+
+@pytest.fixture
+def app(app):
+    app.config.update(EVENTS_STREAM_SECONDS=0.3, EVENTS_HEARTBEAT_SECONDS=0.1)
+    yield app
+    availability_hub.stop()
+
+
+def _events(body):
+    """Parse the id/data events out of an SSE body, skipping comments and retry."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n") if not line.startswith((":", "retry")))
+        if "data" in fields:
+            events.append((fields.get("event", "message"), int(fields["id"]), json.loads(fields["data"])))
+    return events
+
+
+def test_trigger_logs_only_real_availability_changes():
+    # add_sample_data sets 1984 to 0 copies
+    assert [(e["book_id"], e["available_copies"]) for e in db.get_availability_events()] == [(3, 0)]
+
+    db.update_book_availability(1, -1)
+    db.update_book_availability(2, 0)
+
+    assert [(e["book_id"], e["available_copies"]) for e in db.get_availability_events()] == [(3, 0), (1, 2)]
+
+
+def test_hub_replays_from_last_id_and_detects_gaps():
+    hub = AvailabilityHub(buffer_size=2)
+    hub.ensure_started()
+    first = hub.latest_id
+    for _ in range(3):
+        db.update_book_availability(1, -1)
+    hub.poll()
+
+    assert hub.events_after(hub.latest_id, timeout=0) == []
+    assert [e["available_copies"] for e in hub.events_after(hub.latest_id - 2, timeout=0)] == [1, 0]
+    assert hub.events_after(first, timeout=0) is None
+    hub.stop()
+
+
+def test_stream_pushes_changes(client):
+    availability_hub.ensure_started()
+    db.update_book_availability(1, -1)
+    db.update_book_availability(3, 1)
+
+    response = client.get("/api/events", headers={"Last-Event-ID": "1"})
+
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-store"
+    assert "Content-Encoding" not in response.headers
+    events = _events(response.get_data(as_text=True))
+    assert [data for _, _, data in events] == [
+        {"book_id": 1, "available_copies": 2},
+        {"book_id": 3, "available_copies": 1},
+    ]
+    assert [event_id for _, event_id, _ in events] == [2, 3]
+
+
+def test_stream_without_last_event_id_starts_at_now(client):
+    body = client.get("/api/events").get_data(as_text=True)
+
+    assert body.startswith("retry: 3000")
+    assert _events(body) == []
+    assert ": keep-alive" in body
+
+
+def test_catalog_rows_carry_live_update_hooks(client):
+    html = client.get("/catalog").get_data(as_text=True)
+
+    assert 'data-book-id="3" data-total-copies="1"' in html
+    assert "new EventSource" in html
+
+
+def test_default_stream_sends_pending_changes_and_closes():
+    app = create_app()
+    availability_hub.ensure_started()
+    db.update_book_availability(1, -1)
+    availability_hub.poll()
+
+    body = app.test_client().get("/api/events", headers={"Last-Event-ID": "1"}).get_data(as_text=True)
+    availability_hub.stop()
+
+    assert [event_id for _, event_id, _ in _events(body)] == [2]
+    assert ": keep-alive" not in body
+
+
+def test_page_subscribes_from_the_change_it_rendered(client):
+    html = client.get("/catalog").get_data(as_text=True)
+    assert "/api/events?last_event_id=1" in html
+
+    # Changed after the page was rendered, before its first connection
+    db.update_book_availability(1, -1)
+    body = client.get("/api/events?last_event_id=1").get_data(as_text=True)
+
+    assert [data for _, _, data in _events(body)] == [{"book_id": 1, "available_copies": 2}]
@@ -0,0 +1,154 @@
+import time
+
+import pytest
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from services.gateway_simulator import GatewayProfile, GatewaySimulator
+from services.library_service import pay_late_fees
+from services.payment_service import PaymentGateway, PaymentGatewayError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _fail():
+    raise PaymentGatewayError("boom")
+
+
+def test_breaker_opens_after_threshold_and_fails_fast():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=10, clock=FakeClock())
+
+    for _ in range(3):
+        with pytest.raises(PaymentGatewayError):
+            breaker.call(_fail)
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "never called")
+
+    snapshot = breaker.snapshot()
+    assert snapshot["trips"] == 1
+    assert snapshot["failures"] == 3
+    assert snapshot["rejected"] == 1
+
+
+def test_breaker_half_open_success_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10, clock=clock)
+    with pytest.raises(PaymentGatewayError):
+        breaker.call(_fail)
+
+    clock.now = 10
+    assert breaker.state == "half_open"
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == "closed"
+
+
+def test_breaker_half_open_failure_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10, clock=clock)
+    with pytest.raises(PaymentGatewayError):
+        breaker.call(_fail)
+
+    clock.now = 10
+    with pytest.raises(PaymentGatewayError):
+        breaker.call(_fail)
+
+    assert breaker.state == "open"
+    assert breaker.snapshot()["trips"] == 2
+
+
+def test_non_failure_exceptions_do_not_trip():
+    breaker = CircuitBreaker("test", failure_threshold=1, failure_exceptions=(PaymentGatewayError,))
+
+    with pytest.raises(ValueError):
+        breaker.call(lambda: int("x"))
+
+    assert breaker.state == "closed"
+
+
+def test_non_failure_exception_releases_trial_without_closing():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10,
+                             failure_exceptions=(PaymentGatewayError,), clock=clock)
+    with pytest.raises(PaymentGatewayError):
+        breaker.call(_fail)
+
+    clock.now = 10
+    with pytest.raises(ValueError):
+        breaker.call(lambda: int("x"))
+
+    assert breaker.state == "half_open"
+    assert breaker.snapshot()["successes"] == 0
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == "closed"
+
+
+@pytest.mark.parametrize("late_result", [lambda: "late", _fail])
+def test_call_admitted_before_half_open_is_not_the_trial(late_result):
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10, clock=clock)
+
+    def slow_call():
+        # While this call is in flight the circuit opens and the timeout passes
+        with pytest.raises(PaymentGatewayError):
+            breaker.call(_fail)
+        clock.now = 10
+        assert breaker.state == "half_open"
+        return late_result()
+
+    try:
+        breaker.call(slow_call)
+    except PaymentGatewayError:
+        pass
+
+    assert breaker.state == "half_open"
+    assert breaker.snapshot()["trips"] == 1
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == "closed"
+
+
+def test_p99_latency_bounded_during_outage():
+    """Every gateway request hangs; only the first few should wait for the timeout."""
+    breaker = CircuitBreaker("outage", failure_threshold=3, reset_timeout=60)
+    timeout = 0.2
+
+    with GatewaySimulator(profile=GatewayProfile(timeout_rate=1.0, hang_seconds=1)) as simulator:
+        gateway = PaymentGateway(base_url=simulator.url, timeout=timeout, breaker=breaker)
+        latencies = []
+        for _ in range(100):
+            start = time.perf_counter()
+            with pytest.raises(PaymentGatewayError):
+                gateway.process_payment("123456", 5.0, "Late fees")
+            latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    assert breaker.snapshot()["trips"] == 1
+    assert breaker.snapshot()["rejected"] == 97
+    assert latencies[98] < timeout + 0.2      # p99 never exceeds the timeout budget
+    assert latencies[95] < 0.01               # everything after the trip fails fast
+
+
+def test_pay_late_fees_reports_open_circuit(mocker):
+    mocker.patch(
+        "services.library_service.calculate_late_fee_for_book",
+        return_value={"fee_amount": 3.0, "days_overdue": 2, "status": "Overdue"},
+    )
+    mocker.patch(
+        "services.library_service.get_book_by_id",
+        return_value={"id": 1, "title": "1984"},
+    )
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    with pytest.raises(PaymentGatewayError):
+        breaker.call(_fail)
+    gateway = PaymentGateway(base_url="http://127.0.0.1:9", breaker=breaker)
+
+    success, message, txn_id = pay_late_fees("123456", 1, gateway)
+
+    assert success is False
+    assert message.startswith("Payment processing error: Payment gateway unavailable")
+    assert txn_id is None
@@ -0,0 +1,35 @@
+import gzip
+
+import pytest
+
+
+def test_catalog_is_gzipped_when_accepted(client):
+    plain = client.get("/catalog")
+    response = client.get("/catalog", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.data) == plain.data
+    assert response.headers["ETag"].startswith('W/')
+
+
+def test_compressed_etag_still_revalidates(client):
+    etag = client.get("/catalog", headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+
+    response = client.get("/catalog", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+
+    assert response.status_code == 304
+
+
+def test_small_and_unaccepted_responses_are_not_compressed(client):
+    small = client.get("/api/search?q=x", headers={"Accept-Encoding": "gzip"})
+    identity = client.get("/catalog", headers={"Accept-Encoding": "identity"})
+
+    assert "Content-Encoding" not in small.headers
+    assert "Content-Encoding" not in identity.headers
+
+
+def test_cache_control_policies(client):
+    assert client.get("/catalog").headers["Cache-Control"] == "no-cache"
+    assert client.get("/api/search?q=x").headers["Cache-Control"] == "public, no-cache"
+    assert client.post("/borrow", data={"patron_id": "1", "book_id": "x"}).headers["Cache-Control"] == "no-store"
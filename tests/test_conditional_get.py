@@ -0,0 +1,83 @@
+import time
+
+import pytest
+from werkzeug.http import http_date
+import database as db
+
+
+def test_catalog_sets_etag_and_answers_304(client, mocker):
+    first = client.get("/catalog")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    get_all_books = mocker.patch("routes.catalog_routes.get_all_books")
+    second = client.get("/catalog", headers={"If-None-Match": etag})
+
+    assert second.status_code == 304
+    assert second.data == b""
+    assert second.headers["ETag"] == etag
+    get_all_books.assert_not_called()
+
+
+def test_write_changes_etag(client):
+    etag = client.get("/catalog").headers["ETag"]
+
+    db.update_book_availability(1, -1)
+    response = client.get("/catalog", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_if_modified_since_after_the_write_second(client, mocker):
+    now = time.time()
+    mocker.patch("routes.caching.time.time", return_value=now + 2)
+    last_modified = client.get("/catalog").headers["Last-Modified"]
+
+    response = client.get("/catalog", headers={"If-Modified-Since": last_modified})
+
+    assert response.status_code == 304
+
+
+def test_if_modified_since_ignored_within_the_write_second(client, mocker):
+    write_second = db.get_data_versions()["books"]["updated_at"]
+    clock = mocker.patch("routes.caching.time.time", return_value=write_second + 0.5)
+    first = client.get("/catalog")
+    assert "Last-Modified" not in first.headers
+
+    # A later write in the same second leaves updated_at where it was
+    db.update_book_availability(1, -1)
+    stale = http_date(write_second)
+    response = client.get("/catalog", headers={"If-Modified-Since": stale})
+    assert response.status_code == 200
+    assert "2/3 Available" in response.data.decode()
+
+    last_write = db.get_data_versions()["books"]["updated_at"]
+    clock.return_value = last_write + 1
+    assert client.get("/catalog").headers["Last-Modified"] == http_date(last_write)
+
+
+def test_etag_depends_on_query_string(client):
+    books = client.get("/api/search?q=gatsby&type=title").headers["ETag"]
+    authors = client.get("/api/search?q=gatsby&type=author").headers["ETag"]
+
+    assert books != authors
+    assert client.get("/api/search?q=gatsby&type=title",
+                      headers={"If-None-Match": books}).status_code == 304
+
+
+def test_error_responses_are_not_tagged(client):
+    response = client.get("/api/search?q=")
+
+    assert response.status_code == 400
+    assert "ETag" not in response.headers
+
+
+def test_pending_flash_bypasses_cache(client):
+    etag = client.get("/catalog").headers["ETag"]
+    client.post("/borrow", data={"patron_id": "123456", "book_id": "abc"})
+
+    response = client.get("/catalog", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert b"Invalid book ID." in response.data
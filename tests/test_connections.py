@@ -0,0 +1,63 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+import database as db
+
+
+def test_reads_use_a_read_only_connection_per_thread():
+    conn = db.get_read_connection()
+    assert db.get_read_connection() is conn
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("UPDATE books SET title = 'x'")
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db.get_read_connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+def test_writes_run_in_wal_mode_and_roll_back_on_error():
+    assert db.update_book_availability(1, -1)
+    with db.write_transaction() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    with pytest.raises(RuntimeError):
+        with db.write_transaction() as conn:
+            conn.execute("UPDATE books SET available_copies = 0 WHERE id = 1")
+            raise RuntimeError("abort")
+    assert db.get_book_by_id(1)["available_copies"] == 2
+
+
+def test_reads_do_not_wait_for_an_open_write_transaction():
+    db.update_book_availability(1, 0)  # switches the database to WAL
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_writer():
+        with db.write_transaction() as conn:
+            conn.execute("UPDATE books SET available_copies = 0 WHERE id = 1")
+            entered.set()
+            release.wait(5)
+
+    writer = threading.Thread(target=slow_writer)
+    writer.start()
+    entered.wait(5)
+    try:
+        start = time.perf_counter()
+        # Readers see the last committed state while the write is in progress
+        assert db.get_book_by_id(1)["available_copies"] == 3
+        assert time.perf_counter() - start < 1
+    finally:
+        release.set()
+        writer.join()
+    assert db.get_book_by_id(1)["available_copies"] == 0
+
+
+def test_connections_follow_the_database_path(tmp_path, monkeypatch):
+    before = db.get_read_connection()
+    monkeypatch.setattr(db, "DATABASE", str(tmp_path / "other.db"))
+    db.init_database()
+    assert db.get_read_connection() is not before
+    assert db.get_all_books() == []
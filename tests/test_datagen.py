@@ -0,0 +1,83 @@
+import random
+import sqlite3
+from collections import Counter
+from datetime import date
+
+import pytest
+import database as db
+from benchmarks.datagen import DatasetSpec, RankPermutation, ZipfSampler, generate_library, isbn13
+
+SPEC = DatasetSpec(books=500, patrons=80, loans=4000, years=2, seed=7, end_date=date(2025, 6, 30))
+
+
+def _dump(path):
+    conn = sqlite3.connect(path)
+    rows = (conn.execute("SELECT * FROM books ORDER BY id").fetchall(),
+            conn.execute("SELECT * FROM borrow_records ORDER BY id").fetchall())
+    conn.close()
+    return rows
+
+
+def test_same_spec_same_library(tmp_path):
+    generate_library(SPEC, str(tmp_path / "a.db"))
+    generate_library(SPEC, str(tmp_path / "b.db"))
+
+    assert _dump(tmp_path / "a.db") == _dump(tmp_path / "b.db")
+
+
+def test_generated_library_is_consistent(tmp_path):
+    stats = generate_library(SPEC, str(tmp_path / "lib.db"))
+    conn = sqlite3.connect(tmp_path / "lib.db")
+
+    books, out_total, min_available = conn.execute(
+        "SELECT COUNT(*), SUM(total_copies - available_copies), MIN(available_copies) FROM books").fetchone()
+    loans, patrons, still_out, late = conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT patron_id), SUM(return_date IS NULL), "
+        "SUM(return_date > due_date) FROM borrow_records").fetchone()
+    assert (books, loans) == (500, 4000)
+    assert patrons <= 80 and all(len(p) == 6 for (p,) in conn.execute("SELECT patron_id FROM borrow_records"))
+    assert min_available >= 0
+    assert still_out == out_total == stats["loans_out"]
+    assert 0.05 < late / loans < 0.2
+    assert conn.execute("SELECT MAX(borrow_date) FROM borrow_records").fetchone()[0] < "2025-07-01"
+
+    # Zipf popularity: the ten most borrowed books take far more than 10/500 of the loans
+    counts = Counter(book_id for (book_id,) in conn.execute("SELECT book_id FROM borrow_records"))
+    assert sum(c for _, c in counts.most_common(10)) > loans * 0.2
+
+    triggers = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    assert {"books_update_version", "borrow_records_insert_version", "books_availability_event"} <= triggers
+    conn.close()
+
+
+def test_refuses_to_fill_a_populated_database():
+    # conftest has already added the sample books to db.DATABASE
+    with pytest.raises(ValueError):
+        generate_library(SPEC)
+
+
+def test_generated_library_works_with_the_service_layer(tmp_path, monkeypatch):
+    from services.library_service import borrow_book_by_patron
+
+    generate_library(SPEC, str(tmp_path / "lib.db"))
+    monkeypatch.setattr(db, "DATABASE", str(tmp_path / "lib.db"))
+    book = next(b for b in db.get_all_books() if b["available_copies"] > 0)
+
+    success, _ = borrow_book_by_patron("999999", book["id"])
+
+    assert success
+    assert db.get_book_by_id(book["id"])["available_copies"] == book["available_copies"] - 1
+
+
+def test_helpers():
+    # The Great Gatsby's ISBN-13
+    assert isbn13(74327356) == "9780743273565"
+
+    permutation = RankPermutation(1000, random.Random(1))
+    assert sorted(permutation.id_for_rank(r) for r in range(1000)) == list(range(1, 1001))
+    assert all(permutation.rank_for_id(permutation.id_for_rank(r)) == r for r in range(1000))
+
+    sampler = ZipfSampler(1000, 1.0, random.Random(1))
+    ranks = Counter(sampler.sample() for _ in range(10000))
+    assert min(ranks) >= 0 and max(ranks) < 1000
+    assert ranks[0] > ranks[9] > ranks[99]
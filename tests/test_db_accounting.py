@@ -0,0 +1,71 @@
+import json
+import logging
+
+import pytest
+from app import create_app
+from db_instrumentation import assert_max_queries, count_queries
+from services.library_service import add_book_to_catalog, borrow_book_by_patron
+
+
+@pytest.fixture
+def app(app):
+    app.config.update(DB_ACCOUNTING_HEADERS=True)
+    return app
+
+
+def test_service_round_trip_budgets(max_queries):
+    # Reads share one connection per thread and writes one per process
+    with max_queries(statements=4, connections=2):
+        assert borrow_book_by_patron("123456", 1)[0]
+    with max_queries(statements=2, connections=0):
+        assert add_book_to_catalog("Budget Book", "Author", "1234567890123", 1)[0]
+
+
+def test_exceeded_budget_lists_statements():
+    with pytest.raises(AssertionError) as excinfo:
+        with assert_max_queries(statements=3):
+            borrow_book_by_patron("123456", 1)
+
+    message = str(excinfo.value)
+    assert "statements: 4 > 3" in message
+    assert "1 x INSERT INTO borrow_records" in message
+
+
+def test_nested_scopes_both_count():
+    with count_queries() as outer:
+        borrow_book_by_patron("123456", 1)
+        with count_queries() as inner:
+            add_book_to_catalog("Nested Book", "Author", "1234567890124", 1)
+
+    assert inner.statements == 2
+    assert outer.statements == 6
+    assert (inner.connections, outer.connections) == (0, 2)
+
+
+def test_response_headers_and_n_plus_one_warning(app, caplog):
+    client = app.test_client()
+    assert client.get("/api/search?q=gatsby&type=title").headers["X-DB-Connections"] == "1"
+    response = client.get("/api/search?q=gatsby&type=title")
+    assert int(response.headers["X-DB-Statements"]) >= 1
+    # The read connection opened by the first request on this thread is reused
+    assert response.headers["X-DB-Connections"] == "0"
+    assert "X-DB-Time-Ms" in response.headers
+
+    app.config["N_PLUS_ONE_THRESHOLD"] = 1
+    with caplog.at_level(logging.INFO, logger="library.db_accounting"):
+        client.get("/catalog")
+    record = caplog.records[-1]
+    assert record.levelno == logging.WARNING
+    details = json.loads(record.getMessage())
+    assert details["endpoint"] == "catalog.catalog"
+    assert details["repeated"]
+
+
+def test_async_views_count_pool_queries(app):
+    response = app.test_client().get("/api/async/search?q=gatsby&type=title")
+    assert int(response.headers["X-DB-Statements"]) >= 1
+
+
+def test_headers_off_outside_debug():
+    app = create_app()
+    assert "X-DB-Statements" not in app.test_client().get("/catalog").headers
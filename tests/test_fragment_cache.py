@@ -0,0 +1,67 @@
+import os
+
+import pytest
+import database as db
+from routes.fragment_cache import FragmentCache, row_cache
+
+
+@pytest.fixture
+def app(app):
+    row_cache.clear()
+    return app
+
+
+def test_second_render_uses_cached_rows(client):
+    first = client.get("/catalog").data
+    misses = row_cache.misses
+
+    second = client.get("/catalog").data
+
+    assert first == second
+    assert row_cache.misses == misses
+    assert row_cache.hits == 3
+
+
+def test_availability_change_rerenders_only_that_row(client):
+    client.get("/catalog")
+    misses = row_cache.misses
+
+    db.update_book_availability(1, -1)
+    page = client.get("/catalog").data.decode()
+
+    assert row_cache.misses == misses + 1
+    assert "2/3 Available" in page
+
+
+def test_new_book_appears(client):
+    client.get("/catalog")
+    db.insert_book("Dune", "Frank Herbert", "9780441172719", 2, 2)
+
+    page = client.get("/catalog").data.decode()
+
+    assert "Frank Herbert" in page
+    assert db.get_book_by_isbn("9780441172719")["version"] == 1
+
+
+def test_recreated_database_does_not_reuse_rows(client):
+    client.get("/catalog")
+
+    # Same path, same book ids and versions, different books
+    db.close_connections()
+    os.remove(db.DATABASE)
+    db.init_database()
+    db.insert_book("Dune", "Frank Herbert", "9780441172719", 3, 3)
+    page = client.get("/catalog").data.decode()
+
+    assert "Frank Herbert" in page
+    assert "F. Scott Fitzgerald" not in page
+
+
+def test_cache_is_bounded_lru():
+    cache = FragmentCache(max_entries=2)
+    cache.put_many({"a": "1", "b": "2"})
+    cache.get_many(["a"])
+    cache.put_many({"c": "3"})
+
+    assert len(cache) == 2
+    assert cache.get_many(["a", "b", "c"]) == ["1", None, "3"]
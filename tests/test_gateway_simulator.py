@@ -0,0 +1,75 @@
+import pytest
+from services.gateway_simulator import GatewayProfile, GatewaySimulator
+from services.payment_service import PaymentGateway, PaymentGatewayError, gateway_breaker
+
+
+@pytest.fixture
+def simulator():
+    gateway_breaker.reset()
+    with GatewaySimulator(profile="ideal", seed=1) as sim:
+        yield sim
+
+
+def test_charge_status_and_refund_over_http(simulator):
+    gateway = PaymentGateway(base_url=simulator.url)
+
+    success, txn_id, msg = gateway.process_payment("123456", 4.50, "Late fees")
+
+    assert success == True
+    assert txn_id.startswith("txn_123456_")
+    assert msg == "Payment of $4.50 processed successfully"
+
+    status = gateway.verify_payment_status(txn_id)
+    assert status["status"] == "completed"
+    assert status["amount"] == 4.50
+
+    success, msg = gateway.refund_payment(txn_id, 4.50)
+    assert success == True
+    assert "Refund ID: refund_" in msg
+    assert gateway.verify_payment_status(txn_id)["status"] == "refunded"
+
+
+def test_declines_are_returned_not_raised(simulator):
+    gateway = PaymentGateway(base_url=simulator.url)
+
+    success, txn_id, msg = gateway.process_payment("123456", 1001.0, "Late fees")
+
+    assert success == False
+    assert txn_id == ""
+    assert msg == "Payment declined: amount exceeds limit"
+    assert gateway.verify_payment_status("txn_unknown")["status"] == "not_found"
+
+
+def test_injected_errors_raise_gateway_error(simulator):
+    simulator.set_profile(GatewayProfile(error_rate=1.0))
+    gateway = PaymentGateway(base_url=simulator.url)
+
+    with pytest.raises(PaymentGatewayError):
+        gateway.process_payment("123456", 5.0, "Late fees")
+
+
+def test_client_timeout_on_hanging_request(simulator):
+    simulator.set_profile(GatewayProfile(timeout_rate=1.0, hang_seconds=0.5))
+    gateway = PaymentGateway(base_url=simulator.url, timeout=0.1)
+
+    with pytest.raises(PaymentGatewayError):
+        gateway.process_payment("123456", 5.0, "Late fees")
+
+
+def test_rate_limit_rejects_excess_requests(simulator):
+    simulator.set_profile(GatewayProfile(rate_limit=1, rate_burst=2))
+    gateway = PaymentGateway(base_url=simulator.url)
+
+    gateway.process_payment("123456", 5.0)
+    gateway.process_payment("123456", 5.0)
+    with pytest.raises(PaymentGatewayError, match="429"):
+        gateway.process_payment("123456", 5.0)
+
+
+def test_gateway_url_from_environment(monkeypatch, simulator):
+    monkeypatch.setenv("PAYMENT_GATEWAY_URL", simulator.url)
+
+    gateway = PaymentGateway()
+
+    assert gateway.use_http == True
+    assert gateway.base_url == simulator.url
@@ -0,0 +1,47 @@
+import database as db
+from benchmarks.loadgen import InProcessClient, Workload, parse_mix, run_load
+
+
+def test_in_process_run_reports_every_route(app):
+    app.config["RATE_LIMITS"] = {}
+    app.logger.disabled = True
+    workload = Workload.from_database(db.DATABASE)
+
+    report = run_load(lambda: InProcessClient(app), workload,
+                      mix=parse_mix("catalog=1,search=1,borrow=1,return=1"),
+                      patrons=2, duration=5, max_requests=20)
+
+    assert report["total"]["requests"] == 40
+    assert set(report["routes"]) == {"catalog", "search", "borrow", "return"}
+    assert report["total"]["errors"] == 0
+    # Repeat catalog views are revalidated with the page's ETag
+    assert report["routes"]["catalog"]["not_modified"] > 0
+    assert report["routes"]["catalog"]["latency"]["p99_ms"] >= report["routes"]["catalog"]["latency"]["p50_ms"]
+
+
+def test_server_errors_and_rate_limits_are_counted_separately(app, mocker):
+    mocker.patch("routes.api_routes.calculate_late_fee_for_book", side_effect=RuntimeError("boom"))
+    # Answer the error with a 500 instead of raising it into the test
+    app.config["TESTING"] = False
+    app.config["RATE_LIMITS"] = {"borrowing": {"burst": 1, "rate": 0.001}}
+    app.config["RATE_LIMIT_STORAGE"] = "memory"
+    app.logger.disabled = True
+    workload = Workload.from_database(db.DATABASE)
+
+    report = run_load(lambda: InProcessClient(app), workload, mix={"borrow": 1, "late_fee": 1},
+                      patrons=1, duration=5, max_requests=30, seed=3)
+
+    borrow = report["routes"]["borrow"]
+    assert borrow["rate_limited"] == borrow["requests"] - 1
+    assert borrow["errors"] == 0
+    assert report["routes"]["late_fee"]["error_rate"] == 1.0
+    assert report["routes"]["late_fee"]["statuses"] == {"500": report["routes"]["late_fee"]["requests"]}
+
+
+def test_workload_from_catalog_page(client):
+    html = client.get("/catalog").get_data(as_text=True)
+
+    workload = Workload.from_catalog(html)
+
+    assert sorted(workload.book_ids) == [1, 2, 3]
+    assert "George Orwell" in workload.authors
@@ -0,0 +1,92 @@
+import re
+import threading
+
+import pytest
+from metrics import MetricsRegistry, SqliteMetricsStore
+from services.gateway_simulator import GatewaySimulator
+from services.payment_service import PaymentGateway, gateway_breaker
+
+
+def _value(text, sample):
+    match = re.search(r"^" + re.escape(sample) + r" (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_histogram_buckets_are_cumulative_and_threads_add_up():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+
+    def observe():
+        for value in (0.05, 0.5, 5):
+            latency.observe(value, "home")
+
+    threads = [threading.Thread(target=observe) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    text = registry.render(registry.collect())
+    assert _value(text, 'latency_seconds_bucket{route="home",le="0.1"}') == 4
+    assert _value(text, 'latency_seconds_bucket{route="home",le="1"}') == 8
+    assert _value(text, 'latency_seconds_bucket{route="home",le="+Inf"}') == 12
+    assert _value(text, 'latency_seconds_count{route="home"}') == 12
+    assert _value(text, 'latency_seconds_sum{route="home"}') == pytest.approx(22.2)
+
+
+def test_workers_aggregate_in_shared_store(tmp_path):
+    store = SqliteMetricsStore(str(tmp_path / "metrics.db"))
+    workers = [MetricsRegistry() for _ in range(2)]
+    counters = [worker.counter("jobs_total", "Jobs", ("kind",)) for worker in workers]
+
+    counters[0].inc("a", amount=3)
+    counters[1].inc("a")
+    counters[1].inc("b")
+    for worker in workers:
+        worker.flush(store)
+    counters[0].inc("a")
+    workers[0].flush(store)
+    workers[0].flush(store)
+
+    text = workers[1].render(store.totals())
+    assert _value(text, 'jobs_total{kind="a"}') == 5
+    assert _value(text, 'jobs_total{kind="b"}') == 1
+
+
+def test_metrics_endpoint_reports_requests_queries_and_caches(client):
+    before = client.get("/metrics").get_data(as_text=True)
+    first = client.get("/catalog")
+    client.get("/catalog", headers={"If-None-Match": first.headers["ETag"]})
+    client.get("/api/search?q=gatsby&type=title")
+
+    response = client.get("/metrics")
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    text = response.get_data(as_text=True)
+
+    def delta(sample):
+        return _value(text, sample) - _value(before, sample)
+
+    catalog = 'blueprint="catalog",endpoint="catalog.catalog"'
+    assert delta(f'library_http_requests_total{{{catalog},method="GET",status="200"}}') == 1
+    assert delta(f'library_http_requests_total{{{catalog},method="GET",status="304"}}') == 1
+    assert delta(f'library_http_request_duration_seconds_count{{{catalog}}}') == 2
+    assert delta('library_http_request_duration_seconds_count{blueprint="api",endpoint="api.search_books_api"}') == 1
+    assert delta('library_db_query_duration_seconds_count{operation="SELECT"}') > 0
+    assert delta('library_cache_lookups_total{cache="http_etag",result="hit"}') == 1
+    assert 'library_cache_hit_ratio{cache="fragment"}' in text
+
+
+def test_gateway_calls_counted_by_outcome():
+    from metrics import registry
+
+    gateway_breaker.reset()
+    before = registry.render(registry.collect())
+    with GatewaySimulator(profile="ideal") as simulator:
+        gateway = PaymentGateway(base_url=simulator.url)
+        gateway.process_payment("123456", 5.0, "Late fees")
+        gateway.process_payment("123456", -1, "Late fees")
+    text = registry.render(registry.collect())
+
+    for outcome in ("ok", "declined"):
+        sample = f'library_payment_gateway_calls_total{{method="POST",resource="charges",outcome="{outcome}"}}'
+        assert _value(text, sample) - _value(before, sample) == 1
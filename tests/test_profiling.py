@@ -0,0 +1,70 @@
+import json
+import os
+
+import pytest
+
+from routes.profiling import REPORT_ID, _report_id
+
+
+@pytest.fixture
+def app(app, tmp_path):
+    app.config.update(ADMIN_ALLOW_LOCAL=True, PROFILE_TOKEN="let-me-profile", PROFILE_DIR=str(tmp_path / "profiles"))
+    return app
+
+
+def test_token_profiles_request_and_writes_report(app, tmp_path):
+    client = app.test_client()
+    response = client.get("/api/search?q=gatsby&type=title", headers={"X-Profile-Token": "let-me-profile"})
+
+    report_id = response.headers["X-Profile-Id"]
+    directory = tmp_path / "profiles"
+    assert {f"{report_id}.{kind}" for kind in ("json", "prof", "txt")} <= set(os.listdir(directory))
+    summary = json.loads((directory / f"{report_id}.json").read_text())
+    assert summary["endpoint"] == "api.search_books_api"
+    assert summary["trigger"] == "requested"
+    report = (directory / f"{report_id}.txt").read_text()
+    assert "search_books_api" in report
+    assert "allocation sites" in report
+
+
+def test_wrong_token_and_unsampled_requests_are_not_profiled(app, tmp_path):
+    client = app.test_client()
+    assert "X-Profile-Id" not in client.get("/catalog", headers={"X-Profile-Token": "guess"}).headers
+    # The token is only accepted as a header, never from the logged query string
+    assert "X-Profile-Id" not in client.get("/catalog?profile=let-me-profile").headers
+    assert "X-Profile-Id" not in client.get("/catalog").headers
+    assert not (tmp_path / "profiles").exists()
+
+
+def test_sampling_and_pruning(app, tmp_path):
+    app.config.update(PROFILE_TOKEN=None, PROFILE_SAMPLE_RATE=1, PROFILE_KEEP=2)
+    client = app.test_client()
+    ids = [client.get("/catalog").headers["X-Profile-Id"] for _ in range(3)]
+
+    names = os.listdir(tmp_path / "profiles")
+    assert len(names) == 6
+    assert not any(name.startswith(ids[0]) for name in names)
+
+
+def test_admin_index_lists_reports(app):
+    client = app.test_client()
+    report_id = client.get("/catalog", headers={"X-Profile-Token": "let-me-profile"}).headers["X-Profile-Id"]
+
+    index = client.get("/admin/profiles").get_data(as_text=True)
+    assert f"/admin/profiles/{report_id}.txt" in index
+    assert client.get(f"/admin/profiles/{report_id}.txt").status_code == 200
+    assert client.get("/admin/profiles/..%2Fapp.txt").status_code == 404
+
+
+def test_report_ids_sort_by_time_across_processes(mocker):
+    mocker.patch("routes.profiling.time.time_ns", side_effect=[1_700_000_000_100_000_000,
+                                                               1_700_000_000_200_000_000])
+    getpid = mocker.patch("routes.profiling.os.getpid", return_value=123456)
+    older = _report_id("catalog.catalog")
+    getpid.return_value = 99
+    newer = _report_id(None)
+
+    assert sorted([older, newer], reverse=True) == [newer, older]
+    assert older.startswith("20231114-221320-100000000-0123456-")
+    assert REPORT_ID.match(older) and REPORT_ID.match(newer)
+    assert REPORT_ID.match("20231114-221320-123456-000001-catalog.catalog")
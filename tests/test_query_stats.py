@@ -0,0 +1,105 @@
+import json
+import logging
+
+import pytest
+import database as db
+from db_instrumentation import OTHER_STATEMENTS, QueryStats, normalize_sql, query_stats
+
+
+@pytest.fixture
+def app(app):
+    app.config.update(ADMIN_ALLOW_LOCAL=True)
+    query_stats.reset()
+    return app
+
+
+def _entry(sql):
+    sql = normalize_sql(sql)
+    return next(entry for entry in query_stats.snapshot() if entry["sql"] == sql)
+
+
+def test_records_calls_rows_and_call_sites():
+    query_stats.reset()
+    db.get_all_books()
+    db.get_all_books()
+
+    entry = _entry("SELECT * FROM books ORDER BY title")
+    assert entry["calls"] == 2
+    assert entry["rows"] == 2 * len(db.get_all_books())
+    assert entry["call_sites"][0]["site"].startswith("database.py:")
+    assert "get_all_books" in entry["call_sites"][0]["site"]
+    assert "test_query_stats.py" in entry["call_sites"][0]["site"]
+
+
+def test_cursor_still_reads_like_sqlite():
+    conn = db.get_db_connection()
+    cursor = conn.execute("SELECT id, title FROM books ORDER BY id")
+    first = cursor.fetchone()
+    assert first["id"] == 1
+    assert len(cursor.fetchmany(1)) == 1
+    rest = list(cursor)
+    assert cursor.fetchone() is None
+    assert len(rest) == len(db.get_all_books()) - 2
+
+    cursor = conn.execute("UPDATE books SET total_copies = total_copies WHERE id = 1")
+    assert cursor.rowcount == 1
+    conn.close()
+
+
+def test_slow_statements_logged_with_plan(caplog):
+    query_stats.reset()
+    query_stats.slow_threshold_ms, threshold = 0, query_stats.slow_threshold_ms
+    try:
+        with caplog.at_level(logging.WARNING, logger="library.slow_queries"):
+            db.get_book_by_isbn("9780743273565")
+    finally:
+        query_stats.slow_threshold_ms = threshold
+
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record["sql"] == "SELECT * FROM books WHERE isbn = ?"
+    assert any("isbn" in step for step in record["plan"])
+    assert _entry(record["sql"])["slow_calls"] == 1
+
+
+def test_admin_endpoint_lists_and_resets(client):
+    client.get("/api/search?q=gatsby")
+    data = client.get("/admin/queries?sort=calls").get_json()
+    assert data["statements"]
+    assert data["statements"][0]["calls"] >= data["statements"][-1]["calls"]
+
+    assert client.get("/admin/queries?sort=bogus").status_code == 400
+    assert client.post("/admin/queries/reset").get_json()["reset"] is True
+    assert query_stats.snapshot() == []
+
+
+def test_admin_requires_token_or_local_request(client):
+    assert client.get("/admin/queries", environ_base={"REMOTE_ADDR": "10.0.0.5"}).status_code == 403
+    client.application.config["ADMIN_ALLOW_LOCAL"] = False
+    assert client.get("/admin/queries").status_code == 403
+
+    client.application.config["ADMIN_TOKEN"] = "secret"
+    assert client.get("/admin/queries").status_code == 403
+    assert client.get("/admin/queries", headers={"X-Admin-Token": "secret"}).status_code == 200
+
+
+def test_placeholder_lists_share_one_entry():
+    query_stats.reset()
+    db.get_books_by_isbns(["9780743273565"])
+    db.get_books_by_isbns(["9780743273565", "9780061120084", "9780451524935"])
+
+    entries = [entry for entry in query_stats.snapshot() if "isbn IN" in entry["sql"]]
+    assert len(entries) == 1
+    assert entries[0]["calls"] == 2
+
+
+def test_statements_and_plans_are_capped(monkeypatch):
+    monkeypatch.setattr("db_instrumentation.MAX_STATEMENTS", 3)
+    stats = QueryStats()
+    for i in range(5):
+        stats.record(f"SELECT {i}", 0.001, 1, "test")
+        stats.cache_plan(f"SELECT {i}", ["SCAN"])
+
+    entries = {entry["sql"]: entry for entry in stats.snapshot()}
+    assert len(entries) == 4
+    assert entries[OTHER_STATEMENTS]["calls"] == 2
+    assert stats.cached_plan("SELECT 4") is None
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+from app import create_app
+from routes.rate_limit import MemoryBucketStore, SqliteBucketStore
+
+
+@pytest.fixture
+def app(app):
+    app.config["RATE_LIMITS"] = {"borrowing": {"burst": 2, "rate": 0.1}}
+    return app
+
+
+def _borrow(client, patron_id="123456", ip="10.0.0.1"):
+    return client.post("/borrow", data={"patron_id": patron_id, "book_id": "1"},
+                       environ_base={"REMOTE_ADDR": ip})
+
+
+def test_patron_limited_after_burst(app):
+    client = app.test_client()
+
+    assert _borrow(client, ip="10.0.0.1").status_code == 302
+    assert _borrow(client, ip="10.0.0.2").status_code == 302
+    response = _borrow(client, ip="10.0.0.3")
+
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 10
+
+
+def test_ip_limited_across_patrons(app):
+    client = app.test_client()
+
+    _borrow(client, patron_id="111111")
+    _borrow(client, patron_id="222222")
+
+    assert _borrow(client, patron_id="333333").status_code == 429
+
+
+def test_reads_and_other_blueprints_not_limited(app):
+    client = app.test_client()
+    for _ in range(5):
+        assert client.get("/return").status_code == 200
+        assert client.get("/catalog").status_code == 200
+
+
+def test_limit_shared_between_app_instances(app):
+    """Two apps on the same database behave like two worker processes."""
+    other = create_app()
+    other.config["RATE_LIMITS"] = app.config["RATE_LIMITS"]
+
+    _borrow(app.test_client())
+    _borrow(other.test_client())
+
+    assert _borrow(app.test_client()).status_code == 429
+
+
+def test_rejected_requests_do_not_drain_the_patron_bucket(app):
+    client = app.test_client()
+    _borrow(client, patron_id="111111", ip="10.0.0.9")
+    _borrow(client, patron_id="222222", ip="10.0.0.9")
+
+    # An IP over its limit keeps naming the victim's patron ID
+    for _ in range(5):
+        assert _borrow(client, patron_id="123456", ip="10.0.0.9").status_code == 429
+    assert _borrow(client, patron_id="123456", ip="10.0.0.1").status_code == 302
+
+
+def test_patron_from_url_is_limited(app):
+    app.config["RATE_LIMITS"] = {"async_api": {"burst": 1, "rate": 0.1}}
+    client = app.test_client()
+    client.post("/api/async/late_fee/123456/1/pay", environ_base={"REMOTE_ADDR": "10.0.0.1"})
+
+    response = client.post("/api/async/late_fee/123456/1/pay", environ_base={"REMOTE_ADDR": "10.0.0.2"})
+    assert response.status_code == 429
+
+
+@pytest.mark.parametrize("store_factory", [MemoryBucketStore, lambda: SqliteBucketStore(":memory:")])
+def test_bucket_refills(store_factory):
+    store = store_factory()
+
+    assert store.take(["k"], burst=1, rate=20) == (True, 0.0)
+    allowed, retry_after = store.take(["k"], burst=1, rate=20)
+    assert allowed is False
+    assert 0 < retry_after <= 0.05
+
+    time.sleep(0.06)
+    assert store.take(["k"], burst=1, rate=20)[0] is True
+
+
+@pytest.mark.parametrize("store_factory", [MemoryBucketStore, lambda: SqliteBucketStore(":memory:")])
+def test_full_buckets_are_pruned(store_factory, monkeypatch):
+    store = store_factory()
+    store.take(["idle"], burst=2, rate=100)
+    store.take(["busy"], burst=2, rate=0.001)
+    time.sleep(0.02)
+    monkeypatch.setattr("routes.rate_limit.PRUNE_INTERVAL", 0)
+    store.take(["busy"], burst=2, rate=0.001)
+
+    if isinstance(store, MemoryBucketStore):
+        remaining = set(store._buckets)
+    else:
+        remaining = {key for (key,) in store._connection().execute("SELECT key FROM token_buckets")}
+    assert remaining == {"busy"}
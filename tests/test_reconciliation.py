@@ -0,0 +1,120 @@
+import csv
+import json
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+import database as db
+from services.gateway_simulator import GatewaySimulator
+from services.library_service import pay_late_fees
+from services.payment_service import PaymentGateway, gateway_breaker
+from services.reconciliation import compare_transaction, load_checkpoint, reconcile
+
+
+@pytest.fixture
+def simulator():
+    gateway_breaker.reset()
+    with GatewaySimulator(profile="ideal", seed=1) as sim:
+        yield sim
+
+
+def _record_payments(simulator, count):
+    gateway = PaymentGateway(base_url=simulator.url)
+    now = datetime.now()
+    txn_ids = []
+    for i in range(count):
+        success, txn_id, _ = gateway.process_payment("123456", 2.50)
+        assert success
+        db.insert_payment_transaction(txn_id, "123456", 1, 2.50, now)
+        txn_ids.append(txn_id)
+    return gateway, txn_ids
+
+
+def _read_report(path):
+    with open(path) as f:
+        return list(csv.DictReader(f))
+
+
+def test_reconcile_reports_discrepancies(simulator, tmp_path):
+    gateway, txn_ids = _record_payments(simulator, 5)
+    gateway.refund_payment(txn_ids[0], 2.50)
+    now = datetime.now()
+    db.insert_payment_transaction("txn_123456_missing", "123456", 1, 2.50, now)
+    db.insert_payment_transaction("txn_old", "123456", 1, 2.50, now - timedelta(days=30))
+
+    report = tmp_path / "report.csv"
+    summary = reconcile(now - timedelta(days=1), now + timedelta(days=1), str(report),
+                        workers=4, gateway_factory=lambda: PaymentGateway(base_url=simulator.url))
+
+    assert summary["total"] == 6
+    assert summary["verified"] == 6
+    assert summary["errors"] == 0
+    issues = {row["transaction_id"]: row["issue"] for row in _read_report(report)}
+    assert issues == {
+        txn_ids[0]: "status_refunded",
+        "txn_123456_missing": "missing_at_gateway",
+    }
+
+
+def test_reconcile_resumes_from_checkpoint(simulator, tmp_path):
+    _, txn_ids = _record_payments(simulator, 4)
+    now = datetime.now()
+    checkpoint = tmp_path / "reconcile.ckpt"
+    checkpoint.write_text(json.dumps({
+        "transaction_id": txn_ids[0], "patron_id": "123456", "book_id": 1, "recorded_amount": 2.5,
+        "gateway_status": "completed", "gateway_amount": 2.5, "issue": None,
+    }) + "\n" + '{"transaction_id": "trunc')
+
+    summary = reconcile(now - timedelta(days=1), now + timedelta(days=1), str(tmp_path / "report.csv"),
+                        checkpoint_path=str(checkpoint),
+                        gateway_factory=lambda: PaymentGateway(base_url=simulator.url))
+
+    assert summary["skipped"] == 1
+    assert summary["verified"] == 3
+    assert set(load_checkpoint(str(checkpoint))) == set(txn_ids)
+
+
+def test_reconcile_leaves_failed_checks_for_retry(simulator, tmp_path):
+    _, txn_ids = _record_payments(simulator, 3)
+    now = datetime.now()
+    simulator.set_profile("outage")
+    checkpoint = tmp_path / "reconcile.ckpt"
+
+    summary = reconcile(now - timedelta(days=1), now + timedelta(days=1), str(tmp_path / "report.csv"),
+                        checkpoint_path=str(checkpoint),
+                        gateway_factory=lambda: PaymentGateway(base_url=simulator.url))
+
+    assert summary["errors"] == 3
+    assert load_checkpoint(str(checkpoint)) == {}
+
+
+def test_amount_compared_only_when_gateway_reports_one():
+    record = {"amount": 4.50}
+    assert compare_transaction(record, {"status": "completed", "amount": None}) is None
+    assert compare_transaction(record, {"status": "completed", "amount": 4.50}) is None
+    assert compare_transaction(record, {"status": "completed", "amount": 10.50}) == "amount_mismatch"
+
+
+def test_in_process_transaction_ids_are_unique(mocker, monkeypatch):
+    mocker.patch("services.payment_service.time.sleep")
+    monkeypatch.delenv("PAYMENT_GATEWAY_URL", raising=False)
+    gateway = PaymentGateway()
+
+    txn_ids = {gateway.process_payment("123456", 2.50)[1] for _ in range(3)}
+
+    assert len(txn_ids) == 3
+    assert compare_transaction({"amount": 2.50}, gateway.verify_payment_status(txn_ids.pop())) is None
+
+
+def test_unrecorded_payment_is_logged(mocker, caplog):
+    mocker.patch("services.library_service.calculate_late_fee_for_book", return_value={"fee_amount": 4.50})
+    mocker.patch("services.library_service.get_book_by_id", return_value={"id": 1, "title": "1984"})
+    mocker.patch("services.library_service.insert_payment_transaction", return_value=False)
+    gateway = mocker.Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_123456_dup", "ok")
+
+    with caplog.at_level(logging.ERROR, logger="services.library_service"):
+        success, _, txn_id = pay_late_fees("123456", 1, gateway)
+
+    assert success is True
+    assert "txn_123456_dup" in caplog.text
@@ -0,0 +1,55 @@
+import json
+
+from benchmarks.regression import compare, format_table, main, mann_whitney_greater
+
+
+def _report(cases, calibration_ms=10.0):
+    return {"calibration_ms": calibration_ms, "cases": cases}
+
+
+def test_mann_whitney_detects_shift_but_not_identical_samples():
+    base = [1.0, 1.1, 0.9, 1.05, 0.95, 1.02, 0.98, 1.01, 0.99, 1.03]
+    assert mann_whitney_greater(base, [value * 2 for value in base]) < 0.001
+    assert mann_whitney_greater(base, list(base)) > 0.4
+    assert mann_whitney_greater([1.0] * 10, [1.0] * 10) == 0.5
+
+
+def test_compare_verdicts():
+    base = [1.0, 1.1, 0.9, 1.05, 0.95, 1.02, 0.98, 1.01, 0.99, 1.03]
+    baseline = _report({"slow": base, "fast": base, "same": base, "noisy": base})
+    current = _report({
+        "slow": [value * 2 for value in base],
+        "fast": [value / 3 for value in base],
+        "same": [value * 1.05 for value in base],
+        "noisy": base[:-1] + [40.0],
+        "added": base,
+    })
+
+    rows, scale = compare(baseline, current, tolerance=0.5, alpha=0.01)
+    verdicts = {row["case"]: row["verdict"] for row in rows}
+    assert scale == 1.0
+    assert verdicts == {"slow": "REGRESSION", "fast": "faster", "same": "ok", "noisy": "ok", "added": "new"}
+    assert "REGRESSION" in format_table(rows)
+
+
+def test_compare_normalizes_by_calibration():
+    base = [1.0, 1.1, 0.9, 1.05, 0.95, 1.02, 0.98, 1.01, 0.99, 1.03]
+    # Same code on a machine twice as slow
+    rows, scale = compare(_report({"case": base}, 10.0),
+                          _report({"case": [value * 2 for value in base]}, 20.0), 0.5, 0.01)
+    assert scale == 0.5
+    assert rows[0]["verdict"] == "ok"
+
+
+def test_check_exits_nonzero_on_regression(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    assert main(["--save", str(baseline), "--cases", "get_all_books", "--rounds", "4", "--calls", "2"]) == 0
+    report = json.loads(baseline.read_text())
+    assert len(report["cases"]["get_all_books"]) == 4
+    assert main(["--check", str(baseline), "--cases", "get_all_books", "--rounds", "4", "--calls", "2",
+                 "--tolerance", "10"]) == 0
+
+    report["cases"]["get_all_books"] = [0.0001] * 10
+    baseline.write_text(json.dumps(report))
+    assert main(["--check", str(baseline), "--cases", "get_all_books", "--rounds", "4", "--calls", "2",
+                 "--no-normalize"]) == 1
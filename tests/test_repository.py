@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+import pytest
+import database as db
+from memory_repository import MemoryRepository
+from repository import SqliteRepository, get_repository
+from services.library_service import add_book_to_catalog, borrow_book_by_patron
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def repo(request):
+    if request.param == "sqlite":
+        return SqliteRepository()
+    repository = MemoryRepository()
+    repository.add_sample_data()
+    return repository
+
+
+def _exercise(repo):
+    """The same writes and reads against any backend; returns what a caller can observe."""
+    now = datetime.now().replace(microsecond=0)
+    observed = {"versions_before": {name: v["version"] for name, v in repo.get_data_versions().items()
+                                    if name != "epoch"}}
+    observed["insert"] = repo.insert_book("Zebra", "Author Z", "9990000000001", 2, 2)
+    observed["duplicate_isbn"] = repo.insert_book("Other", "Author", "9990000000001", 1, 1)
+    observed["titles"] = [book["title"] for book in repo.get_all_books()]
+    zebra = repo.get_book_by_isbn("9990000000001")
+    observed["zebra"] = {key: zebra[key] for key in ("title", "available_copies", "version")}
+    observed["by_isbns"] = sorted(repo.get_books_by_isbns(["9990000000001", "missing", "9990000000001"]))
+
+    repo.insert_borrow_record("111111", zebra["id"], now - timedelta(days=20), now - timedelta(days=6))
+    repo.insert_borrow_record("111111", 1, now - timedelta(days=1), now + timedelta(days=13))
+    repo.update_book_availability(zebra["id"], -1)
+    repo.update_book_availability(1, 0)
+    repo.update_book_availability(12345, -1)
+    observed["borrowed"] = [(loan["title"], loan["is_overdue"]) for loan in repo.get_patron_borrowed_books("111111")]
+    observed["count"] = repo.get_patron_borrow_count("111111")
+    repo.update_borrow_record_return_date("111111", zebra["id"], now)
+    observed["count_after_return"] = repo.get_patron_borrow_count("111111")
+    observed["popularity"] = repo.get_book_popularity()
+    observed["zebra_after"] = {key: repo.get_book_by_id(zebra["id"])[key] for key in ("available_copies", "version")}
+    observed["missing"] = repo.get_book_by_id(12345)
+
+    observed["payments"] = [repo.insert_payment_transaction("txn_1", "111111", 3, 1.5, now),
+                            repo.insert_payment_transaction("txn_1", "111111", 3, 1.5, now),
+                            repo.insert_payment_transaction("txn_2", "111111", 3, 2.0, now + timedelta(days=1))]
+    observed["payments_in_range"] = [(p["transaction_id"], p["amount"])
+                                     for p in repo.get_payment_transactions(now, now + timedelta(days=1))]
+
+    events = repo.get_availability_events()
+    observed["events"] = [(e["book_id"], e["available_copies"]) for e in events]
+    observed["latest"] = [(e["book_id"], e["available_copies"]) for e in repo.get_latest_availability_events(1)]
+    observed["after_first"] = len(repo.get_availability_events(events[0]["id"]))
+    observed["pruned"] = repo.prune_availability_events(1)
+    observed["remaining"] = len(repo.get_availability_events())
+    observed["versions_after"] = {name: v["version"] for name, v in repo.get_data_versions().items()
+                                  if name != "epoch"}
+    return observed
+
+
+def test_backends_have_the_same_semantics(tmp_path, monkeypatch):
+    results = []
+    for repo in (SqliteRepository(), MemoryRepository()):
+        if isinstance(repo, MemoryRepository):
+            repo.add_sample_data()
+        results.append(_exercise(repo))
+
+    sqlite_result, memory_result = results
+    assert sqlite_result == memory_result
+    assert sqlite_result["duplicate_isbn"] is False
+    assert sqlite_result["borrowed"] == [("Zebra", True), ("The Great Gatsby", False)]
+    assert sqlite_result["events"] == [(3, 0), (4, 1)]
+
+
+def test_writes_notify_listeners(repo):
+    seen = []
+
+    def listener(book):
+        seen.append(book)
+
+    db.add_write_listener("book_inserted", listener)
+    try:
+        repo.insert_book("Listened", "Author", "9990000000002", 1, 1)
+    finally:
+        db.remove_write_listener("book_inserted", listener)
+    assert seen[0]["isbn"] == "9990000000002" and seen[0]["version"] == 1
+
+
+def test_returned_rows_are_copies(repo):
+    repo.get_book_by_id(1)["available_copies"] = 99
+    repo.get_all_books()[0]["title"] = "Changed"
+    assert repo.get_book_by_id(1)["available_copies"] == 3
+    assert repo.get_all_books()[0]["title"] == "1984"
+
+
+def test_from_database_copies_the_sqlite_rows():
+    borrow_book_by_patron("222222", 1)
+    repository = MemoryRepository.from_database()
+
+    assert repository.get_all_books() == db.get_all_books()
+    assert repository.get_data_versions() == db.get_data_versions()
+    assert repository.get_availability_events() == db.get_availability_events()
+    assert repository.insert_book("Next", "Author", "9990000000003", 1, 1)
+    assert repository.get_book_by_isbn("9990000000003")["id"] == 4
+
+
+def test_service_layer_runs_on_the_memory_repository(memory_repository, tmp_path, monkeypatch):
+    # Any access to the SQLite file would fail from here on
+    monkeypatch.setattr(db, "DATABASE", str(tmp_path / "missing" / "library.db"))
+    assert get_repository() is memory_repository
+
+    assert add_book_to_catalog("Memory Book", "Author", "9990000000004", 1)[0]
+    book_id = memory_repository.get_book_by_isbn("9990000000004")["id"]
+    assert borrow_book_by_patron("333333", book_id)[0]
+    assert not borrow_book_by_patron("444444", book_id)[0]
+    assert memory_repository.get_patron_borrow_count("333333") == 1
+    assert memory_repository.get_book_by_id(book_id)["available_copies"] == 0
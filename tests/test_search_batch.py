@@ -0,0 +1,60 @@
+import pytest
+import database as db
+from services.library_service import search_books_in_catalog_batch
+
+
+def test_isbn_lookups_merged_into_one_query(mocker):
+    get_books_by_isbns = mocker.spy(db, "get_books_by_isbns")
+    mocker.patch("services.library_service.get_books_by_isbns", get_books_by_isbns)
+
+    results = search_books_in_catalog_batch([
+        ("9780743273565", "isbn"),
+        ("9780451524935", "isbn"),
+        ("9780743273565", "isbn"),
+        ("0000000000000", "isbn"),
+    ])
+
+    assert get_books_by_isbns.call_count == 1
+    assert [len(r) for r in results] == [1, 1, 1, 0]
+    assert results[0][0]["title"] == "The Great Gatsby"
+    assert results[1][0]["title"] == "1984"
+
+
+def test_duplicate_text_queries_searched_once(mocker):
+    search = mocker.patch("services.library_service.search_books_in_catalog",
+                          return_value=[{"id": i} for i in range(30)])
+
+    results = search_books_in_catalog_batch([("Lee", "author"), (" Lee ", "author"), ("Lee", "title")], limit=5)
+
+    assert search.call_count == 2
+    assert [len(r) for r in results] == [5, 5, 5]
+
+
+def test_batch_endpoint_keys_results_by_id(client):
+    response = client.post("/api/search/batch", json={
+        "queries": [
+            {"id": "gatsby", "q": "9780743273565", "type": "isbn"},
+            {"q": "9780061120084", "type": "isbn"},
+            {"id": "blank", "q": "  "},
+        ]
+    })
+
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert results["gatsby"]["results"][0]["title"] == "The Great Gatsby"
+    assert results["1"]["count"] == 1
+    assert results["blank"] == {"error": "Search term is required"}
+
+
+def test_batch_endpoint_rejects_bad_payloads(client):
+    assert client.post("/api/search/batch", json={}).status_code == 400
+    assert client.post("/api/search/batch", json={"queries": ["x"]}).status_code == 400
+    too_many = {"queries": [{"q": "x"}] * 51}
+    assert client.post("/api/search/batch", json=too_many).status_code == 400
+    assert client.post("/api/search/batch", json={"queries": [{"q": "gatsby", "type": ["title"]}]}).status_code == 400
+    assert client.post("/api/search/batch", json={"queries": [{"q": "gatsby", "type": "genre"}]}).status_code == 400
+    duplicates = {"queries": [{"id": "a", "q": "gatsby"}, {"id": "a", "q": "1984"}]}
+    assert client.post("/api/search/batch", json=duplicates).status_code == 400
+    # An explicit id may not collide with another query's position either
+    colliding = {"queries": [{"q": "gatsby"}, {"id": "0", "q": "1984"}]}
+    assert client.post("/api/search/batch", json=colliding).status_code == 400
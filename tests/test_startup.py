@@ -0,0 +1,56 @@
+import sqlite3
+import subprocess
+import sys
+import database as db
+from app import create_app
+
+
+def test_current_schema_skips_ddl(mocker):
+    statements = []
+    real_connection = db.get_db_connection
+
+    def traced_connection():
+        conn = real_connection()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    mocker.patch.object(db, "get_db_connection", traced_connection)
+    db.init_database()
+
+    assert statements == ["SELECT MAX(version) FROM schema_version"]
+
+
+def test_outdated_schema_is_upgraded(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DATABASE", str(tmp_path / "old.db"))
+    conn = sqlite3.connect(db.DATABASE)
+    conn.execute("CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, "
+                 "author TEXT NOT NULL, isbn TEXT UNIQUE NOT NULL, total_copies INTEGER NOT NULL, "
+                 "available_copies INTEGER NOT NULL)")
+    conn.commit()
+    conn.close()
+
+    db.init_database()
+
+    conn = db.get_db_connection()
+    assert db.get_schema_version(conn) == db.SCHEMA_VERSION
+    assert "version" in [row["name"] for row in conn.execute("PRAGMA table_info(books)")]
+    conn.close()
+
+
+def test_sample_data_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DATABASE", str(tmp_path / "empty.db"))
+    monkeypatch.delenv("LIBRARY_SAMPLE_DATA", raising=False)
+
+    create_app()
+    assert db.get_all_books() == []
+
+    monkeypatch.setenv("LIBRARY_SAMPLE_DATA", "1")
+    create_app()
+    assert len(db.get_all_books()) == 3
+
+
+def test_app_import_does_not_load_http_or_asyncio():
+    code = "import sys, app; print('requests' in sys.modules, 'asyncio' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+
+    assert output.split() == ["False", "False"]
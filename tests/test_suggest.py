@@ -0,0 +1,116 @@
+import time
+
+import pytest
+import database as db
+from services.suggest_index import SuggestIndex, normalize, suggest_index
+
+
+def _book(book_id, title, author):
+    return {"id": book_id, "title": title, "author": author}
+
+
+def test_normalize_folds_case_accents_and_punctuation():
+    assert normalize("  Cien Años de Soledad!") == "cien anos de soledad"
+    assert normalize("O'Brien--Smith") == "o brien smith"
+
+
+def test_matches_word_starts_ranked_by_popularity():
+    index = SuggestIndex()
+    index.build([
+        _book(1, "The Great Gatsby", "F. Scott Fitzgerald"),
+        _book(2, "Great Expectations", "Charles Dickens"),
+        _book(3, "Ungreat Title", "Nobody"),
+    ], popularity={2: 5, 1: 1})
+
+    assert [b["id"] for b in index.suggest("gre")] == [2, 1]
+    assert [b["id"] for b in index.suggest("GREAT gat")] == [1]
+    assert [b["id"] for b in index.suggest("dick")] == [2]
+    assert index.suggest("   ") == []
+
+
+def test_limit_and_ties_ordered_by_title():
+    index = SuggestIndex(max_results=3)
+    index.build([_book(i, f"Book {i:02d}", "Author") for i in range(10)], popularity={})
+
+    results = index.suggest("book", limit=50)
+
+    assert [b["title"] for b in results] == ["Book 00", "Book 01", "Book 02"]
+
+
+def test_added_book_invalidates_memoized_prefix(monkeypatch):
+    monkeypatch.setattr("services.suggest_index.MEMO_THRESHOLD", 0)
+    index = SuggestIndex()
+    index.build([_book(1, "Zebra", "A")], popularity={})
+    assert [b["id"] for b in index.suggest("z")] == [1]
+
+    index.add_book(_book(2, "Aardvark", "Zed"))
+
+    assert [b["id"] for b in index.suggest("z")] == [2, 1]
+
+
+def test_suggest_endpoint(client):
+    response = client.get("/api/suggest?q=orw")
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "public, max-age=30"
+    data = response.get_json()
+    assert [b["title"] for b in data["results"]] == ["1984"]
+
+    assert client.get("/api/suggest?q=orw&limit=0").status_code == 400
+
+
+def test_inserted_book_is_suggested_immediately(client):
+    db.insert_book("Orwell: A Life", "Bernard Crick", "9780000000001", 1, 1)
+
+    titles = [b["title"] for b in client.get("/api/suggest?q=orwell").get_json()["results"]]
+
+    assert "Orwell: A Life" in titles
+    assert len(suggest_index) == 4
+
+
+def test_index_is_built_on_first_use_not_at_startup(client):
+    assert suggest_index.catalog_version is None
+    assert len(suggest_index) == 0
+
+    client.get("/api/suggest?q=gat")
+
+    versions = db.get_data_versions()
+    assert suggest_index.catalog_version == (versions["epoch"]["version"], versions["catalog"]["version"])
+
+
+def test_loans_update_popularity_without_rebuild(client, mocker):
+    client.get("/api/suggest?q=gat")
+    client.application.config["SUGGEST_REFRESH_SECONDS"] = 0
+    rebuild = mocker.patch("services.suggest_index.rebuild_suggest_index")
+
+    db.update_book_availability(1, -1)
+    db.update_book_availability(1, -1)
+    db.update_book_availability(1, 1)
+    db.insert_book("Orwell: A Life", "Bernard Crick", "9780000000001", 1, 1)
+    results = client.get("/api/suggest?q=gat").get_json()["results"]
+
+    assert results[0]["popularity"] == 2
+    rebuild.assert_not_called()
+
+
+def test_catalog_change_from_another_process_rebuilds(client):
+    client.get("/api/suggest?q=gat")
+    client.application.config["SUGGEST_REFRESH_SECONDS"] = 0
+    conn = db.get_db_connection()
+    conn.execute("UPDATE books SET title = 'Nineteen Eighty-Four' WHERE id = 3")
+    conn.commit()
+    conn.close()
+
+    client.get("/api/suggest?q=nine")
+    for _ in range(100):
+        if suggest_index.suggest("nine"):
+            break
+        time.sleep(0.01)
+    assert [b["title"] for b in suggest_index.suggest("nine")] == ["Nineteen Eighty-Four"]
+
+
+def test_missed_events_require_rebuild():
+    index = SuggestIndex()
+    index.build([_book(1, "Zebra", "A")], popularity={}, catalog_version=(1, 1), last_event_id=5)
+
+    assert index.apply_availability_events([{"id": 7, "book_id": 1, "available_copies": 0}]) is False
@@ -0,0 +1,78 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import database as db
+from db_instrumentation import count_queries
+from write_queue import WriteQueue
+
+
+@pytest.fixture
+def write_queue():
+    queue = WriteQueue(max_batch=16)
+    db.set_write_queue(queue)
+    yield queue
+    db.set_write_queue(None)
+    queue.stop()
+
+
+def _hold_writer(queue):
+    """Submit a write that blocks the writer thread until the returned event is set."""
+    started, release = threading.Event(), threading.Event()
+
+    def blocking(conn):
+        started.set()
+        release.wait(5)
+
+    thread = threading.Thread(target=queue.submit, args=(blocking,))
+    thread.start()
+    started.wait(5)
+    return release, thread
+
+
+def test_pending_writes_share_one_commit_with_separate_results(write_queue):
+    release, holder = _hold_writer(write_queue)
+    results = {}
+
+    def add(isbn):
+        results.setdefault(isbn, []).append(db.insert_book("Queued", "Author", isbn, 1, 1))
+
+    # Three distinct books and one duplicate ISBN queue up behind the held batch
+    isbns = ["9990000000010", "9990000000011", "9990000000012", "9990000000010"]
+    threads = [threading.Thread(target=add, args=(isbn,)) for isbn in isbns]
+    for thread in threads:
+        thread.start()
+    while write_queue._queue.qsize() < len(isbns):
+        time.sleep(0.001)
+    release.set()
+    for thread in threads + [holder]:
+        thread.join()
+
+    assert sorted(results["9990000000010"]) == [False, True]
+    assert results["9990000000011"] == results["9990000000012"] == [True]
+    assert (write_queue.batches, write_queue.operations) == (2, 5)
+    assert len(db.get_books_by_isbns(isbns)) == 3
+
+
+def test_queued_writes_are_counted_for_the_caller(write_queue):
+    now = datetime.now()
+    with count_queries() as account:
+        assert db.insert_borrow_record("555555", 1, now, now + timedelta(days=14))
+        assert db.update_book_availability(1, -1)
+    assert account.statements == 2
+    assert db.get_patron_borrow_count("555555") == 1
+
+
+def test_enabled_from_app_config(monkeypatch):
+    from app import create_app
+    monkeypatch.setenv("LIBRARY_WRITE_QUEUE", "1")
+    create_app()
+    assert db.insert_book("Via App", "Author", "9990000000013", 1, 1) is True
+    queue = db.set_write_queue(None)
+    assert isinstance(queue, WriteQueue) and queue.operations == 1
+    queue.stop()
+
+    monkeypatch.delenv("LIBRARY_WRITE_QUEUE")
+    create_app()
+    assert db.set_write_queue(None) is None
@@ -0,0 +1,149 @@
+"""
+Write Queue Module - Single writer thread with group commit
+
+When enabled, the database.py write helpers hand their statements to one
+writer thread per process instead of each opening its own transaction.
+The thread takes whatever writes are pending (at most max_batch, and
+optionally waiting up to max_wait_ms for more to arrive) and runs them
+in one transaction, so concurrent writers share a single commit and its
+fsync instead of queueing for SQLite's write lock one by one.
+
+Each write runs under its own SAVEPOINT: one that fails is rolled back
+alone and its caller gets the exception, while the rest of the batch
+commits. Callers block until the batch containing their write has
+committed, so a helper returning True still means the write is durable.
+"""
+
+import contextvars
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+import database
+
+logger = logging.getLogger(__name__)
+
+
+class WriteQueue:
+    """Runs submitted write operations on one thread, committing them in batches."""
+
+    def __init__(self, max_batch: int = 64, max_wait_ms: float = 0):
+        """
+        Args:
+            max_batch: Most operations committed together
+            max_wait_ms: How long the writer waits for more operations after
+                the first one arrives. Writes that arrive while a batch is
+                committing are batched regardless, which is usually enough;
+                waiting only adds latency when few threads write.
+        """
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.batches = 0
+        self.operations = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+
+    def submit(self, operation: Callable[[sqlite3.Connection], object]):
+        """
+        Run operation(conn) in the next batch and wait for the commit.
+
+        Returns:
+            What operation returned; raises what it raised, or the error
+            that made the batch's commit fail
+        """
+        future = Future()
+        # Run in the caller's context so per-request DB accounting sees the statements
+        self._ensure_started().put((contextvars.copy_context(), operation, future))
+        return future.result()
+
+    def stop(self, timeout: float = 5):
+        """Commit what is pending and stop the writer; the next submit starts a new one."""
+        with self._lock:
+            thread, pending = self._thread, self._queue
+            self._pid = self._thread = self._queue = None
+        if thread is not None and thread.is_alive():
+            pending.put(None)
+            thread.join(timeout)
+
+    def _ensure_started(self) -> queue.SimpleQueue:
+        with self._lock:
+            # A forked worker gets its own queue and thread
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.SimpleQueue()
+                self._thread = threading.Thread(target=self._run, args=(self._queue,), name='write-queue',
+                                                daemon=True)
+                self._thread.start()
+            return self._queue
+
+    def _run(self, pending: queue.SimpleQueue):
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            stopping = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = pending.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            if stopping:
+                return
+
+    def _commit(self, batch: List[Tuple[contextvars.Context, Callable, Future]]):
+        outcomes = []
+        try:
+            with database.write_transaction() as conn:
+                for context, operation, _ in batch:
+                    conn.execute('SAVEPOINT queued_write', instrument=False)
+                    try:
+                        outcomes.append((True, context.run(operation, conn)))
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO queued_write', instrument=False)
+                        outcomes.append((False, e))
+                    conn.execute('RELEASE queued_write', instrument=False)
+        except Exception as e:
+            logger.exception("Committing a batch of %d writes failed", len(batch))
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.operations += len(batch)
+        for (_, _, future), (ok, value) in zip(batch, outcomes):
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+def init_write_queue(app):
+    """
+    Route database writes through a WriteQueue if app.config['WRITE_QUEUE'] is set.
+
+    WRITE_QUEUE defaults to the LIBRARY_WRITE_QUEUE environment variable
+    ('1'/'true'/'yes'). WRITE_QUEUE_MAX_BATCH and WRITE_QUEUE_MAX_WAIT_MS
+    are passed to the queue.
+    """
+    app.config.setdefault('WRITE_QUEUE',
+                          os.environ.get('LIBRARY_WRITE_QUEUE', '').lower() in ('1', 'true', 'yes'))
+    app.config.setdefault('WRITE_QUEUE_MAX_BATCH', 64)
+    app.config.setdefault('WRITE_QUEUE_MAX_WAIT_MS', 0)
+    previous: Optional[WriteQueue] = database.set_write_queue(
+        WriteQueue(app.config['WRITE_QUEUE_MAX_BATCH'], app.config['WRITE_QUEUE_MAX_WAIT_MS'])
+        if app.config['WRITE_QUEUE'] else None)
+    if previous is not None:
+        previous.stop()